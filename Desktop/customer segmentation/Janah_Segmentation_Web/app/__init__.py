@@ -17,4 +17,8 @@ def create_app():
     from .routes import main
     app.register_blueprint(main)
     
+    # Request latency metrics for /metrics
+    from utils.monitoring.metrics import init_request_metrics
+    init_request_metrics(app)
+    
     return app
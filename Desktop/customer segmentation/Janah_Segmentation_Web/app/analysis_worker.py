@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Segmentation analysis worker
+
+Runs one analysis in its own process for the Flask app:
+
+    python app/analysis_worker.py <dataset_path> <num_clusters> <control_dir>
+        [--output-dir <dir>] [--profile <path>]
+
+The worker talks to the app through files in ``control_dir``: before each
+stage it writes the stage name and start time to ``progress.json`` and
+checks for a ``cancel`` file, so a cancelled job stops at the next stage
+boundary. The app enforces per-stage time budgets from the progress file.
+Each stage is timed by a ``StageProfiler`` and the breakdown is saved in
+the analysis summary under ``timings``. The app gives every job its own
+``--output-dir`` so concurrent jobs never write the same result files.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# Stages in run order; each one is a cancellation checkpoint
+STAGES = ['startup', 'cleaning', 'rfm', 'k_sweep', 'plotting']
+
+PROGRESS_FILE = 'progress.json'
+CANCEL_FILE = 'cancel'
+
+# Exit codes understood by the app
+EXIT_FAILED = 1
+EXIT_CANCELLED = 3
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    # Appended, not inserted, so the local streamlit/ package does not
+    # shadow the Streamlit library
+    sys.path.append(PROJECT_ROOT)
+
+from utils.monitoring.profiling import StageProfiler
+
+
+class AnalysisCancelled(Exception):
+    """Raised at a checkpoint once the app has asked the worker to stop"""
+
+
+def read_progress(control_dir):
+    """Return the worker's last progress record, or None"""
+    try:
+        with open(os.path.join(control_dir, PROGRESS_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def request_cancel(control_dir):
+    """Ask the worker using ``control_dir`` to stop at its next checkpoint"""
+    os.makedirs(control_dir, exist_ok=True)
+    with open(os.path.join(control_dir, CANCEL_FILE), 'w') as f:
+        f.write(datetime.now().isoformat())
+
+
+def checkpoint(control_dir, stage, completed):
+    """
+    Stop if cancellation was requested, otherwise record the next stage
+
+    Args:
+        control_dir (str): Directory shared with the app
+        stage (str): Stage about to start ('done' after the last one)
+        completed (list): Stages finished so far
+    """
+    if os.path.exists(os.path.join(control_dir, CANCEL_FILE)):
+        raise AnalysisCancelled(f"Cancelled before stage '{stage}'")
+
+    # Write-then-rename so the app never reads a half-written record
+    progress_path = os.path.join(control_dir, PROGRESS_FILE)
+    with open(progress_path + '.tmp', 'w') as f:
+        json.dump({'stage': stage, 'started_at': time.time(), 'completed': list(completed)}, f)
+    os.replace(progress_path + '.tmp', progress_path)
+
+
+def load_segmentation():
+    """
+    Import streamlit/segmentation.py by file path
+
+    The local ``streamlit`` package would shadow the real Streamlit library
+    if it were imported as a package, so the module is loaded from its file.
+    """
+    module_path = os.path.join(PROJECT_ROOT, 'streamlit', 'segmentation.py')
+    spec = importlib.util.spec_from_file_location('segmentation', module_path)
+    segmentation = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(segmentation)
+    return segmentation
+
+
+def run_analysis(dataset_path, num_clusters, control_dir, output_dir='data/processed', profile_path=None):
+    """
+    Run the analysis stages with a checkpoint before each one
+
+    Args:
+        dataset_path (str): Transactions to analyse
+        num_clusters (int): Number of clusters, or None for the k sweep
+        control_dir (str): Directory shared with the app
+        output_dir (str): Where results and the summary are written
+        profile_path (str): Save a cProfile profile of the stages here
+
+    Returns:
+        dict: Analysis summary
+    """
+    profiler = StageProfiler(profile=profile_path is not None)
+    completed = []
+    checkpoint(control_dir, 'startup', completed)
+    segmentation = profiler.call('startup', load_segmentation)
+    completed.append('startup')
+
+    checkpoint(control_dir, 'cleaning', completed)
+    print("Loading and cleaning data...")
+    data = profiler.call('cleaning', segmentation.load_and_clean_data, dataset_path)
+    if data is None:
+        raise RuntimeError("Data loading failed")
+    print(f"Data loaded successfully: {len(data)} rows")
+    outlier_strategy = data.attrs.get('outlier_strategy')
+    completed.append('cleaning')
+
+    checkpoint(control_dir, 'rfm', completed)
+    print("Calculating RFM metrics...")
+    rfm_data = profiler.call('rfm', segmentation.calculate_rfm, data)
+    if rfm_data is None:
+        raise RuntimeError("RFM calculation failed")
+    print(f"RFM calculated successfully: {len(rfm_data)} customers")
+    del data
+    completed.append('rfm')
+
+    checkpoint(control_dir, 'k_sweep', completed)
+    print("Performing clustering...")
+    clustered_data, optimal_clusters, model = profiler.call('k_sweep', segmentation.perform_clustering,
+                                                             rfm_data, num_clusters)
+    if clustered_data is None:
+        raise RuntimeError("Clustering failed")
+    print(f"Clustering completed: {optimal_clusters} clusters")
+    completed.append('k_sweep')
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, 'rfm_clustered.csv')
+    clustered_data.to_csv(output_path, index=False)
+    print(f"Results saved to: {output_path}")
+
+    checkpoint(control_dir, 'plotting', completed)
+    try:
+        print("Creating visualizations...")
+        if profiler.call('plotting', segmentation.create_visualizations, clustered_data, output_dir):
+            print("Visualizations created successfully")
+        else:
+            print("Visualization creation failed, but continuing...")
+    except Exception as viz_error:
+        print(f"Visualization error (non-critical): {viz_error}")
+    completed.append('plotting')
+
+    summary = {
+        'total_customers': len(clustered_data),
+        'num_clusters': int(optimal_clusters),
+        'avg_recency': float(clustered_data['Recency'].mean()),
+        'avg_frequency': float(clustered_data['Frequency'].mean()),
+        'avg_monetary': float(clustered_data['Monetary'].mean()),
+        'cluster_sizes': {str(k): int(v) for k, v in clustered_data['Cluster'].value_counts().items()},
+        'timestamp': datetime.now().isoformat(),
+        'k_selection': getattr(model, 'k_selection_', None),
+        'outlier_strategy': outlier_strategy,
+        'timings': profiler.to_dict()
+    }
+    if profile_path:
+        profiler.save_profile(profile_path)
+        summary['profile_path'] = profile_path
+    summary_path = os.path.join(output_dir, 'analysis_summary.json')
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f)
+    print(f"Analysis summary saved to: {summary_path}")
+
+    checkpoint(control_dir, 'done', completed)
+    return summary
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run one segmentation analysis")
+    parser.add_argument('dataset_path')
+    parser.add_argument('num_clusters')
+    parser.add_argument('control_dir')
+    parser.add_argument('--output-dir', dest='output_dir', default='data/processed',
+                        help="Directory for the clustered data and the analysis summary")
+    parser.add_argument('--profile', dest='profile_path', default=None,
+                        help="Save a cProfile profile of the analysis to this path")
+    args = parser.parse_args(argv[1:])
+    num_clusters = int(args.num_clusters) if args.num_clusters not in ('', 'None', 'auto') else None
+    os.makedirs(args.control_dir, exist_ok=True)
+
+    print("Starting analysis...")
+    try:
+        run_analysis(args.dataset_path, num_clusters, args.control_dir, output_dir=args.output_dir,
+                     profile_path=args.profile_path)
+    except AnalysisCancelled as e:
+        print(str(e))
+        return EXIT_CANCELLED
+    except Exception as e:
+        print(f"Analysis failed: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    print("Analysis completed successfully")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
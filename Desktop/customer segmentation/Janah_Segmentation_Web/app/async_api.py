@@ -0,0 +1,173 @@
+"""
+Async API layer for Janah Customer Segmentation
+
+Serves the polled and streamed API endpoints (run-segmentation, job status
+and events, analysis progress, data export) on an ASGI event loop, so slow
+uploads, long-lived status streams and exports wait on the loop instead of
+each holding a worker thread. Blocking work (fingerprinting, job
+submission, JSON reads) runs in a thread pool. Every other route is served
+by the Flask app mounted underneath.
+
+Both layers share one process, so they share the job manager and dataset
+fetcher in app/routes.py. Run with ``uvicorn asgi:app``.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+
+import anyio
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from . import create_app
+from .jobs import JOB_PRIORITIES, QueueFullError
+from .routes import (job_manager, allowed_file, secure_filename, store_upload, submit_analysis,
+                     default_dataset_path, analysis_progress_status, export_file_name)
+from utils.monitoring.metrics import ASGIRequestMetrics
+from config.settings import UPLOAD_CHUNK_SIZE, EXPORT_CHUNK_SIZE, JOB_EVENT_POLL_SECONDS, WSGI_THREADS
+
+
+def create_asgi_app(flask_app=None):
+    """
+    Application factory for the ASGI app
+
+    Args:
+        flask_app: Flask app serving the remaining routes (created if None)
+
+    Returns:
+        ASGI application
+    """
+    flask_app = flask_app or create_app()
+
+    async def run_segmentation(request):
+        """Save an upload without blocking the loop and queue the analysis"""
+        max_length = flask_app.config.get('MAX_CONTENT_LENGTH')
+        if max_length and int(request.headers.get('content-length') or 0) > max_length:
+            return JSONResponse({'success': False, 'error': 'File too large'}, status_code=413)
+
+        try:
+            async with request.form(max_files=1) as form:
+                data_source = form.get('dataSource', 'default')
+                num_clusters = int(form.get('numClusters', 4))
+                analysis_type = form.get('analysisType', 'rfm')
+                priority = JOB_PRIORITIES.get(form.get('priority', 'normal'), JOB_PRIORITIES['normal'])
+                profile = form.get('profile', 'false').lower() == 'true'
+                upload = form.get('file')
+
+                needs_download = False
+                if data_source == 'upload' and upload is not None:
+                    if not upload.filename or not allowed_file(upload.filename):
+                        return JSONResponse({'success': False, 'error': 'Invalid file type'})
+                    filename = secure_filename(upload.filename)
+                    temp_path = os.path.join(flask_app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+                    async with await anyio.open_file(temp_path, 'wb') as out:
+                        while True:
+                            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            await out.write(chunk)
+                    dataset_path = await run_in_threadpool(store_upload, temp_path, filename)
+                else:
+                    with flask_app.app_context():
+                        dataset_path = default_dataset_path()
+                    needs_download = not await anyio.Path(dataset_path).exists()
+
+            analysis_params = {
+                'num_clusters': num_clusters,
+                'analysis_type': analysis_type,
+                'profile': profile
+            }
+            try:
+                job, coalesced = await run_in_threadpool(submit_analysis, flask_app, dataset_path, needs_download,
+                                                         analysis_params, priority)
+            except QueueFullError as e:
+                return JSONResponse({
+                    'success': False,
+                    'error': f'The server is busy, please try again in {e.retry_after} seconds',
+                    'retry_after': e.retry_after
+                }, status_code=429, headers={'Retry-After': str(e.retry_after)})
+
+            return JSONResponse({
+                'success': True,
+                'message': 'Joined the analysis already in progress' if coalesced else 'Analysis started successfully',
+                'job_id': job.id,
+                'coalesced': coalesced,
+                'queue_position': job_manager.queue_position(job),
+                'dataset_path': dataset_path,
+                'downloading_dataset': needs_download
+            })
+        except Exception as e:
+            return JSONResponse({'success': False, 'error': f'Unexpected error: {str(e)}'})
+
+    async def job_status(request):
+        """Status and result of an analysis job"""
+        job = job_manager.get(request.path_params['job_id'])
+        if job is None:
+            return JSONResponse({'success': False, 'error': 'Job not found'}, status_code=404)
+        return JSONResponse(dict(job.to_dict(), success=True))
+
+    async def job_events(request):
+        """
+        Server-sent events for an analysis job
+
+        Sends the job state whenever it changes and closes once the job has
+        finished, so clients need not poll.
+        """
+        job = job_manager.get(request.path_params['job_id'])
+        if job is None:
+            return JSONResponse({'success': False, 'error': 'Job not found'}, status_code=404)
+
+        async def stream():
+            last_state = None
+            while True:
+                finished = job.finished
+                state = json.dumps(job.to_dict(), default=str)
+                if state != last_state:
+                    yield f"event: {'finished' if finished else 'status'}\ndata: {state}\n\n"
+                    last_state = state
+                if finished or await request.is_disconnected():
+                    break
+                await asyncio.sleep(JOB_EVENT_POLL_SECONDS)
+
+        return StreamingResponse(stream(), media_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    async def analysis_progress(request):
+        """API endpoint for analysis progress"""
+        return JSONResponse(await run_in_threadpool(analysis_progress_status, flask_app.root_path))
+
+    async def export_data(request):
+        """Stream the clustered customer data as CSV"""
+        clustered_path = os.path.join(flask_app.root_path, '..', 'data', 'processed', 'rfm_clustered.csv')
+        if not await anyio.Path(clustered_path).exists():
+            return JSONResponse({'error': 'No analysis results available. Run the segmentation first.'},
+                                status_code=404)
+
+        async def stream():
+            async with await anyio.open_file(clustered_path, 'rb') as f:
+                while True:
+                    chunk = await f.read(EXPORT_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return StreamingResponse(stream(), media_type='text/csv', headers={
+            'Content-Disposition': f'attachment; filename="{export_file_name()}"'})
+
+    routes = [
+        Route('/run_segmentation', run_segmentation, methods=['POST']),
+        Route('/api/jobs/{job_id}', job_status),
+        Route('/api/jobs/{job_id}/events', job_events),
+        Route('/api/analysis-progress', analysis_progress),
+        Route('/api/export-data', export_data)
+    ]
+    app = Starlette(routes=routes + [
+        # Pages and the remaining API endpoints
+        Mount('/', app=WSGIMiddleware(flask_app, workers=WSGI_THREADS))
+    ])
+    return ASGIRequestMetrics(app, routes)
@@ -0,0 +1,415 @@
+"""
+Background segmentation jobs
+
+Every analysis request becomes an ``AnalysisJob`` keyed by a hash of its
+input file's contents and its parameters. While a job with a given key is
+queued or running, identical requests attach to it instead of starting
+another computation, and all of them observe the same status and result.
+
+New jobs go into a bounded priority queue served by a fixed number of
+worker threads. A job only starts when its memory estimate fits in the
+remaining memory budget, and submissions are refused with a retry hint
+once the queue is full.
+
+Jobs can be cancelled: a queued job is simply dropped, while a running job
+gets its ``cancel_event`` set, which its target (found via ``current_job``)
+is expected to check between stages.
+"""
+
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from utils.monitoring.metrics import record_cache
+
+# Finished jobs kept around for status lookups
+MAX_FINISHED_JOBS = 100
+
+# Lower numbers are served first
+JOB_PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+# Peak memory of an analysis relative to its input file size. Parquet and
+# Excel are compressed, so they expand much more when loaded than CSV does.
+MEMORY_EXPANSION = {'.csv': 6, '.parquet': 12, '.xlsx': 15, '.xls': 15}
+BASE_JOB_MEMORY_MB = 150
+
+# Number of recent jobs used for wait and run time statistics
+TIMING_WINDOW = 50
+
+_fingerprint_cache = {}
+_fingerprint_lock = threading.Lock()
+
+# The job each worker thread is currently running
+_worker_state = threading.local()
+
+
+def current_job():
+    """Return the AnalysisJob running in this thread, or None"""
+    return getattr(_worker_state, 'job', None)
+
+
+def input_fingerprint(file_path, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a file's contents, cached by path, size and modification time
+
+    Args:
+        file_path (str): Input dataset
+        chunk_size (int): Bytes hashed per read
+
+    Returns:
+        str: Hex digest
+    """
+    stat = os.stat(file_path)
+    cache_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprint_lock:
+        cached = _fingerprint_cache.get(cache_key)
+    record_cache('input_fingerprint', cached is not None)
+    if cached:
+        return cached
+
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    with _fingerprint_lock:
+        _fingerprint_cache[cache_key] = digest
+    return digest
+
+
+def estimate_job_memory(file_path):
+    """
+    Rough peak memory of an analysis of ``file_path`` in MB
+
+    Args:
+        file_path (str): Input dataset
+
+    Returns:
+        float: Estimated peak resident memory in MB
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    return BASE_JOB_MEMORY_MB + size_mb * MEMORY_EXPANSION.get(extension, 6)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job cannot be admitted; ``retry_after`` is in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobCancelledError(RuntimeError):
+    """Raised by a job target that stopped because it was cancelled"""
+
+
+class StageTimeoutError(RuntimeError):
+    """Raised by a job target when a stage runs past its time budget"""
+
+    def __init__(self, stage, budget_seconds):
+        super().__init__(f"Stage '{stage}' exceeded its time budget of {budget_seconds}s")
+        self.stage = stage
+        self.budget_seconds = budget_seconds
+
+
+def job_key(input_id, params):
+    """Key identifying a computation: input identity plus canonical parameters"""
+    canonical = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(f'{input_id}\n{canonical}'.encode('utf-8')).hexdigest()
+
+
+class AnalysisJob:
+    """One segmentation computation and everyone waiting on it"""
+
+    def __init__(self, key, params, priority=JOB_PRIORITIES['normal'], memory_mb=BASE_JOB_MEMORY_MB):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.priority = priority
+        self.memory_mb = memory_mb
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.subscribers = 1
+        self.stage = None
+        self.cancel_event = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns True if it did"""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'params': self.params,
+            'priority': self.priority,
+            'memory_mb': round(self.memory_mb, 1),
+            'subscribers': self.subscribers,
+            'stage': self.stage,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class JobManager:
+    """
+    Run analysis jobs on a bounded, prioritized queue, coalescing identical ones
+
+    Args:
+        max_concurrent (int): Jobs running at the same time (worker threads)
+        max_queued (int): Jobs waiting to start before new ones are refused
+        memory_budget_mb (float): Combined memory estimate of running jobs;
+            a job larger than the whole budget still runs, but only alone
+        listener (callable): Called as ``listener(event, job, metrics)`` on
+            'submitted', 'coalesced', 'rejected', 'started' and 'finished'
+            events, outside the manager's lock (``job`` is None for rejections)
+    """
+
+    def __init__(self, max_concurrent=2, max_queued=10, memory_budget_mb=2048, listener=None):
+        self.listener = listener
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.memory_budget_mb = memory_budget_mb
+        self._lock = threading.Condition()
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._running_memory_mb = 0.0
+        self._workers = []
+        self._counters = {'submitted': 0, 'coalesced': 0, 'rejected': 0, 'completed': 0, 'failed': 0,
+                          'cancelled': 0, 'timed_out': 0}
+        self._wait_times = deque(maxlen=TIMING_WINDOW)
+        self._run_times = deque(maxlen=TIMING_WINDOW)
+
+    def submit(self, key, params, target, *args, priority=JOB_PRIORITIES['normal'], memory_mb=BASE_JOB_MEMORY_MB):
+        """
+        Queue a job, or attach to the in-flight job with the same key
+
+        Args:
+            key (str): Job key (see ``job_key``)
+            params (dict): Analysis parameters, for status reporting
+            target (callable): Runs the computation; its return value becomes
+                the job result
+            *args: Arguments for ``target``
+            priority (int): Queue priority, see JOB_PRIORITIES
+            memory_mb (float): Memory estimate (see ``estimate_job_memory``)
+
+        Returns:
+            tuple: (AnalysisJob, True if attached to an existing job)
+
+        Raises:
+            QueueFullError: If the queue already holds ``max_queued`` jobs
+        """
+        created = False
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None:
+                job.subscribers += 1
+                self._counters['coalesced'] += 1
+            elif len(self._queue) >= self.max_queued:
+                self._counters['rejected'] += 1
+                error = QueueFullError(f"Analysis queue is full ({len(self._queue)} jobs waiting)",
+                                       self._retry_after())
+            else:
+                job = AnalysisJob(key, params, priority, memory_mb)
+                job._target, job._args = target, args
+                self._in_flight[key] = job
+                self._jobs[job.id] = job
+                heapq.heappush(self._queue, (priority, next(self._sequence), job))
+                self._counters['submitted'] += 1
+                self._prune()
+                self._start_workers()
+                self._lock.notify_all()
+                created = True
+
+        # Listeners run outside the lock, like every other event
+        if created:
+            self._notify('submitted', job)
+            return job, False
+        if job is None:
+            self._notify('rejected', None)
+            raise error
+        self._notify('coalesced', job)
+        return job, True
+
+    def _notify(self, event, job):
+        if self.listener is None:
+            return
+        try:
+            self.listener(event, job, self.metrics())
+        except Exception as e:
+            print(f"Job listener failed on '{event}': {e}")
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_concurrent:
+            worker = threading.Thread(target=self._work, daemon=True,
+                                      name=f'analysis-worker-{len(self._workers)}')
+            self._workers.append(worker)
+            worker.start()
+
+    def _can_start(self):
+        if not self._queue:
+            return False
+        next_job = self._queue[0][2]
+        # An oversized job may still run once nothing else is running
+        return self._running == 0 or self._running_memory_mb + next_job.memory_mb <= self.memory_budget_mb
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._can_start():
+                    self._lock.wait()
+                _, _, job = heapq.heappop(self._queue)
+                self._running += 1
+                self._running_memory_mb += job.memory_mb
+                job.status = 'running'
+                job.started_at = time.time()
+                self._wait_times.append(job.started_at - job.created_at)
+            self._notify('started', job)
+
+            self._run(job)
+
+            with self._lock:
+                self._running -= 1
+                self._running_memory_mb -= job.memory_mb
+                self._run_times.append(job.finished_at - job.started_at)
+                self._finish(job)
+                self._lock.notify_all()
+            job._done.set()
+            self._notify('finished', job)
+
+    def _run(self, job):
+        _worker_state.job = job
+        try:
+            job.result = job._target(*job._args)
+            job.status = 'completed'
+        except JobCancelledError as e:
+            job.error = str(e)
+            job.status = 'cancelled'
+        except StageTimeoutError as e:
+            job.error = str(e)
+            job.status = 'timed_out'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            _worker_state.job = None
+            job.finished_at = time.time()
+            job._target = job._args = None
+
+    def _finish(self, job):
+        # Called with the lock held, before the job's done event is set
+        self._counters[job.status] += 1
+        # Later identical requests start a fresh computation
+        if self._in_flight.get(job.key) is job:
+            del self._in_flight[job.key]
+
+    def cancel(self, job_id, force=False):
+        """
+        Cancel a job on behalf of one of its subscribers
+
+        A coalesced job keeps running while other requests still wait on it,
+        unless ``force`` is set. A queued job is removed from the queue; a
+        running job is signalled through its ``cancel_event``.
+
+        Args:
+            job_id (str): Job to cancel
+            force (bool): Cancel even if other requests share the job
+
+        Returns:
+            AnalysisJob or None: The job, or None if it does not exist
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            if job.subscribers > 1 and not force:
+                job.subscribers -= 1
+                return job
+
+            job.cancel_event.set()
+            queued = [entry for entry in self._queue if entry[2] is job]
+            if not queued:
+                return job
+            self._queue.remove(queued[0])
+            heapq.heapify(self._queue)
+            job.status = 'cancelled'
+            job.error = 'Cancelled before it started'
+            job.finished_at = time.time()
+            job._target = job._args = None
+            self._finish(job)
+            self._lock.notify_all()
+        job._done.set()
+        self._notify('finished', job)
+        return job
+
+    def _retry_after(self):
+        # Time for the jobs ahead to drain through the workers
+        average_run = sum(self._run_times) / len(self._run_times) if self._run_times else 30
+        batches = (len(self._queue) + self._running) / self.max_concurrent
+        return max(1, int(round(average_run * batches)))
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Return the job with ``job_id``, or None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job):
+        """1-based position of a queued job (0 once it has started)"""
+        with self._lock:
+            ordered = sorted(self._queue)
+            for position, (_, _, queued) in enumerate(ordered, start=1):
+                if queued is job:
+                    return position
+            return 0
+
+    def in_flight_count(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def metrics(self):
+        """Queue depth, running jobs, memory in use and recent wait/run times"""
+        with self._lock:
+            now = time.time()
+            waits = list(self._wait_times)
+            oldest_wait = max((now - job.created_at for _, _, job in self._queue), default=0.0)
+            return dict(
+                self._counters,
+                queue_depth=len(self._queue),
+                queue_capacity=self.max_queued,
+                running=self._running,
+                max_concurrent=self.max_concurrent,
+                running_memory_mb=round(self._running_memory_mb, 1),
+                memory_budget_mb=self.memory_budget_mb,
+                avg_wait_seconds=round(sum(waits) / len(waits), 3) if waits else 0.0,
+                max_wait_seconds=round(max(waits), 3) if waits else 0.0,
+                oldest_queued_seconds=round(oldest_wait, 3),
+                avg_run_seconds=round(sum(self._run_times) / len(self._run_times), 3) if self._run_times else 0.0,
+                retry_after_seconds=self._retry_after()
+            )
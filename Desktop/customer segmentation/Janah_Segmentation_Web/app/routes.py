@@ -1,14 +1,29 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, session, send_file
 import pandas as pd
 import os
-import requests
 import subprocess
-import threading
 import time
 import json
 import re
+import io
+import uuid
+import shutil
+import sys
 from datetime import datetime
 
+from .jobs import (JobManager, QueueFullError, JobCancelledError, StageTimeoutError, JOB_PRIORITIES,
+                   current_job, input_fingerprint, job_key, estimate_job_memory)
+from .analysis_worker import EXIT_CANCELLED, read_progress, request_cancel
+from utils.reporting.report import REPORT_FORMATS, summarize_segments, render_report
+from utils.campaigns.export import export_campaign_audiences
+from utils.monitoring.metrics import record_job_event, record_upload, render_metrics
+from utils.data_processing.excel import excel_to_parquet
+from utils.datasets.fetcher import DatasetFetcher
+from config.settings import (DATASET_URL, DATASET_SHA256, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_TIMEOUT,
+                             DOWNLOAD_RETRIES, MAX_CONCURRENT_JOBS, MAX_QUEUED_JOBS, JOB_MEMORY_BUDGET_MB,
+                             DEFAULT_DATASET_MEMORY_MB, STAGE_TIME_BUDGETS, CANCEL_GRACE_SECONDS,
+                             WORKER_POLL_SECONDS)
+
 # Try to import secure_filename from Werkzeug, with fallback
 try:
     from werkzeug.utils import secure_filename
@@ -26,6 +41,14 @@ except ImportError:
 
 main = Blueprint('main', __name__)
 
+# Shared by all requests: bounds concurrent analyses and runs identical ones once
+job_manager = JobManager(max_concurrent=MAX_CONCURRENT_JOBS, max_queued=MAX_QUEUED_JOBS,
+                         memory_budget_mb=JOB_MEMORY_BUDGET_MB, listener=record_job_event)
+
+# Shared by all requests so concurrent downloads of the dataset collapse into one
+dataset_fetcher = DatasetFetcher(chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=DOWNLOAD_TIMEOUT,
+                                 retries=DOWNLOAD_RETRIES)
+
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
 
@@ -83,42 +106,43 @@ def create_sample_dataset():
         print(f"Error creating sample dataset: {str(e)}")
         return str(e), False
 
+def default_dataset_path():
+    """Path of the default dataset: the Parquet transaction cache, else the CSV"""
+    data_dir = os.path.join(current_app.root_path, '..', 'data')
+    parquet_path = os.path.join(data_dir, 'online_retail.parquet')
+    if os.path.exists(parquet_path):
+        return parquet_path
+    return os.path.join(data_dir, 'online_retail.csv')
+
 def download_online_retail_dataset():
-    """Download the Online Retail dataset from UCI repository"""
+    """
+    Download the Online Retail dataset from UCI repository
+    
+    Blocks the calling thread, so call it from a background thread. The
+    workbook is streamed to disk (resuming a partial download only if the
+    server's copy is unchanged) and converted to the Parquet transaction
+    cache; concurrent callers share the same download. Its digest is only
+    verified once DATASET_SHA256 is set in the settings.
+    """
     try:
         # Create data directory if it doesn't exist
         data_dir = os.path.join(current_app.root_path, '..', 'data')
         os.makedirs(data_dir, exist_ok=True)
         
-        # Try to download from UCI repository
-        url = "https://archive.ics.uci.edu/ml/machine-learning-databases/00352/Online%20Retail.xlsx"
-        file_path = os.path.join(data_dir, 'online_retail.csv')
+        excel_path = os.path.join(data_dir, 'Online_Retail.xlsx')
+        file_path = os.path.join(data_dir, 'online_retail.parquet')
         
-        print(f"Attempting to download dataset from: {url}")
+        def convert(downloaded_path):
+            # Stream the workbook straight into the Parquet transaction cache
+            stats = excel_to_parquet(downloaded_path, file_path)
+            os.remove(downloaded_path)
+            print(f"Dataset downloaded and converted successfully: {file_path} "
+                  f"({stats['rows']} rows, {stats['rows_per_second']} rows/s)")
+            return file_path
         
-        # Download the Excel file
-        response = requests.get(url, timeout=30)
-        if response.status_code == 200:
-            # Save Excel file temporarily
-            excel_path = os.path.join(data_dir, 'Online_Retail.xlsx')
-            with open(excel_path, 'wb') as f:
-                f.write(response.content)
-            
-            # Convert to CSV
-            import pandas as pd
-            df = pd.read_excel(excel_path, engine='openpyxl')
-            df.to_csv(file_path, index=False)
-            
-            # Clean up Excel file
-            os.remove(excel_path)
-            
-            print(f"Dataset downloaded and converted successfully: {file_path}")
-            return file_path, True
-        else:
-            print(f"Download failed with status code: {response.status_code}")
-            # Fallback to creating sample dataset
-            print("Creating sample dataset as fallback...")
-            return create_sample_dataset()
+        print(f"Attempting to download dataset from: {DATASET_URL}")
+        future = dataset_fetcher.fetch(DATASET_URL, excel_path, DATASET_SHA256, postprocess=convert)
+        return future.result(), True
             
     except Exception as e:
         print(f"Error downloading dataset: {str(e)}")
@@ -127,106 +151,263 @@ def download_online_retail_dataset():
         return create_sample_dataset()
 
 def run_streamlit_analysis(dataset_path, analysis_params):
-    """Run Streamlit analysis in a separate process"""
-    try:
-        # Create a temporary script to run the analysis
-        script_content = f"""
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    """
+    Run the analysis in a separate worker process
+    
+    The worker (app/analysis_worker.py) reports its current stage through a
+    control directory. While it runs, this function enforces the per-stage
+    time budgets in STAGE_TIME_BUDGETS and forwards cancellation of the
+    current job: the worker is first asked to stop at its next checkpoint
+    and terminated if it does not stop within CANCEL_GRACE_SECONDS.
+    
+    The worker writes its results to the job's own output directory. A
+    successful job's summary is read back from there before its files are
+    published to data/processed, so concurrent jobs never report each
+    other's timings or profiles.
+    
+    Returns:
+        tuple: (success, stdout, stderr, summary of this job or None)
+    
+    Raises:
+        JobCancelledError: If the job was cancelled
+        StageTimeoutError: If a stage ran past its budget
+    """
+    job = current_job()
+    run_id = job.id if job else uuid.uuid4().hex
+    project_root = os.path.abspath(os.path.join(current_app.root_path, '..'))
+    control_dir = os.path.join(project_root, 'data', 'processed', 'jobs', run_id)
+    output_dir = os.path.join(control_dir, 'output')
+    os.makedirs(control_dir, exist_ok=True)
+    
+    worker_path = os.path.join(current_app.root_path, 'analysis_worker.py')
+    command = [sys.executable, worker_path, os.path.abspath(dataset_path),
+               str(analysis_params.get('num_clusters', 4)), control_dir, '--output-dir', output_dir]
+    if analysis_params.get('profile'):
+        # Opt-in cProfile capture, kept after the job for inspection
+        command += ['--profile', os.path.join(project_root, 'data', 'processed', 'profiles', f'{run_id}.prof')]
+    stdout_path = os.path.join(control_dir, 'stdout.log')
+    stderr_path = os.path.join(control_dir, 'stderr.log')
+    
+    print(f"Starting analysis worker: {' '.join(command)}")
+    stop_reason = None
+    with open(stdout_path, 'w') as stdout_file, open(stderr_path, 'w') as stderr_file:
+        # The worker is short-lived: keep it out of the multiprocess metrics
+        # directory so per-job sample files do not pile up
+        worker_env = {name: value for name, value in os.environ.items() if name != 'PROMETHEUS_MULTIPROC_DIR'}
+        process = subprocess.Popen(command, stdout=stdout_file, stderr=stderr_file, cwd=project_root,
+                                   env=worker_env)
+        cancel_requested_at = None
+        try:
+            while process.poll() is None:
+                progress = read_progress(control_dir)
+                if progress and job:
+                    job.stage = progress['stage']
+                
+                if job and job.cancel_event.is_set() and cancel_requested_at is None:
+                    # Cooperative first: the worker stops at its next checkpoint
+                    request_cancel(control_dir)
+                    cancel_requested_at = time.time()
+                    stop_reason = JobCancelledError(
+                        f"Cancelled during stage '{progress['stage'] if progress else 'startup'}'")
+                
+                if cancel_requested_at and time.time() - cancel_requested_at > CANCEL_GRACE_SECONDS:
+                    break
+                
+                if progress and progress['stage'] in STAGE_TIME_BUDGETS and stop_reason is None:
+                    budget = STAGE_TIME_BUDGETS[progress['stage']]
+                    if time.time() - progress['started_at'] > budget:
+                        stop_reason = StageTimeoutError(progress['stage'], budget)
+                        break
+                
+                time.sleep(WORKER_POLL_SECONDS)
+        finally:
+            if process.poll() is None:
+                # Free the CPU and memory now rather than at the next checkpoint
+                process.terminate()
+                try:
+                    process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+    
+    progress = read_progress(control_dir)
+    if progress and job:
+        job.stage = progress['stage']
+    with open(stdout_path) as f:
+        stdout = f.read()
+    with open(stderr_path) as f:
+        stderr = f.read()
+    summary = None
+    if stop_reason is None and process.returncode == 0:
+        summary = publish_results(output_dir, os.path.join(project_root, 'data', 'processed'))
+    shutil.rmtree(control_dir, ignore_errors=True)
+    
+    print(f"Analysis process completed with return code: {process.returncode}")
+    if stop_reason is not None:
+        raise stop_reason
+    if process.returncode == EXIT_CANCELLED:
+        raise JobCancelledError("Cancelled")
+    return process.returncode == 0, stdout, stderr, summary
 
-from streamlit.segmentation import load_and_clean_data, calculate_rfm, perform_clustering, create_visualizations
-import pandas as pd
-import json
+def publish_results(output_dir, processed_dir):
+    """
+    Move a finished job's results into the shared processed directory
+    
+    Each file (the plots included) is renamed into place, and the summary
+    goes last, so readers of data/processed see either the previous results
+    or this job's complete ones.
+    
+    Args:
+        output_dir (str): The job's own output directory
+        processed_dir (str): data/processed
+    
+    Returns:
+        dict: The job's analysis summary, or None if it wrote none
+    """
+    try:
+        with open(os.path.join(output_dir, 'analysis_summary.json')) as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    plots_dir = os.path.join(output_dir, 'plots')
+    plots = sorted(os.listdir(plots_dir)) if os.path.isdir(plots_dir) else []
+    for name in [os.path.join('plots', plot) for plot in plots] + ['rfm_clustered.csv', 'analysis_summary.json']:
+        source = os.path.join(output_dir, name)
+        if os.path.exists(source):
+            target = os.path.join(processed_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+    return summary
 
-print("Starting analysis...")
+def store_upload(temp_path, filename):
+    """
+    Name a saved upload by its contents
+    
+    Identical uploads share one file and a concurrent upload with the same
+    name cannot overwrite a running job's input.
+    
+    Args:
+        temp_path (str): Upload saved under a unique temporary name
+        filename (str): Sanitized client file name
+    
+    Returns:
+        str: Final path of the upload
+    """
+    fingerprint = input_fingerprint(temp_path)
+    upload_path = os.path.join(os.path.dirname(temp_path), f"{fingerprint[:16]}_{filename}")
+    os.replace(temp_path, upload_path)
+    record_upload(os.path.getsize(upload_path))
+    return upload_path
 
-# Load and process data
-print("Loading and cleaning data...")
-data = load_and_clean_data('{dataset_path}')
-if data is not None:
-    print(f"Data loaded successfully: {{len(data)}} rows")
+def submit_analysis(app, dataset_path, needs_download, analysis_params, priority=JOB_PRIORITIES['normal']):
+    """
+    Queue an analysis job, joining an identical one already in flight
     
-    print("Calculating RFM metrics...")
-    rfm_data = calculate_rfm(data)
-    if rfm_data is not None:
-        print(f"RFM calculated successfully: {{len(rfm_data)}} customers")
-        
-        print("Performing clustering...")
-        clustered_data, optimal_clusters, model = perform_clustering(rfm_data, {analysis_params.get('num_clusters', 4)})
-        if clustered_data is not None:
-            print(f"Clustering completed: {{optimal_clusters}} clusters")
-            
-            # Create output directory
-            output_dir = 'data/processed'
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Save results
-            output_path = os.path.join(output_dir, 'rfm_clustered.csv')
-            clustered_data.to_csv(output_path, index=False)
-            print(f"Results saved to: {{output_path}}")
-            
-            # Try to create visualizations (non-Streamlit version)
-            try:
-                print("Creating visualizations...")
-                viz_success = create_visualizations(clustered_data)
-                if viz_success:
-                    print("Visualizations created successfully")
-                else:
-                    print("Visualization creation failed, but continuing...")
-            except Exception as viz_error:
-                print(f"Visualization error (non-critical): {{viz_error}}")
-            
-            # Save analysis summary
-            summary = {{
-                'total_customers': len(clustered_data),
-                'num_clusters': optimal_clusters,
-                'avg_recency': float(clustered_data['Recency'].mean()),
-                'avg_frequency': float(clustered_data['Frequency'].mean()),
-                'avg_monetary': float(clustered_data['Monetary'].mean()),
-                'cluster_sizes': clustered_data['Cluster'].value_counts().to_dict(),
-                'timestamp': '{datetime.now().isoformat()}'
-            }}
-            
-            summary_path = os.path.join(output_dir, 'analysis_summary.json')
-            with open(summary_path, 'w') as f:
-                json.dump(summary, f)
-            
-            print(f"Analysis summary saved to: {{summary_path}}")
+    Blocks while the input is fingerprinted, so async callers should run it
+    in a thread.
+    
+    Args:
+        app: Flask application; the job runs inside its app context
+        dataset_path (str): Transactions to analyse
+        needs_download (bool): Download the default dataset before the analysis
+        analysis_params (dict): num_clusters, analysis_type and profile
+        priority (int): One of JOB_PRIORITIES
+    
+    Returns:
+        tuple: (AnalysisJob, coalesced)
+    
+    Raises:
+        QueueFullError: If the queue is full
+    """
+    # Identical requests (same input contents and parameters) share one
+    # job; a dataset that still has to be downloaded is identified by URL
+    input_id = DATASET_URL if needs_download else input_fingerprint(dataset_path)
+    key = job_key(input_id, analysis_params)
+    memory_mb = DEFAULT_DATASET_MEMORY_MB if needs_download else estimate_job_memory(dataset_path)
+    
+    # The background thread needs its own app context
+    def run_analysis():
+        with app.app_context():
+            analysis_path = dataset_path
+            if needs_download:
+                analysis_path, downloaded = download_online_retail_dataset()
+                if not downloaded:
+                    raise RuntimeError(f"Failed to download dataset: {analysis_path}")
+            if current_job().cancel_event.is_set():
+                raise JobCancelledError("Cancelled before the analysis started")
+            print("Starting background analysis...")
+            success, stdout, stderr, summary = run_streamlit_analysis(analysis_path, analysis_params)
+        if success:
             print("Analysis completed successfully")
+            print(f"STDOUT: {stdout}")
         else:
-            print("Clustering failed")
-    else:
-        print("RFM calculation failed")
-else:
-    print("Data loading failed")
-"""
-        
-        # Save the script
-        script_path = os.path.join(current_app.root_path, '..', 'temp_analysis.py')
-        with open(script_path, 'w') as f:
-            f.write(script_content)
-        
-        print(f"Analysis script created: {script_path}")
-        
-        # Run the analysis
-        result = subprocess.run(['python', script_path], 
-                              capture_output=True, text=True, 
-                              cwd=os.path.join(current_app.root_path, '..'))
-        
-        print(f"Analysis process completed with return code: {result.returncode}")
-        print(f"STDOUT: {result.stdout}")
-        if result.stderr:
-            print(f"STDERR: {result.stderr}")
-        
-        # Clean up
-        if os.path.exists(script_path):
-            os.remove(script_path)
-        
-        return result.returncode == 0, result.stdout, result.stderr
-        
-    except Exception as e:
-        return False, "", str(e)
+            print(f"Analysis failed: {stderr}")
+            print(f"STDOUT: {stdout}")
+            raise RuntimeError(stderr or 'Analysis failed')
+        result = {'dataset_path': analysis_path}
+        if summary:
+            # This job's own summary, not whichever job published last
+            result['timings'] = summary.get('timings')
+            if summary.get('profile_path'):
+                result['profile_path'] = summary['profile_path']
+        return result
+    
+    return job_manager.submit(key, analysis_params, run_analysis, priority=priority, memory_mb=memory_mb)
+
+def analysis_progress_status(root_path):
+    """
+    Progress of the latest analysis, read from its output files
+    
+    Args:
+        root_path (str): Flask application root path
+    
+    Returns:
+        dict: progress (0-100), status and message, plus the summary once completed
+    """
+    # Check if analysis is complete
+    summary_path = os.path.join(root_path, '..', 'data', 'processed', 'analysis_summary.json')
+    if os.path.exists(summary_path):
+        try:
+            with open(summary_path, 'r') as f:
+                summary = json.load(f)
+            return {
+                'progress': 100,
+                'status': 'completed',
+                'message': 'Analysis completed successfully',
+                'summary': summary
+            }
+        except:
+            pass
+    
+    # Check if analysis is running
+    clustered_path = os.path.join(root_path, '..', 'data', 'processed', 'rfm_clustered.csv')
+    if os.path.exists(clustered_path):
+        return {
+            'progress': 75,
+            'status': 'processing',
+            'message': 'Generating visualizations...'
+        }
+    
+    # Check if the default dataset is still downloading
+    excel_path = os.path.join(root_path, '..', 'data', 'Online_Retail.xlsx')
+    download = dataset_fetcher.progress(excel_path)
+    if download:
+        percent = 100 * download['downloaded'] / download['total'] if download['total'] else 0
+        return {
+            'progress': int(percent * 0.25),
+            'status': 'downloading',
+            'message': f"Fetching dataset... {download['downloaded'] / 1e6:.1f} MB"
+        }
+    
+    return {
+        'progress': 0,
+        'status': 'not_started',
+        'message': 'Analysis not started'
+    }
+
+def export_file_name():
+    """Download name for the clustered customer data"""
+    return f"janah_segments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
 @main.route('/')
 @main.route('/home')
@@ -295,40 +476,40 @@ def run_segmentation():
         data_source = request.form.get('dataSource', 'default')
         num_clusters = int(request.form.get('numClusters', 4))
         analysis_type = request.form.get('analysisType', 'rfm')
+        priority = JOB_PRIORITIES.get(request.form.get('priority', 'normal'), JOB_PRIORITIES['normal'])
+        profile = request.form.get('profile', 'false').lower() == 'true'
         
         print(f"Starting analysis with data_source={data_source}, num_clusters={num_clusters}")
         
         # Determine dataset path
+        needs_download = False
         if data_source == 'upload' and 'file' in request.files:
             file = request.files['file']
             if file and file.filename != '' and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
-                upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                file.save(upload_path)
-                dataset_path = upload_path
+                # Save under a unique name, then name the file by its contents so
+                # identical uploads share one file and a concurrent upload with
+                # the same name cannot overwrite a running job's input
+                temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+                file.save(temp_path)
+                dataset_path = store_upload(temp_path, filename)
                 print(f"Using uploaded file: {dataset_path}")
             else:
                 return jsonify({'success': False, 'error': 'Invalid file type'})
         else:
             # Use default dataset
-            dataset_path = os.path.join(current_app.root_path, '..', 'data', 'online_retail.csv')
+            dataset_path = default_dataset_path()
             print(f"Looking for default dataset at: {dataset_path}")
             
-            # Download if not exists
-            if not os.path.exists(dataset_path):
-                print("Dataset not found, attempting download...")
-                file_path, success = download_online_retail_dataset()
-                if not success:
-                    error_msg = f'Failed to download dataset: {file_path}'
-                    print(f"Download failed: {error_msg}")
-                    return jsonify({'success': False, 'error': error_msg})
-                else:
-                    print(f"Dataset downloaded successfully to: {file_path}")
+            # Download in the background thread if it does not exist yet
+            needs_download = not os.path.exists(dataset_path)
+            if needs_download:
+                print("Dataset not found, it will be downloaded before the analysis starts")
             else:
                 print("Dataset found at existing location")
         
         # Verify dataset exists
-        if not os.path.exists(dataset_path):
+        if not needs_download and not os.path.exists(dataset_path):
             error_msg = f'Dataset file not found at: {dataset_path}'
             print(f"Dataset verification failed: {error_msg}")
             return jsonify({'success': False, 'error': error_msg})
@@ -336,34 +517,35 @@ def run_segmentation():
         # Analysis parameters
         analysis_params = {
             'num_clusters': num_clusters,
-            'analysis_type': analysis_type
+            'analysis_type': analysis_type,
+            'profile': profile
         }
         
         print(f"Analysis parameters: {analysis_params}")
         
-        # Run analysis in background
-        def run_analysis():
-            try:
-                print("Starting background analysis...")
-                success, stdout, stderr = run_streamlit_analysis(dataset_path, analysis_params)
-                if success:
-                    print("Analysis completed successfully")
-                    print(f"STDOUT: {stdout}")
-                else:
-                    print(f"Analysis failed: {stderr}")
-                    print(f"STDOUT: {stdout}")
-            except Exception as e:
-                print(f"Exception in background analysis: {str(e)}")
-        
-        # Start analysis in background thread
-        thread = threading.Thread(target=run_analysis)
-        thread.daemon = True
-        thread.start()
+        try:
+            job, coalesced = submit_analysis(current_app._get_current_object(), dataset_path, needs_download,
+                                             analysis_params, priority)
+        except QueueFullError as e:
+            print(f"Analysis rejected: {e}")
+            response = jsonify({
+                'success': False,
+                'error': f'The server is busy, please try again in {e.retry_after} seconds',
+                'retry_after': e.retry_after
+            })
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+        if coalesced:
+            print(f"Attached to running analysis job {job.id} ({job.subscribers} requests)")
         
         return jsonify({
             'success': True, 
-            'message': 'Analysis started successfully',
-            'dataset_path': dataset_path
+            'message': 'Joined the analysis already in progress' if coalesced else 'Analysis started successfully',
+            'job_id': job.id,
+            'coalesced': coalesced,
+            'queue_position': job_manager.queue_position(job),
+            'dataset_path': dataset_path,
+            'downloading_dataset': needs_download
         })
         
     except Exception as e:
@@ -371,6 +553,36 @@ def run_segmentation():
         print(f"Exception in run_segmentation: {error_msg}")
         return jsonify({'success': False, 'error': error_msg})
 
+@main.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Status and result of an analysis job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(dict(job.to_dict(), success=True))
+
+@main.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel an analysis job (shared jobs keep running for other requests unless forced)"""
+    force = request.args.get('force', 'false').lower() == 'true'
+    job = job_manager.cancel(job_id, force=force)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(dict(job.to_dict(), success=True))
+
+@main.route('/metrics')
+def metrics():
+    """Prometheus metrics, aggregated across gunicorn workers"""
+    body, content_type = render_metrics()
+    if body is None:
+        return jsonify({'error': 'prometheus_client is not installed'}), 501
+    return current_app.response_class(body, mimetype=None, content_type=content_type)
+
+@main.route('/api/queue-metrics')
+def queue_metrics():
+    """Analysis queue depth, concurrency, memory in use and wait times"""
+    return jsonify(job_manager.metrics())
+
 @main.route('/api/plots/<filename>')
 def serve_plot(filename):
     """Serve generated plot images"""
@@ -399,51 +611,70 @@ def test_api():
 @main.route('/api/analysis-progress')
 def analysis_progress():
     """API endpoint for analysis progress"""
-    # Check if analysis is complete
-    summary_path = os.path.join(current_app.root_path, '..', 'data', 'processed', 'analysis_summary.json')
-    if os.path.exists(summary_path):
-        try:
-            with open(summary_path, 'r') as f:
-                summary = json.load(f)
-            return jsonify({
-                'progress': 100,
-                'status': 'completed',
-                'message': 'Analysis completed successfully',
-                'summary': summary
-            })
-        except:
-            pass
-    
-    # Check if analysis is running
-    clustered_path = os.path.join(current_app.root_path, '..', 'data', 'processed', 'rfm_clustered.csv')
-    if os.path.exists(clustered_path):
-        return jsonify({
-            'progress': 75,
-            'status': 'processing',
-            'message': 'Generating visualizations...'
-        })
-    
-    return jsonify({
-        'progress': 0,
-        'status': 'not_started',
-        'message': 'Analysis not started'
-    })
+    return jsonify(analysis_progress_status(current_app.root_path))
 
 @main.route('/api/download-report')
 def download_report():
-    """API endpoint for report download (Phase 5)"""
-    return jsonify({
-        'status': 'success',
-        'message': 'Report download functionality coming in Phase 5'
-    })
+    """API endpoint for report download in TXT, HTML or PDF format"""
+    try:
+        fmt = request.args.get('format', 'txt').lower()
+        if fmt not in REPORT_FORMATS:
+            return jsonify({'error': f'Unsupported report format: {fmt}'}), 400
+        
+        clustered_path = os.path.join(current_app.root_path, '..', 'data', 'processed', 'rfm_clustered.csv')
+        if not os.path.exists(clustered_path):
+            return jsonify({'error': 'No analysis results available. Run the segmentation first.'}), 404
+        
+        report_columns = {'Recency', 'Frequency', 'Monetary', 'Cluster', 'Segment'}
+        rfm_data = pd.read_csv(clustered_path, usecols=lambda column: column in report_columns)
+        
+        analysis_params = dict(session.get('analysis_params', {}))
+        # The published summary records how the clusters were selected and
+        # which outlier filter the cleaning used
+        summary_path = os.path.join(os.path.dirname(clustered_path), 'analysis_summary.json')
+        if os.path.exists(summary_path):
+            with open(summary_path) as f:
+                analysis_summary = json.load(f)
+            for key in ('k_selection', 'outlier_strategy'):
+                if analysis_summary.get(key):
+                    analysis_params[key] = analysis_summary[key]
+        content =render_report(summarize_segments(rfm_data), analysis_params, fmt)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        
+        return send_file(
+            io.BytesIO(content),
+            mimetype=REPORT_FORMATS[fmt],
+            as_attachment=True,
+            download_name=f"janah_segmentation_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @main.route('/api/export-data')
 def export_data():
-    """API endpoint for data export (Phase 5)"""
-    return jsonify({
-        'status': 'success',
-        'message': 'Data export functionality coming in Phase 5'
-    })
+    """API endpoint that downloads the clustered customer data as CSV"""
+    clustered_path = os.path.abspath(os.path.join(current_app.root_path, '..', 'data', 'processed', 'rfm_clustered.csv'))
+    if not os.path.exists(clustered_path):
+        return jsonify({'error': 'No analysis results available. Run the segmentation first.'}), 404
+    return send_file(clustered_path, mimetype='text/csv', as_attachment=True,
+                     download_name=export_file_name())
+
+@main.route('/api/export-campaigns', methods=['POST'])
+def export_campaigns():
+    """API endpoint that writes per-segment campaign audience files"""
+    try:
+        processed_dir = os.path.join(current_app.root_path, '..', 'data', 'processed')
+        clustered_path = os.path.join(processed_dir, 'rfm_clustered.csv')
+        if not os.path.exists(clustered_path):
+            return jsonify({'success': False, 'error': 'No analysis results available. Run the segmentation first.'}), 404
+        
+        clustered_data = pd.read_csv(clustered_path)
+        manifest = export_campaign_audiences(clustered_data, os.path.join(processed_dir, 'campaigns'))
+        
+        return jsonify({'success': True, 'manifest': manifest})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @main.route('/api/share-results')
 def share_results():
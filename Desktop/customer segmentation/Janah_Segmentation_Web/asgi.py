@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point: async API endpoints with the Flask app mounted underneath
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+"""
+
+from app.async_api import create_asgi_app
+
+# Create the ASGI application instance
+app = create_asgi_app()
+
+if __name__ == "__main__":
+    import os
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -12,3 +12,37 @@ PROCESSED_FOLDER = 'data/processed'
 # Model settings
 DEFAULT_CLUSTERS = 4
 RANDOM_STATE = 42
+CLUSTERING_JOBS = 1  # Processes sweeping candidate k in the Streamlit app (1: in-process)
+
+# Dataset download settings
+DATASET_URL = 'https://archive.ics.uci.edu/ml/machine-learning-databases/00352/Online%20Retail.xlsx'
+# Hex digest of the workbook. While unset the download is not verified (the
+# fetcher warns); resumes are still checked against the server's ETag or
+# Last-Modified with If-Range
+DATASET_SHA256 = None
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 30
+DOWNLOAD_RETRIES = 3
+
+# Analysis job queue settings
+MAX_CONCURRENT_JOBS = 2
+MAX_QUEUED_JOBS = 10
+JOB_MEMORY_BUDGET_MB = 2048
+DEFAULT_DATASET_MEMORY_MB = 1200  # Estimate for the UCI dataset before it is downloaded
+
+# Analysis time budgets (seconds) per worker stage
+STAGE_TIME_BUDGETS = {
+    'startup': 120,
+    'cleaning': 600,
+    'rfm': 300,
+    'k_sweep': 900,
+    'plotting': 300
+}
+CANCEL_GRACE_SECONDS = 10  # Time to reach a checkpoint before the worker is terminated
+WORKER_POLL_SECONDS = 0.5
+
+# Async API settings (asgi.py)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+EXPORT_CHUNK_SIZE = 64 * 1024
+JOB_EVENT_POLL_SECONDS = 1.0  # How often job event streams check for changes
+WSGI_THREADS = 10  # Threads serving the Flask pages under the ASGI server
@@ -8,45 +8,48 @@ import os
 import pandas as pd
 from pathlib import Path
 
+from config.settings import (DATASET_URL, DATASET_SHA256, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_TIMEOUT,
+                             DOWNLOAD_RETRIES)
+from utils.data_processing.excel import excel_to_parquet
+from utils.datasets.fetcher import DatasetFetcher, ChecksumError
+
 def download_online_retail_dataset():
     """Download the Online Retail dataset from UCI repository"""
     
     # Dataset URL
-    url = "https://archive.ics.uci.edu/ml/machine-learning-databases/00352/Online%20Retail.xlsx"
+    url = DATASET_URL
     
     # Local file path
     data_dir = Path("data")
     data_dir.mkdir(exist_ok=True)
     
-    file_path = data_dir / "online_retail.csv"
+    file_path = data_dir / "online_retail.parquet"
     
     print("📥 Downloading Online Retail dataset from UCI repository...")
     print(f"URL: {url}")
     print(f"Local path: {file_path}")
     
     try:
-        # Download the Excel file
+        # Download the Excel file (an interrupted run resumes where it stopped)
         print("⏳ Downloading file...")
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        # Save as Excel first
         excel_path = data_dir / "online_retail.xlsx"
-        with open(excel_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        fetcher = DatasetFetcher(chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=DOWNLOAD_TIMEOUT, retries=DOWNLOAD_RETRIES)
+        fetcher.download(url, str(excel_path), DATASET_SHA256)
+        fetcher.shutdown()
         
         print("✅ Excel file downloaded successfully!")
         
-        # Convert to CSV
-        print("🔄 Converting Excel to CSV...")
-        df = pd.read_excel(excel_path)
-        df.to_csv(file_path, index=False)
+        # Stream the workbook rows straight into the Parquet transaction cache
+        print("🔄 Converting Excel to the Parquet transaction cache...")
+        stats = excel_to_parquet(str(excel_path), str(file_path))
         
         # Remove Excel file
         os.remove(excel_path)
         
         print(f"✅ Dataset converted and saved to: {file_path}")
+        print(f"⚡ Converted {stats['rows']:,} rows in {stats['seconds']}s ({stats['rows_per_second']:,.0f} rows/s)")
+        
+        df = pd.read_parquet(file_path)
         print(f"📊 Dataset shape: {df.shape}")
         print(f"📋 Columns: {list(df.columns)}")
         
@@ -59,6 +62,9 @@ def download_online_retail_dataset():
     except requests.exceptions.RequestException as e:
         print(f"❌ Error downloading file: {e}")
         return False
+    except ChecksumError as e:
+        print(f"❌ Downloaded file is corrupt: {e}")
+        return False
     except Exception as e:
         print(f"❌ Error processing file: {e}")
         return False
@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for Janah Customer Segmentation
+
+Enables prometheus_client multiprocess mode so /metrics aggregates the
+samples of every worker process.
+"""
+
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Must be set before the workers import prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'janah_prometheus'))
+
+
+def on_starting(server):
+    """Start each deployment with an empty metrics directory"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that has exited"""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
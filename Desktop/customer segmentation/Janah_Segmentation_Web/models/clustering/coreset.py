@@ -0,0 +1,59 @@
+"""
+Weighted coresets for k-means on large customer bases
+
+``KMeansCoreset`` summarizes the scaled RFM points with a lightweight
+coreset (Bachem, Lucic & Krause, 2018). Each point is sampled with
+probability
+
+    q(x) = 1/2 * 1/n + 1/2 * d(x, mean)^2 / sum of d(y, mean)^2
+
+and kept with weight 1 / (m * q(x)). One pass over the data finds the
+distances to the mean, so building the coreset costs O(n*d). Its weighted
+k-means cost approximates the full cost for every k at once. That lets the
+whole elbow/silhouette sweep and the final fit run on the coreset. All
+customers are then labelled with one nearest-centroid pass
+(``NumpyKMeans.predict``).
+"""
+
+import numpy as np
+
+
+class KMeansCoreset:
+    """
+    Lightweight k-means coreset
+
+    Args:
+        size (int): Sampled points (the input is kept as is when it is not larger)
+        random_state (int): Seed for the sampling
+
+    Attributes:
+        points_ (np.ndarray): Coreset points, shape (size, n_features)
+        weights_ (np.ndarray): Weight of each coreset point (they sum to n
+            in expectation)
+        indices_ (np.ndarray): Row of each coreset point in the input
+    """
+
+    def __init__(self, size=10000, random_state=None):
+        self.size = size
+        self.random_state = random_state
+
+    def fit(self, X):
+        """Sample the coreset of ``X`` (n_samples, n_features)"""
+        X = np.asarray(X)
+        n_rows = len(X)
+        if n_rows <= self.size:
+            self.indices_ = np.arange(n_rows)
+            self.points_ = X
+            self.weights_ = np.ones(n_rows)
+            return self
+
+        squared = ((X - X.mean(axis=0, dtype=np.float64)) ** 2).sum(axis=1)
+        total = squared.sum()
+        probabilities = 0.5 / n_rows + (0.5 * squared / total if total > 0 else 0.5 / n_rows)
+        probabilities /= probabilities.sum()
+
+        rng = np.random.default_rng(self.random_state)
+        self.indices_ = rng.choice(n_rows, size=self.size, p=probabilities)
+        self.points_ = X[self.indices_]
+        self.weights_ = 1.0 / (self.size * probabilities[self.indices_])
+        return self
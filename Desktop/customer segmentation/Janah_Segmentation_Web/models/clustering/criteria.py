@@ -0,0 +1,79 @@
+"""
+Cluster validity criteria that cost O(n*k)
+
+Silhouette scores compare every pair of rows, which is O(n^2). The
+criteria here only need each row's distance to the cluster centers, which
+the k-means fit already has. They accept ``sample_weight``, so a weighted
+coreset is scored as the rows it stands for. Without weights they match
+sklearn's ``calinski_harabasz_score`` and ``davies_bouldin_score``.
+"""
+
+import numpy as np
+
+# Whether a larger value of the criterion means a better clustering
+HIGHER_IS_BETTER = {
+    'calinski_harabasz': True,
+    'davies_bouldin': False,
+    'silhouette': True
+}
+
+
+def _cluster_summary(X, labels, sample_weight):
+    X = np.asarray(X, dtype=np.float64)
+    weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    n_clusters = int(labels.max()) + 1
+    sizes = np.bincount(labels, weights=weights, minlength=n_clusters)
+    sums = np.column_stack([np.bincount(labels, weights=X[:, j] * weights, minlength=n_clusters)
+                            for j in range(X.shape[1])])
+    centers = sums / np.where(sizes > 0, sizes, 1)[:, None]
+    return X, weights, sizes, centers
+
+
+def calinski_harabasz(X, labels, sample_weight=None):
+    """
+    Ratio of between- to within-cluster dispersion (higher is better)
+
+    Args:
+        X (np.ndarray): Features (n_samples, n_features)
+        labels (np.ndarray): Cluster of each row (0..k-1)
+        sample_weight (np.ndarray): Weight of each row
+
+    Returns:
+        float: Calinski-Harabasz index
+    """
+    X, weights, sizes, centers = _cluster_summary(X, labels, sample_weight)
+    n, k = weights.sum(), int((sizes > 0).sum())
+    if k < 2:
+        return 0.0
+    mean = weights @ X / n
+    between = float(sizes @ ((centers - mean) ** 2).sum(axis=1))
+    within = float(weights @ ((X - centers[labels]) ** 2).sum(axis=1))
+    if within == 0:
+        return 1.0
+    return between * (n - k) / (within * (k - 1))
+
+
+def davies_bouldin(X, labels, sample_weight=None):
+    """
+    Average similarity of each cluster with its closest one (lower is better)
+
+    Args:
+        X (np.ndarray): Features (n_samples, n_features)
+        labels (np.ndarray): Cluster of each row (0..k-1)
+        sample_weight (np.ndarray): Weight of each row
+
+    Returns:
+        float: Davies-Bouldin index
+    """
+    X, weights, sizes, centers = _cluster_summary(X, labels, sample_weight)
+    present = sizes > 0
+    if present.sum() < 2:
+        return 0.0
+    distances = np.sqrt(((X - centers[labels]) ** 2).sum(axis=1))
+    scatter = np.bincount(labels, weights=distances * weights, minlength=len(sizes))[present] / sizes[present]
+    centers = centers[present]
+    separation = np.sqrt(((centers[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+    # A cluster is not compared with itself (or with a coinciding center)
+    separation[separation == 0] = np.inf
+    ratios = (scatter[:, None] + scatter[None, :]) / separation
+    return float(np.mean(ratios.max(axis=1)))
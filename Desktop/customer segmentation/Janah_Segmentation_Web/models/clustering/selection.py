@@ -0,0 +1,117 @@
+"""
+Early-terminating choice of the number of clusters
+
+``KSelector`` walks the candidate k in increasing order and stops as soon
+as the criterion plateaus, instead of fitting every candidate. The cheap
+O(n*k) criteria of models/clustering/criteria.py (Calinski-Harabasz,
+Davies-Bouldin) stand in for the O(n^2) silhouette. The 'elbow' criterion
+stops once one more cluster cuts the inertia by less than ``elbow_tol``.
+With ``n_jobs > 1`` the candidates are evaluated in batches by ``sweep_k``.
+A batch is never larger than the number of non-improving candidates that
+would still trigger the stop, so the batches fit exactly the candidates a
+serial walk would, just several at a time.
+"""
+
+import os
+
+from models.clustering.criteria import HIGHER_IS_BETTER
+from models.clustering.sweep import CRITERIA, sweep_k
+
+SELECTION_CRITERIA = ('calinski_harabasz', 'davies_bouldin', 'silhouette', 'elbow')
+
+
+class KSelector:
+    """
+    Pick k for k-means, stopping once the criterion stops improving
+
+    Args:
+        k_min (int): Smallest candidate
+        k_max (int): Largest candidate
+        criterion (str): One of ``SELECTION_CRITERIA``
+        patience (int): Candidates without improvement before stopping
+        elbow_tol (float): Smallest relative inertia drop that still counts
+            as an improvement for the 'elbow' criterion
+        n_init (int): k-means++ starts per candidate
+        random_state (int): Seed for the fits
+        n_jobs (int): Most candidates evaluated at once, one per process
+            (None: all cores)
+
+    Attributes:
+        k_ (int): Selected number of clusters
+        criterion_ (str): Criterion the selection used
+        scores_ (dict): Criterion value of each evaluated k (for 'elbow',
+            the relative inertia drop from k - 1)
+        inertias_ (dict): Inertia of each evaluated k
+        n_fits_ (int): Candidates fitted
+        stopped_early_ (bool): Whether candidates were left unevaluated
+    """
+
+    def __init__(self, k_min=2, k_max=10, criterion='calinski_harabasz', patience=2, elbow_tol=0.1,
+                 n_init=3, random_state=None, n_jobs=1):
+        if criterion not in SELECTION_CRITERIA:
+            raise ValueError(f"Unknown criterion: {criterion}. Use one of {SELECTION_CRITERIA}")
+        self.k_min = k_min
+        self.k_max = k_max
+        self.criterion = criterion
+        self.patience = patience
+        self.elbow_tol = elbow_tol
+        self.n_init = n_init
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+
+    def _improves(self, score, best_score):
+        if self.criterion == 'elbow':
+            return score is None or score >= self.elbow_tol
+        if HIGHER_IS_BETTER[self.criterion]:
+            return score > best_score
+        return score < best_score
+
+    def fit(self, X, sample_weight=None):
+        """
+        Evaluate candidates on ``X`` until the criterion plateaus
+
+        Args:
+            X (np.ndarray): Standardized features (n_samples, n_features)
+            sample_weight (np.ndarray): Weight of each row (e.g. coreset weights)
+        """
+        candidates = list(range(self.k_min, min(self.k_max, len(X) - 1) + 1))
+        if not candidates:
+            raise ValueError(f"n_samples={len(X)} is too small for k_min={self.k_min}")
+        max_batch = self.n_jobs or os.cpu_count() or 1
+        self.criterion_ = self.criterion
+        self.scores_ = {}
+        self.inertias_ = {}
+
+        best_k, best_score, since_best = None, None, 0
+        start = 0
+        while start < len(candidates):
+            # Only the fits that could still end the walk; any more would be wasted on a plateau
+            batch = candidates[start:start + min(max_batch, max(self.patience - since_best, 1))]
+            start += len(batch)
+            results = sweep_k(X, batch, n_jobs=self.n_jobs,
+                              silhouette=self.criterion == 'silhouette', sample_weight=sample_weight,
+                              criterion=self.criterion if self.criterion in CRITERIA else None,
+                              random_state=self.random_state, n_init=self.n_init)
+            for result in results:
+                k = result['k']
+                self.inertias_[k] = result['inertia']
+                if self.criterion == 'elbow':
+                    previous = self.inertias_.get(k - 1)
+                    score = (previous - result['inertia']) / previous if previous else None
+                elif self.criterion == 'silhouette':
+                    score = result['silhouette']
+                else:
+                    score = result['score']
+                self.scores_[k] = score
+
+                if best_k is None or self._improves(score, best_score):
+                    best_k, best_score, since_best = k, score, 0
+                else:
+                    since_best += 1
+            if since_best >= self.patience:
+                break
+
+        self.k_ = best_k
+        self.n_fits_ = len(self.inertias_)
+        self.stopped_early_ = self.n_fits_ < len(candidates)
+        return self
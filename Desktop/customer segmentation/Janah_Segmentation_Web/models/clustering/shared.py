@@ -0,0 +1,100 @@
+"""
+Shared-memory feature matrices for clustering workers
+
+A k-sweep or a restart fan-out sends the same standardized RFM matrix to
+every worker. ``SharedMatrix`` copies it once into a POSIX shared memory
+segment and hands out a small picklable ``spec`` (segment name, shape and
+dtype) instead; workers call ``attach_matrix(spec)`` to map the segment
+zero-copy as a read-only array.
+
+The creating process owns the segment. It is unlinked when the
+``SharedMatrix`` is closed or leaves its ``with`` block, when the object is
+garbage collected, and at interpreter exit, so a failed job or a crashed
+worker cannot leave it behind. If the owner itself is killed,
+multiprocessing's resource tracker unlinks the segment.
+"""
+
+import weakref
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _release(block):
+    try:
+        block.close()
+    except BufferError:
+        # A view is still alive; the mapping goes away with it
+        pass
+    try:
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SharedMatrix:
+    """
+    A NumPy array copied into a shared memory segment
+
+    Args:
+        array (np.ndarray): Matrix to share (copied once, C order)
+        dtype (str): Stored dtype (default: the array's own)
+
+    Attributes:
+        array (np.ndarray): The owner's view of the segment
+        spec (tuple): (segment name, shape, dtype) for ``attach_matrix``
+    """
+
+    def __init__(self, array, dtype=None):
+        array = np.ascontiguousarray(array, dtype=dtype)
+        self._block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._finalizer = weakref.finalize(self, _release, self._block)
+        self.array = np.ndarray(array.shape, array.dtype, buffer=self._block.buf)
+        self.array[...] = array
+        self.spec = (self._block.name, array.shape, array.dtype.str)
+
+    @property
+    def name(self):
+        return self._block.name
+
+    @property
+    def closed(self):
+        return not self._finalizer.alive
+
+    def close(self):
+        """Release the owner's view and unlink the segment"""
+        self.array = None
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@contextmanager
+def attach_matrix(spec):
+    """
+    Map a ``SharedMatrix`` by its spec, without copying
+
+    Args:
+        spec (tuple): ``SharedMatrix.spec``
+
+    Yields:
+        np.ndarray: Read-only view of the shared matrix; copy anything that
+        must outlive the ``with`` block
+    """
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype, buffer=block.buf)
+    array.flags.writeable = False
+    try:
+        yield array
+    finally:
+        del array
+        try:
+            block.close()
+        except BufferError:
+            pass
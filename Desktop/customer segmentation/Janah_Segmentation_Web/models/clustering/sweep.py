@@ -0,0 +1,101 @@
+"""
+Parallel k-sweep over a shared feature matrix
+
+``sweep_k`` fits one ``NumpyKMeans`` per candidate k and scores it, which
+is what the elbow/silhouette search in ``perform_clustering`` needs. With
+``n_jobs > 1`` the candidates run in a process pool. The standardized
+features are placed once in a ``SharedMatrix``, stored feature-major as
+float32, which is the layout ``NumpyKMeans`` works in. Workers then attach
+to it and fit on its transpose without copying it. Each worker runs
+``NumpyKMeans`` single-threaded so the pool does not oversubscribe the
+cores. The pool starts its workers from a forkserver (spawn where there is
+none), never by forking the caller: the Flask and Streamlit servers that
+call this are multithreaded, and a forked child can inherit a lock another
+thread was holding.
+
+A weighted coreset (models/clustering/coreset.py) can be swept in place of
+all rows by passing its weights as ``sample_weight``; the weights are small
+enough to send to the workers as they are. Silhouette scores ignore the
+weights (sklearn has no weighted silhouette), so on a coreset they score
+the sampled points. The O(n*k) criteria of models/clustering/criteria.py
+(``criterion``) do use them.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import silhouette_score
+
+from models.clustering.criteria import calinski_harabasz, davies_bouldin
+from models.clustering.kmeans import NumpyKMeans
+from models.clustering.shared import SharedMatrix, attach_matrix
+
+
+POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+CRITERIA = {
+    'calinski_harabasz': calinski_harabasz,
+    'davies_bouldin': davies_bouldin
+}
+
+
+def evaluate_k(features, k, silhouette=True, sample_weight=None, criterion=None, **params):
+    """
+    Fit k-means with ``k`` clusters and score the result
+
+    Args:
+        features (np.ndarray): Standardized features (n_samples, n_features)
+        k (int): Number of clusters
+        silhouette (bool): Also compute the silhouette score
+        sample_weight (np.ndarray): Weight of each row
+        criterion (str): Also compute this ``CRITERIA`` entry as the score
+        **params: Further ``NumpyKMeans`` parameters
+
+    Returns:
+        dict: k, inertia, silhouette and score (None when not computed)
+    """
+    model = NumpyKMeans(n_clusters=k, **params).fit(features, sample_weight)
+    score = None
+    if silhouette:
+        score = float(silhouette_score(features, model.labels_)) if k > 1 else 0.0
+    result = {'k': k, 'inertia': model.inertia_, 'silhouette': score, 'score': None}
+    if criterion is not None:
+        result['score'] = float(CRITERIA[criterion](features, model.labels_, sample_weight))
+    return result
+
+
+def _evaluate_shared(spec, k, silhouette, sample_weight, criterion, params):
+    with attach_matrix(spec) as features_t:
+        return evaluate_k(features_t.T, k, silhouette, sample_weight, criterion, n_jobs=1, **params)
+
+
+def sweep_k(features, k_values, n_jobs=1, silhouette=True, sample_weight=None, criterion=None, **params):
+    """
+    Evaluate every candidate k, optionally across processes
+
+    Args:
+        features (np.ndarray): Standardized features (n_samples, n_features)
+        k_values (iterable): Candidate numbers of clusters
+        n_jobs (int): Worker processes (None: all cores; 1: in this process)
+        silhouette (bool): Also compute silhouette scores
+        sample_weight (np.ndarray): Weight of each row (e.g. coreset weights)
+        criterion (str): Also score every candidate with this ``CRITERIA`` entry
+        **params: Further ``NumpyKMeans`` parameters (random_state, n_init, ...)
+
+    Returns:
+        list: One ``evaluate_k`` result per candidate, in ``k_values`` order
+    """
+    k_values = list(k_values)
+    features_t = np.ascontiguousarray(np.asarray(features, dtype=np.float32).T)
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(k_values))
+    if n_jobs <= 1:
+        return [evaluate_k(features_t.T, k, silhouette, sample_weight, criterion, **params) for k in k_values]
+
+    # The pool exits (waiting for every worker) before the matrix is unlinked
+    with SharedMatrix(features_t) as shared, ProcessPoolExecutor(max_workers=n_jobs, mp_context=POOL_CONTEXT) as pool:
+        n = len(k_values)
+        return list(pool.map(_evaluate_shared, [shared.spec] * n, k_values, [silhouette] * n,
+                             [sample_weight] * n, [criterion] * n, [params] * n))
@@ -1,88 +1,223 @@
 import json
 import os
 import sys
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import hashlib
 from http.server import BaseHTTPRequestHandler
-import pandas as pd
-import numpy as np
 from datetime import datetime
 
-# Add the parent directory to the path to import our modules
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+
+# Add the project root to the path to import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-def load_and_clean_data(file_path):
-    """Load and clean the dataset"""
-    try:
-        data = pd.read_csv(file_path, encoding='latin-1')
-        
-        # Remove rows with missing CustomerID
-        data = data.dropna(subset=['CustomerID'])
-        
-        # Drop duplicates
-        data = data.drop_duplicates()
-        
-        # Convert InvoiceDate to datetime
-        data['InvoiceDate'] = pd.to_datetime(data['InvoiceDate'])
-        
-        # Remove negative quantities and prices
-        data = data[(data['Quantity'] > 0) & (data['UnitPrice'] > 0)]
-        
-        return data
-    except Exception as e:
-        return None
-
-def calculate_rfm(data):
-    """Calculate RFM metrics"""
-    try:
-        # Find the latest date
-        latest_date = data['InvoiceDate'].max()
-        
-        # Calculate RFM metrics
-        rfm = data.groupby('CustomerID').agg({
-            'InvoiceDate': lambda x: (latest_date - x.max()).days,  # Recency
-            'InvoiceNo': 'nunique',  # Frequency
-            'Quantity': lambda x: (x * data.loc[x.index, 'UnitPrice']).sum()  # Monetary
-        }).reset_index()
-        
-        rfm.columns = ['CustomerID', 'Recency', 'Frequency', 'Monetary']
-        
-        # Remove negative monetary values
-        rfm = rfm[rfm['Monetary'] > 0]
-        
-        return rfm
-    except Exception as e:
-        return None
-
-def perform_clustering(rfm_data, n_clusters=4):
-    """Perform K-means clustering"""
+from models.clustering.kmeans import NumpyKMeans
+
+# Latency budgets measured by benchmark.py (benchmark_serverless_handler).
+# The module imports only NumPy and the NumPy k-means in
+# models/clustering/kmeans.py; pandas (~0.3s) is loaded lazily for non-ISO
+# dates and sklearn (~0.8s) is never imported.
+COLD_START_BUDGET_SECONDS = 0.5
+WARM_LATENCY_BUDGET_SECONDS = 0.25  # 5,000 transactions, 4 clusters
+
+RANDOM_STATE = 42
+N_INIT = 10
+
+# Segment names from the most to the least valuable cluster
+SEGMENT_NAMES = ["High-Value Customers", "Loyal Customers", "New Customers",
+                 "At-Risk Customers", "Inactive Customers"]
+TRANSACTION_FIELDS = ['CustomerID', 'InvoiceNo', 'InvoiceDate', 'Quantity', 'UnitPrice']
+# Read when posted: part of the duplicate-row key, as in DEDUP_KEY_COLUMNS
+# (utils/data_processing/dedup.py), so distinct products on one invoice stay apart
+OPTIONAL_FIELDS = ['StockCode']
+
+# Warm cache: the last analysis served by this instance
+_last_model = {'key': None, 'result': None}
+_cold_start = {'pending': True, 'import_seconds': None}
+
+
+def parse_transactions(request_data):
+    """
+    Read the posted transactions into NumPy columns
+
+    Accepts ``transactions`` as a list of records or as a dict of column
+    lists, or ``csv`` as the text of a CSV file.
+
+    Returns:
+        dict: Column name -> np.ndarray (``OPTIONAL_FIELDS`` only when posted)
+    """
+    fields = TRANSACTION_FIELDS + OPTIONAL_FIELDS
+    if 'csv' in request_data:
+        import csv
+        import io
+        reader = csv.DictReader(io.StringIO(request_data['csv']))
+        rows = list(reader)
+        columns = {field: [row.get(field) for row in rows] for field in fields if field in (reader.fieldnames or [])}
+    else:
+        transactions = request_data.get('transactions')
+        if isinstance(transactions, dict):
+            columns = transactions
+        elif isinstance(transactions, list):
+            posted = {field for row in transactions for field in row}
+            columns = {field: [row.get(field) for row in transactions] for field in fields if field in posted}
+        else:
+            raise ValueError("Post 'transactions' (records or columns) or 'csv'")
+
+    missing = [field for field in TRANSACTION_FIELDS if field not in columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return {field: np.asarray(columns[field], dtype=object) for field in fields if field in columns}
+
+
+def parse_dates(values):
+    """Parse invoice dates to datetime64[s], with a pandas fallback for non-ISO formats"""
+    strings = values.astype(str)
     try:
-        from sklearn.cluster import KMeans
-        from sklearn.preprocessing import StandardScaler
-        
-        # Prepare data for clustering
-        rfm_clustering = rfm_data[['Recency', 'Frequency', 'Monetary']].copy()
-        
-        # Standardize the data
-        scaler = StandardScaler()
-        rfm_scaled = scaler.fit_transform(rfm_clustering)
-        
-        # Perform K-means clustering
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        rfm_data['Cluster'] = kmeans.fit_predict(rfm_scaled)
-        
-        # Add cluster labels
-        cluster_labels = {
-            0: "Loyal Customers",
-            1: "At-Risk Customers", 
-            2: "New Customers",
-            3: "High-Value Customers",
-            4: "Inactive Customers"
+        return strings.astype('datetime64[s]')
+    except ValueError:
+        import pandas as pd
+        return pd.to_datetime(strings, format='mixed').values.astype('datetime64[s]')
+
+
+def clean_transactions(columns):
+    """
+    Drop rows without a customer, duplicate rows and non-positive quantities or prices
+
+    Returns:
+        tuple: (customer ids, invoice numbers, dates, amounts) of the kept rows
+    """
+    customers = columns['CustomerID']
+    has_customer = np.array([value not in (None, '') and value == value for value in customers], dtype=bool)
+    quantity = np.asarray(columns['Quantity'][has_customer], dtype=float)
+    price = np.asarray(columns['UnitPrice'][has_customer], dtype=float)
+    customers = customers[has_customer].astype(str)
+    invoices = columns['InvoiceNo'][has_customer].astype(str)
+    dates = parse_dates(columns['InvoiceDate'][has_customer])
+    key = [customers, invoices, dates, quantity, price]
+    if 'StockCode' in columns:
+        key.append(columns['StockCode'][has_customer].astype(str))
+
+    # Duplicate rows: identical values in every posted column, StockCode included
+    codes = np.column_stack([np.unique(values, return_inverse=True)[1] for values in key])
+    _, first_rows = np.unique(codes, axis=0, return_index=True)
+    keep = np.zeros(len(codes), dtype=bool)
+    keep[first_rows] = True
+    keep &= (quantity > 0) & (price > 0)
+    return customers[keep], invoices[keep], dates[keep], quantity[keep] * price[keep]
+
+
+def calculate_rfm(customers, invoices, dates, amounts):
+    """
+    Vectorized RFM metrics per customer
+
+    Returns:
+        tuple: (customer ids, np.ndarray of shape (n_customers, 3) with Recency, Frequency, Monetary)
+    """
+    customer_ids, customer_codes = np.unique(customers, return_inverse=True)
+    n_customers = len(customer_ids)
+    seconds = dates.astype('int64')
+
+    last_seen = np.full(n_customers, np.iinfo('int64').min)
+    np.maximum.at(last_seen, customer_codes, seconds)
+    recency = (seconds.max() - last_seen) // 86400
+
+    invoice_codes = np.unique(invoices, return_inverse=True)[1]
+    customer_invoices = np.unique(customer_codes.astype('int64') * (invoice_codes.max() + 1) + invoice_codes)
+    frequency = np.bincount(customer_invoices // (invoice_codes.max() + 1), minlength=n_customers)
+
+    monetary = np.bincount(customer_codes, weights=amounts, minlength=n_customers)
+    return customer_ids, np.column_stack([recency, frequency, monetary]).astype(float)
+
+
+def name_segments(centers):
+    """Name clusters by value: low recency, high frequency and high monetary rank first"""
+    value = -centers[:, 0] + centers[:, 1] + centers[:, 2]
+    order = np.argsort(-value)
+    names = {}
+    for rank, cluster in enumerate(order):
+        if len(centers) <= len(SEGMENT_NAMES):
+            position = int(round(rank * (len(SEGMENT_NAMES) - 1) / max(len(centers) - 1, 1)))
+            names[int(cluster)] = SEGMENT_NAMES[position]
+        else:
+            names[int(cluster)] = f"Segment {rank + 1}"
+    return names
+
+
+def run_segmentation(request_data):
+    """
+    RFM analysis and k-means clustering of the posted transactions
+
+    Returns:
+        dict: Analysis summary
+    """
+    columns = parse_transactions(request_data)
+    customer_ids, rfm = calculate_rfm(*clean_transactions(columns))
+    rfm = rfm[rfm[:, 2] > 0]
+    if len(rfm) == 0:
+        raise ValueError("No valid transactions to analyse")
+
+    n_clusters = max(1, min(int(request_data.get('n_clusters', 4)), len(rfm)))
+    std = rfm.std(axis=0)
+    scaled = (rfm - rfm.mean(axis=0)) / np.where(std > 0, std, 1)
+    model = NumpyKMeans(n_clusters=n_clusters, n_init=N_INIT, random_state=RANDOM_STATE).fit(scaled)
+    labels, centers, inertia = model.labels_, model.cluster_centers_, model.inertia_
+    names = name_segments(centers)
+
+    segments = {}
+    for cluster, name in names.items():
+        members = rfm[labels == cluster]
+        segments[name] = {
+            'customers': int(len(members)),
+            'avg_recency': round(float(members[:, 0].mean()), 2) if len(members) else None,
+            'avg_frequency': round(float(members[:, 1].mean()), 2) if len(members) else None,
+            'avg_monetary': round(float(members[:, 2].mean()), 2) if len(members) else None
         }
-        
-        rfm_data['Segment'] = rfm_data['Cluster'].map(cluster_labels)
-        
-        return rfm_data
-    except Exception as e:
-        return None
+
+    return {
+        'status': 'completed',
+        'total_customers': int(len(rfm)),
+        'n_clusters': n_clusters,
+        'avg_recency': round(float(rfm[:, 0].mean()), 2),
+        'avg_frequency': round(float(rfm[:, 1].mean()), 2),
+        'avg_monetary': round(float(rfm[:, 2].mean()), 2),
+        'inertia': round(inertia, 4),
+        'cluster_sizes': {name: segment['customers'] for name, segment in segments.items()},
+        'segments': segments
+    }
+
+
+def handle_segmentation(body):
+    """
+    Serve one segmentation request, reusing the warm cache for a repeated request
+
+    Args:
+        body (bytes): Raw JSON request body
+
+    Returns:
+        dict: Analysis summary with cache and latency information
+    """
+    started = time.perf_counter()
+    key = hashlib.sha256(body).hexdigest()
+    cached = _last_model['key'] == key
+    if cached:
+        result = dict(_last_model['result'])
+    else:
+        result = run_segmentation(json.loads(body.decode('utf-8')))
+        _last_model['key'], _last_model['result'] = key, dict(result)
+
+    result['cached'] = cached
+    result['timings'] = {
+        'cold_start': _cold_start['pending'],
+        'import_seconds': _cold_start['import_seconds'],
+        'handler_seconds': round(time.perf_counter() - started, 4)
+    }
+    _cold_start['pending'] = False
+    result['timestamp'] = datetime.now().isoformat()
+    return result
+
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -92,70 +227,55 @@ class handler(BaseHTTPRequestHandler):
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            
+
             response = {
                 'status': 'healthy',
                 'message': 'Janah Segmentation API is running',
                 'timestamp': datetime.now().isoformat()
             }
-            
+
             self.wfile.write(json.dumps(response).encode())
             return
-        
+
         self.send_response(404)
         self.end_headers()
         self.wfile.write(json.dumps({'error': 'Not found'}).encode())
-    
+
     def do_POST(self):
         """Handle POST requests"""
         if self.path == '/api/run-segmentation':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
             try:
                 # Get request body
                 content_length = int(self.headers['Content-Length'])
                 post_data = self.rfile.read(content_length)
-                request_data = json.loads(post_data.decode('utf-8'))
-                
-                # Simulate analysis (in a real app, you'd process actual data)
-                analysis_result = {
-                    'status': 'completed',
-                    'total_customers': 1000,
-                    'n_clusters': 4,
-                    'avg_recency': 45.2,
-                    'avg_monetary': 1250.0,
-                    'cluster_sizes': {
-                        'Loyal Customers': 250,
-                        'At-Risk Customers': 200,
-                        'New Customers': 300,
-                        'High-Value Customers': 250
-                    },
-                    'timestamp': datetime.now().isoformat()
-                }
-                
-                self.wfile.write(json.dumps(analysis_result).encode())
-                
+                analysis_result = handle_segmentation(post_data)
+                status = 200
             except Exception as e:
-                error_response = {
+                analysis_result = {
                     'status': 'error',
                     'message': str(e),
                     'timestamp': datetime.now().isoformat()
                 }
-                self.wfile.write(json.dumps(error_response).encode())
-            
+                status = 400
+
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(analysis_result).encode())
             return
-        
+
         self.send_response(404)
         self.end_headers()
         self.wfile.write(json.dumps({'error': 'Not found'}).encode())
-    
+
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers() 
\ No newline at end of file
+        self.end_headers()
+
+
+_cold_start['import_seconds'] = round(time.perf_counter() - _IMPORT_STARTED, 4)
@@ -9,14 +9,32 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import silhouette_score
 import warnings
+import hashlib
+import io
 import os
+import sys
 from datetime import datetime
 import json
 
+# Add the project root to the path to import our modules (appended so the
+# local ``streamlit`` package never shadows the real library)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import CLUSTERING_JOBS
+from utils.reporting.report import summarize_segments, render_report
+from utils.campaigns.export import export_campaign_audiences
+from utils.data_processing.outliers import OutlierFilter
+from utils.data_processing.dedup import HashDeduplicator
+from utils.data_processing.cleaner import transaction_cleaning_plan
+from utils.data_processing.rfm import PartitionedRFM, aggregate_customers, finish_rfm, sharded_rfm
+from utils.data_processing.loader import (prepare_transactions, read_transactions, iter_transactions,
+                                          required_columns, source_name)
+from models.clustering.kmeans import NumpyKMeans
+from models.clustering.selection import KSelector
+from models.clustering.coreset import KMeansCoreset
+
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
 
@@ -56,94 +74,116 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def load_and_clean_data(file_path):
+def load_and_clean_data(file_path, chunksize=None, outlier_strategy='iqr', file_name=None, analysis='rfm'):
     """
     Load and clean the dataset
     
     Args:
-        file_path (str): Path to the CSV file
+        file_path (str or buffer): Path to the CSV, Excel or Parquet file,
+            or its contents (bytes, memoryview or a binary file object)
+        chunksize (int): Read the file in chunks of this many rows; outlier
+            bounds then come from streaming quantile sketches
+        outlier_strategy (str): 'iqr', 'mad' or 'percentile'
+        file_name (str): Original file name, giving the format of in-memory contents
+        analysis (str): Analysis the data is loaded for; only its columns
+            (and the duplicate-row key) are read. None reads every column
         
     Returns:
         pd.DataFrame: Cleaned dataset
     """
     try:
         # Load the dataset
-        st.info(f"📂 Loading dataset from: {file_path}")
-        data = pd.read_csv(file_path, encoding='latin-1')
-        
-        # Display initial data info
-        st.write(f"**Initial dataset shape:** {data.shape}")
-        st.write(f"**Columns:** {list(data.columns)}")
+        st.info(f"📂 Loading dataset from: {source_name(file_path, file_name)}")
+        
+        # Excel workbooks are streamed once into a Parquet transaction cache
+        file_path, conversion = prepare_transactions(file_path)
+        if conversion:
+            st.info(f"📗 Converted {conversion['rows']:,} Excel rows in {conversion['seconds']}s "
+                    f"({conversion['rows_per_second']:,.0f} rows/s)")
+        
+        outlier_filter = OutlierFilter(['Quantity', 'UnitPrice'], strategy=outlier_strategy)
+        deduplicator = HashDeduplicator()
+        columns = required_columns(analysis, deduplicator.columns)
+        
+        # The cleaning steps form one lazy plan: the missing-CustomerID filter
+        # runs first, then dedup, the outlier fences and the positive-value
+        # filter, and the frame is only copied once at the end
+        plan = transaction_cleaning_plan(deduplicator, outlier_filter)
+        
+        if chunksize:
+            # Clean each chunk as it is read and feed the outlier sketches, so
+            # the raw file is never materialized in full. Duplicates are
+            # tracked across chunks by their 64-bit row keys.
+            raw = {'rows': 0, 'missing': None}
+            
+            def read_chunks():
+                for chunk in iter_transactions(file_path, chunksize, file_name, columns):
+                    raw['rows'] += len(chunk)
+                    chunk_missing = chunk.isnull().sum()
+                    raw['missing'] = chunk_missing if raw['missing'] is None else raw['missing'] + chunk_missing
+                    yield chunk
+            
+            data = plan.collect_chunks(read_chunks())
+            initial_rows, missing_values = raw['rows'], raw['missing']
+            st.write(f"**Initial dataset rows:** {initial_rows} (read in chunks of {chunksize})")
+            st.write(f"**Columns:** {list(data.columns)}")
+        else:
+            data = read_transactions(file_path, file_name, columns)
+            initial_rows = len(data)
+            
+            # Display initial data info
+            st.write(f"**Initial dataset shape:** {data.shape}")
+            st.write(f"**Columns:** {list(data.columns)}")
+            
+            missing_values = data.isnull().sum()
+            data = plan.collect(data)
         
         # Check for missing values
-        missing_values = data.isnull().sum()
         if missing_values.sum() > 0:
             st.warning(f"⚠️ Found missing values:\n{missing_values[missing_values > 0]}")
         
-        # Remove rows where CustomerID is missing
-        initial_rows = len(data)
-        data = data.dropna(subset=['CustomerID'])
-        rows_after_customerid = len(data)
-        
-        if initial_rows != rows_after_customerid:
-            st.info(f"🗑️ Removed {initial_rows - rows_after_customerid} rows with missing CustomerID")
-        
-        # Drop duplicate rows
-        initial_rows = len(data)
-        data = data.drop_duplicates()
-        rows_after_dedup = len(data)
-        
-        if initial_rows != rows_after_dedup:
-            st.info(f"🗑️ Removed {initial_rows - rows_after_dedup} duplicate rows")
-        
-        # Convert CustomerID to string and remove leading/trailing spaces
-        data['CustomerID'] = data['CustomerID'].astype(str).str.strip()
-        
-        # Convert InvoiceDate to datetime
-        data['InvoiceDate'] = pd.to_datetime(data['InvoiceDate'])
+        # Report rows removed because CustomerID is missing
+        missing_customers = plan.removed_count('CustomerID is not null')
+        if missing_customers:
+            st.info(f"🗑️ Removed {missing_customers} rows with missing CustomerID")
         
-        # Filter outliers using IQR method for Quantity and UnitPrice
-        def remove_outliers_iqr(df, column):
-            Q1 = df[column].quantile(0.25)
-            Q3 = df[column].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            return df[(df[column] >= lower_bound) & (df[column] <= upper_bound)]
+        invalid_rows = plan.removed_count('Quantity > 0') + plan.removed_count('UnitPrice > 0')
+        if invalid_rows:
+            st.info(f"🗑️ Removed {invalid_rows} rows with non-positive Quantity or UnitPrice")
         
-        # Remove outliers from Quantity
-        initial_rows = len(data)
-        data = remove_outliers_iqr(data, 'Quantity')
-        rows_after_quantity = len(data)
+        if deduplicator.removed_count_:
+            st.info(f"🗑️ Removed {deduplicator.removed_count_} duplicate rows")
         
-        if initial_rows != rows_after_quantity:
-            st.info(f"🗑️ Removed {initial_rows - rows_after_quantity} rows with outlier Quantity values")
+        for column, removed in outlier_filter.removed_counts_.items():
+            if removed:
+                st.info(f"🗑️ Removed {removed} rows with outlier {column} values")
         
-        # Remove outliers from UnitPrice
-        initial_rows = len(data)
-        data = remove_outliers_iqr(data, 'UnitPrice')
-        rows_after_price = len(data)
-        
-        if initial_rows != rows_after_price:
-            st.info(f"🗑️ Removed {initial_rows - rows_after_price} rows with outlier UnitPrice values")
-        
-        # Remove negative quantities and prices
-        data = data[(data['Quantity'] > 0) & (data['UnitPrice'] > 0)]
+        st.text(plan.explain())
         
         st.success(f"✅ Data cleaning completed! Final dataset shape: {data.shape}")
         
+        # Recorded for the report's technical details
+        data.attrs['outlier_strategy'] = outlier_filter.strategy
         return data
         
     except Exception as e:
         st.error(f"❌ Error loading data: {str(e)}")
         return None
 
-def calculate_rfm(data):
+def calculate_rfm(data, out_of_core=False, n_partitions=16, n_jobs=1):
     """
     Calculate RFM (Recency, Frequency, Monetary) metrics
     
     Args:
-        data (pd.DataFrame): Cleaned transaction data
+        data (pd.DataFrame): Cleaned transaction data, or an iterable of
+            cleaned chunks when ``out_of_core`` is set
+        out_of_core (bool): Spill the transactions to disk partitioned by
+            customer and aggregate one partition at a time, so memory is
+            bounded by the largest partition (see utils/data_processing/rfm.py)
+        n_partitions (int): Spill partitions for the out-of-core mode
+        n_jobs (int): Processes aggregating partitions in the out-of-core
+            mode; in memory, more than one shards the customers across a
+            process pool reading the columns from shared memory
         
     Returns:
         pd.DataFrame: RFM metrics for each customer
@@ -151,19 +191,25 @@ def calculate_rfm(data):
     try:
         st.info("🔄 Calculating RFM metrics...")
         
-        # Find the latest date in the dataset
-        latest_date = data['InvoiceDate'].max()
-        st.write(f"**Latest transaction date:** {latest_date.strftime('%Y-%m-%d')}")
-        
-        # Calculate RFM metrics
-        rfm = data.groupby('CustomerID').agg({
-            'InvoiceDate': lambda x: (latest_date - x.max()).days,  # Recency
-            'InvoiceNo': 'nunique',  # Frequency
-            'Quantity': lambda x: (x * data.loc[x.index, 'UnitPrice']).sum()  # Monetary
-        }).reset_index()
-        
-        # Rename columns
-        rfm.columns = ['CustomerID', 'Recency', 'Frequency', 'Monetary']
+        if out_of_core:
+            if isinstance(data, pd.DataFrame):
+                data = (data.iloc[start:start + 100000] for start in range(0, len(data), 100000))
+            partitioned = PartitionedRFM(n_partitions=n_partitions, n_jobs=n_jobs)
+            rfm = partitioned.compute(data)
+            st.write(f"**Out-of-core aggregation:** {len(partitioned.partition_rows_)} partitions, "
+                     f"largest {max(partitioned.partition_rows_, default=0):,} rows, "
+                     f"{partitioned.spilled_bytes_ / 1e6:.1f}MB spilled")
+        else:
+            # Find the latest date in the dataset
+            latest_date = data['InvoiceDate'].max()
+            st.write(f"**Latest transaction date:** {latest_date.strftime('%Y-%m-%d')}")
+            
+            if n_jobs > 1:
+                rfm = sharded_rfm(data, n_jobs=n_jobs)
+            else:
+                # Calculate RFM metrics on integer customer and invoice codes; the
+                # customer IDs are only looked up again for the result
+                rfm = finish_rfm(aggregate_customers(data), latest_date)
         
         # Display RFM summary statistics
         st.write("**RFM Metrics Summary:**")
@@ -182,13 +228,20 @@ def calculate_rfm(data):
         st.error(f"❌ Error calculating RFM: {str(e)}")
         return None
 
-def perform_clustering(rfm_data, n_clusters=None):
+def perform_clustering(rfm_data, n_clusters=None, n_jobs=1, coreset_size=20000, criterion='calinski_harabasz'):
     """
     Perform K-means clustering on RFM data
     
     Args:
         rfm_data (pd.DataFrame): RFM metrics data
-        n_clusters (int): Number of clusters (if None, use elbow method)
+        n_clusters (int): Number of clusters (if None, select it with ``criterion``)
+        n_jobs (int): Processes evaluating candidate k; they share one copy
+            of the scaled features (see models/clustering/sweep.py)
+        coreset_size (int): With more customers than this, the sweep and the
+            fit run on a weighted coreset of this size and every customer is
+            then assigned to its nearest centroid (None: always use all rows)
+        criterion (str): Criterion of the early-stopping k selection
+            (see models/clustering/selection.py)
         
     Returns:
         tuple: (clustered_data, optimal_clusters, model)
@@ -203,69 +256,55 @@ def perform_clustering(rfm_data, n_clusters=None):
         scaler = StandardScaler()
         scaled_data = scaler.fit_transform(clustering_data)
         
-        # Determine optimal number of clusters using elbow method
+        # Summarize large customer bases with a weighted coreset
+        fit_data, fit_weights = scaled_data, None
+        if coreset_size and len(scaled_data) > coreset_size:
+            coreset = KMeansCoreset(size=coreset_size, random_state=42).fit(scaled_data)
+            fit_data, fit_weights = coreset.points_, coreset.weights_
+            st.write(f"📉 Clustering on a weighted coreset of {coreset_size:,} of {len(scaled_data):,} customers")
+        
+        # Select the number of clusters within 3..6, stopping once the criterion plateaus
+        selection = None
         if n_clusters is None:
-            st.write("📊 Finding optimal number of clusters using elbow method...")
-            
-            # Calculate within-cluster sum of squares for different k values
-            wcss = []
-            silhouette_scores = []
-            k_range = range(2, 11)
-            
-            for k in k_range:
-                kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-                kmeans.fit(scaled_data)
-                wcss.append(kmeans.inertia_)
-                
-                # Calculate silhouette score
-                if k > 1:
-                    silhouette_scores.append(silhouette_score(scaled_data, kmeans.labels_))
-                else:
-                    silhouette_scores.append(0)
+            st.write(f"📊 Finding optimal number of clusters ({criterion.replace('_', '-')})...")
+            selector = KSelector(k_min=3, k_max=6, criterion=criterion, random_state=42, n_jobs=n_jobs)
+            selector.fit(fit_data, fit_weights)
+            k_range = list(selector.inertias_)
             
             # Create elbow plot
             fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 5))
             
             # Elbow plot
-            ax1.plot(k_range, wcss, 'bo-')
+            ax1.plot(k_range, list(selector.inertias_.values()), 'bo-')
             ax1.set_xlabel('Number of Clusters (k)')
             ax1.set_ylabel('Within-Cluster Sum of Squares (WCSS)')
             ax1.set_title('Elbow Method for Optimal k')
             ax1.grid(True, alpha=0.3)
             
-            # Silhouette score plot
-            ax2.plot(k_range[1:], silhouette_scores, 'ro-')
+            # Criterion plot
+            criterion_label = criterion.replace('_', '-').title()
+            ax2.plot(k_range, [np.nan if score is None else score for score in selector.scores_.values()], 'ro-')
             ax2.set_xlabel('Number of Clusters (k)')
-            ax2.set_ylabel('Silhouette Score')
-            ax2.set_title('Silhouette Score vs Number of Clusters')
+            ax2.set_ylabel(criterion_label)
+            ax2.set_title(f'{criterion_label} vs Number of Clusters')
             ax2.grid(True, alpha=0.3)
             
             plt.tight_layout()
             st.pyplot(fig)
             plt.close()
             
-            # Find optimal k (elbow point)
-            # Simple method: find the point where the rate of decrease slows down
-            wcss_diff = np.diff(wcss)
-            wcss_diff_rate = np.diff(wcss_diff)
-            optimal_k = np.argmax(wcss_diff_rate) + 3  # +3 because we start from k=2
-            
-            # Also consider silhouette score
-            optimal_k_silhouette = np.argmax(silhouette_scores) + 2
-            
-            # Choose the better of the two methods
-            if optimal_k_silhouette >= 3 and optimal_k_silhouette <= 6:
-                optimal_k = optimal_k_silhouette
-            
-            # Ensure optimal_k is within reasonable range
-            optimal_k = max(3, min(6, optimal_k))
-            
-            st.success(f"🎯 Optimal number of clusters: {optimal_k}")
-            n_clusters = optimal_k
+            selection = {'criterion': selector.criterion_, 'fits': selector.n_fits_,
+                         'candidates': selector.k_max - selector.k_min + 1,
+                         'stopped_early': selector.stopped_early_}
+            st.success(f"🎯 Optimal number of clusters: {selector.k_} "
+                       f"({criterion_label}, {selector.n_fits_} of {selector.k_max - selector.k_min + 1} candidates fitted)")
+            n_clusters = selector.k_
         
         # Perform K-means clustering
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(scaled_data)
+        kmeans = NumpyKMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+        kmeans.fit(fit_data, fit_weights)
+        kmeans.k_selection_ = selection
+        cluster_labels = kmeans.labels_ if fit_weights is None else kmeans.predict(scaled_data)
         
         # Add cluster labels to the data
         rfm_data['Cluster'] = cluster_labels
@@ -290,78 +329,96 @@ def perform_clustering(rfm_data, n_clusters=None):
         st.error(f"❌ Error performing clustering: {str(e)}")
         return None, None, None
 
-def create_visualizations(rfm_data):
+def build_figures(rfm_data):
+    """
+    Build the RFM analysis and cluster distribution figures
+    
+    Args:
+        rfm_data (pd.DataFrame): RFM data with cluster labels
+        
+    Returns:
+        tuple: (RFM analysis figure, cluster distribution figure)
+    """
+    # Set style for plots
+    plt.style.use('default')
+    sns.set_palette("husl")
+    
+    # Create subplots
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    
+    # 1. RFM Distribution Histograms
+    axes[0, 0].hist(rfm_data['Recency'], bins=30, alpha=0.7, color='skyblue', edgecolor='black')
+    axes[0, 0].set_title('Recency Distribution')
+    axes[0, 0].set_xlabel('Days Since Last Purchase')
+    axes[0, 0].set_ylabel('Number of Customers')
+    axes[0, 0].grid(True, alpha=0.3)
+    
+    axes[0, 1].hist(rfm_data['Monetary'], bins=30, alpha=0.7, color='lightgreen', edgecolor='black')
+    axes[0, 1].set_title('Monetary Distribution')
+    axes[0, 1].set_xlabel('Total Spending ($)')
+    axes[0, 1].set_ylabel('Number of Customers')
+    axes[0, 1].grid(True, alpha=0.3)
+    
+    # 2. Scatter plot: Recency vs Monetary (colored by cluster)
+    scatter = axes[1, 0].scatter(rfm_data['Recency'], rfm_data['Monetary'], 
+                               c=rfm_data['Cluster'], cmap='viridis', alpha=0.6)
+    axes[1, 0].set_title('Recency vs Monetary (Colored by Cluster)')
+    axes[1, 0].set_xlabel('Recency (Days)')
+    axes[1, 0].set_ylabel('Monetary ($)')
+    axes[1, 0].grid(True, alpha=0.3)
+    plt.colorbar(scatter, ax=axes[1, 0], label='Cluster')
+    
+    # 3. Frequency vs Monetary scatter plot
+    scatter2 = axes[1, 1].scatter(rfm_data['Frequency'], rfm_data['Monetary'], 
+                                c=rfm_data['Cluster'], cmap='viridis', alpha=0.6)
+    axes[1, 1].set_title('Frequency vs Monetary (Colored by Cluster)')
+    axes[1, 1].set_xlabel('Frequency (Number of Transactions)')
+    axes[1, 1].set_ylabel('Monetary ($)')
+    axes[1, 1].grid(True, alpha=0.3)
+    plt.colorbar(scatter2, ax=axes[1, 1], label='Cluster')
+    
+    fig.tight_layout()
+    
+    # Create cluster distribution pie chart
+    fig2, ax = plt.subplots(figsize=(10, 6))
+    cluster_counts = rfm_data['Cluster'].value_counts()
+    colors = plt.cm.Set3(np.linspace(0, 1, len(cluster_counts)))
+    
+    wedges, texts, autotexts = ax.pie(cluster_counts.values, labels=[f'Cluster {i}' for i in cluster_counts.index], 
+                                     autopct='%1.1f%%', colors=colors, startangle=90)
+    ax.set_title('Customer Distribution by Cluster')
+    
+    return fig, fig2
+
+def create_visualizations(rfm_data, output_dir=None):
     """
     Create visualizations for RFM analysis and clustering results
     
     Args:
         rfm_data (pd.DataFrame): RFM data with cluster labels
+        output_dir (str): Directory whose plots/ subdirectory receives the
+            images (default: data/processed)
     """
     try:
         print("📈 Creating visualizations...")
         
-        # Set style for plots
-        plt.style.use('default')
-        sns.set_palette("husl")
-        
         # Create output directory for plots
-        plots_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'processed', 'plots')
+        if output_dir is None:
+            output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'processed')
+        plots_dir = os.path.join(output_dir, 'plots')
         os.makedirs(plots_dir, exist_ok=True)
         
-        # Create subplots
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-        
-        # 1. RFM Distribution Histograms
-        axes[0, 0].hist(rfm_data['Recency'], bins=30, alpha=0.7, color='skyblue', edgecolor='black')
-        axes[0, 0].set_title('Recency Distribution')
-        axes[0, 0].set_xlabel('Days Since Last Purchase')
-        axes[0, 0].set_ylabel('Number of Customers')
-        axes[0, 0].grid(True, alpha=0.3)
-        
-        axes[0, 1].hist(rfm_data['Monetary'], bins=30, alpha=0.7, color='lightgreen', edgecolor='black')
-        axes[0, 1].set_title('Monetary Distribution')
-        axes[0, 1].set_xlabel('Total Spending ($)')
-        axes[0, 1].set_ylabel('Number of Customers')
-        axes[0, 1].grid(True, alpha=0.3)
-        
-        # 2. Scatter plot: Recency vs Monetary (colored by cluster)
-        scatter = axes[1, 0].scatter(rfm_data['Recency'], rfm_data['Monetary'], 
-                                   c=rfm_data['Cluster'], cmap='viridis', alpha=0.6)
-        axes[1, 0].set_title('Recency vs Monetary (Colored by Cluster)')
-        axes[1, 0].set_xlabel('Recency (Days)')
-        axes[1, 0].set_ylabel('Monetary ($)')
-        axes[1, 0].grid(True, alpha=0.3)
-        plt.colorbar(scatter, ax=axes[1, 0], label='Cluster')
-        
-        # 3. Frequency vs Monetary scatter plot
-        scatter2 = axes[1, 1].scatter(rfm_data['Frequency'], rfm_data['Monetary'], 
-                                    c=rfm_data['Cluster'], cmap='viridis', alpha=0.6)
-        axes[1, 1].set_title('Frequency vs Monetary (Colored by Cluster)')
-        axes[1, 1].set_xlabel('Frequency (Number of Transactions)')
-        axes[1, 1].set_ylabel('Monetary ($)')
-        axes[1, 1].grid(True, alpha=0.3)
-        plt.colorbar(scatter2, ax=axes[1, 1], label='Cluster')
-        
-        plt.tight_layout()
+        fig, fig2 = build_figures(rfm_data)
         
         # Save the plot
         plot_path = os.path.join(plots_dir, 'rfm_analysis.png')
-        plt.savefig(plot_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # Create cluster distribution pie chart
-        fig2, ax = plt.subplots(figsize=(10, 6))
-        cluster_counts = rfm_data['Cluster'].value_counts()
-        colors = plt.cm.Set3(np.linspace(0, 1, len(cluster_counts)))
-        
-        wedges, texts, autotexts = ax.pie(cluster_counts.values, labels=[f'Cluster {i}' for i in cluster_counts.index], 
-                                         autopct='%1.1f%%', colors=colors, startangle=90)
-        ax.set_title('Customer Distribution by Cluster')
+        fig.savefig(plot_path, dpi=300, bbox_inches='tight')
+        plt.close(fig)
         
         # Save the pie chart
         pie_path = os.path.join(plots_dir, 'cluster_distribution.png')
-        plt.savefig(pie_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        fig2.savefig(pie_path, dpi=300, bbox_inches='tight')
+        plt.close(fig2)
         
         print("✅ Visualizations created successfully!")
         return True
@@ -377,139 +434,35 @@ def create_visualizations_streamlit(rfm_data):
     try:
         st.info("📈 Creating visualizations...")
         
-        # Set style for plots
-        plt.style.use('default')
-        sns.set_palette("husl")
-        
-        # Create subplots
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-        
-        # 1. RFM Distribution Histograms
-        axes[0, 0].hist(rfm_data['Recency'], bins=30, alpha=0.7, color='skyblue', edgecolor='black')
-        axes[0, 0].set_title('Recency Distribution')
-        axes[0, 0].set_xlabel('Days Since Last Purchase')
-        axes[0, 0].set_ylabel('Number of Customers')
-        axes[0, 0].grid(True, alpha=0.3)
-        
-        axes[0, 1].hist(rfm_data['Monetary'], bins=30, alpha=0.7, color='lightgreen', edgecolor='black')
-        axes[0, 1].set_title('Monetary Distribution')
-        axes[0, 1].set_xlabel('Total Spending ($)')
-        axes[0, 1].set_ylabel('Number of Customers')
-        axes[0, 1].grid(True, alpha=0.3)
-        
-        # 2. Scatter plot: Recency vs Monetary (colored by cluster)
-        scatter = axes[1, 0].scatter(rfm_data['Recency'], rfm_data['Monetary'], 
-                                   c=rfm_data['Cluster'], cmap='viridis', alpha=0.6)
-        axes[1, 0].set_title('Recency vs Monetary (Colored by Cluster)')
-        axes[1, 0].set_xlabel('Recency (Days)')
-        axes[1, 0].set_ylabel('Monetary ($)')
-        axes[1, 0].grid(True, alpha=0.3)
-        plt.colorbar(scatter, ax=axes[1, 0], label='Cluster')
-        
-        # 3. Frequency vs Monetary scatter plot
-        scatter2 = axes[1, 1].scatter(rfm_data['Frequency'], rfm_data['Monetary'], 
-                                    c=rfm_data['Cluster'], cmap='viridis', alpha=0.6)
-        axes[1, 1].set_title('Frequency vs Monetary (Colored by Cluster)')
-        axes[1, 1].set_xlabel('Frequency (Number of Transactions)')
-        axes[1, 1].set_ylabel('Monetary ($)')
-        axes[1, 1].grid(True, alpha=0.3)
-        plt.colorbar(scatter2, ax=axes[1, 1], label='Cluster')
-        
-        plt.tight_layout()
+        fig, fig2 = build_figures(rfm_data)
         st.pyplot(fig)
-        plt.close()
-        
-        # Create cluster distribution pie chart
-        fig2, ax = plt.subplots(figsize=(10, 6))
-        cluster_counts = rfm_data['Cluster'].value_counts()
-        colors = plt.cm.Set3(np.linspace(0, 1, len(cluster_counts)))
-        
-        wedges, texts, autotexts = ax.pie(cluster_counts.values, labels=[f'Cluster {i}' for i in cluster_counts.index], 
-                                         autopct='%1.1f%%', colors=colors, startangle=90)
-        ax.set_title('Customer Distribution by Cluster')
-        
+        plt.close(fig)
         st.pyplot(fig2)
-        plt.close()
+        plt.close(fig2)
         
         st.success("✅ Visualizations created successfully!")
         
     except Exception as e:
         st.error(f"❌ Error creating visualizations: {str(e)}")
 
-def generate_report(rfm_data, analysis_params):
-    """Generate a comprehensive analysis report"""
-    report = f"""
-JANAH HARDWARE STORE - CUSTOMER SEGMENTATION REPORT
-Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-ANALYSIS SUMMARY
-================
-Total Customers Analyzed: {len(rfm_data):,}
-Number of Segments: {rfm_data['Cluster'].nunique()}
-Analysis Parameters: {analysis_params}
-
-SEGMENT PROFILES
-================
-"""
+def generate_report(rfm_data, analysis_params, fmt='txt'):
+    """
+    Generate a comprehensive analysis report
     
-    # Add segment details
-    for segment in rfm_data['Segment'].unique():
-        segment_data = rfm_data[rfm_data['Segment'] == segment]
-        report += f"""
-{segment.upper()}
-- Customer Count: {len(segment_data):,} ({len(segment_data)/len(rfm_data)*100:.1f}%)
-- Average Recency: {segment_data['Recency'].mean():.1f} days
-- Average Frequency: {segment_data['Frequency'].mean():.1f} transactions
-- Average Monetary: ${segment_data['Monetary'].mean():,.2f}
-- Total Revenue: ${segment_data['Monetary'].sum():,.2f}
-
-RECOMMENDATIONS:
-"""
+    Args:
+        rfm_data (pd.DataFrame): RFM data with segment labels
+        analysis_params (dict): Parameters shown in the report header
+        fmt (str): Output format - 'txt', 'html' or 'pdf'
         
-        if "Loyal" in segment:
-            report += "- Maintain relationship with exclusive offers\n- Consider VIP program\n- Request referrals\n"
-        elif "At-Risk" in segment:
-            report += "- Re-engagement campaigns\n- Special discounts\n- Customer feedback surveys\n"
-        elif "New" in segment:
-            report += "- Welcome series\n- Product education\n- First purchase incentives\n"
-        elif "High-Value" in segment:
-            report += "- Premium services\n- Early access to new products\n- Personal account manager\n"
-        elif "Inactive" in segment:
-            report += "- Win-back campaigns\n- Significant discounts\n- Product updates\n"
-        
-        report += "\n"
-    
-    report += f"""
-TECHNICAL DETAILS
-=================
-- RFM Analysis: Recency, Frequency, Monetary metrics
-- Clustering Algorithm: K-means with StandardScaler
-- Optimal Clusters: Determined by Elbow Method + Silhouette Score
-- Data Quality: Outliers removed using IQR method
-
-BUSINESS INSIGHTS
-=================
-- Top Revenue Segment: {rfm_data.groupby('Segment')['Monetary'].sum().idxmax()}
-- Most Active Segment: {rfm_data.groupby('Segment')['Frequency'].mean().idxmax()}
-- Largest Segment: {rfm_data['Segment'].value_counts().index[0]}
-
-NEXT STEPS
-==========
-1. Implement targeted marketing campaigns
-2. Monitor segment performance over time
-3. Adjust segmentation parameters as needed
-4. Integrate with CRM system for automation
-
----
-Report generated by Janah Customer Segmentation System
-For questions, contact: janah@hardwarestore.com
-"""
-    
-    return report
+    Returns:
+        str or bytes: Rendered report (bytes for PDF)
+    """
+    return render_report(summarize_segments(rfm_data), analysis_params, fmt)
 
 def create_campaign_preview(segment_name, rfm_data):
     """Create a mock campaign preview for a segment"""
-    segment_data = rfm_data[rfm_data['Segment'] == segment_name]
+    segment_column = 'Segment' if 'Segment' in rfm_data.columns else 'Cluster'
+    segment_data = rfm_data[rfm_data[segment_column] == segment_name]
     
     if len(segment_data) == 0:
         return "No data available for this segment."
@@ -647,6 +600,97 @@ The Janah Hardware Team
     
     return template
 
+# Cached pipeline steps for the Streamlit app. Each step is keyed on the
+# dataset's content hash and the analysis parameters; arguments starting
+# with an underscore are not hashed by st.cache_data.
+
+@st.cache_data(show_spinner=False)
+def dataset_fingerprint(file_path, size, modified):
+    """SHA-256 of a dataset file (size and mtime invalidate the cached digest)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def upload_fingerprint(uploaded_file):
+    """SHA-256 of an uploaded file, computed once per upload"""
+    digests = st.session_state.setdefault('upload_digests', {})
+    if uploaded_file.file_id not in digests:
+        digests[uploaded_file.file_id] = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+    return digests[uploaded_file.file_id]
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def cached_clean_data(fingerprint, _load):
+    """Cleaned transactions of a dataset; ``_load`` runs on a cache miss only"""
+    data = _load()
+    if data is None:
+        raise ValueError("Failed to load data. Please check your file.")
+    return data
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def cached_rfm(fingerprint, _data):
+    """RFM metrics of a cleaned dataset"""
+    rfm_data = calculate_rfm(_data)
+    if rfm_data is None:
+        raise ValueError("Failed to calculate RFM metrics.")
+    return rfm_data
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def cached_clustering(fingerprint, n_clusters, _rfm_data):
+    """Clustered RFM data, the number of clusters and the fitted model"""
+    clustered_data, optimal_clusters, model = perform_clustering(_rfm_data.copy(), n_clusters,
+                                                                 n_jobs=CLUSTERING_JOBS)
+    if clustered_data is None:
+        raise ValueError("Failed to perform clustering.")
+    return clustered_data, optimal_clusters, model
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def render_figures(result_key, _rfm_data):
+    """PNG images of the analysis figures"""
+    images = []
+    for fig in build_figures(_rfm_data):
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+        plt.close(fig)
+        images.append(buffer.getvalue())
+    return images
+
+@st.cache_data(show_spinner=False, max_entries=48)
+def cached_report(result_key, report_params, fmt, _clustered_data):
+    """Rendered report for the download buttons"""
+    return render_report(summarize_segments(_clustered_data), report_params, fmt)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def cached_csv(result_key, _clustered_data):
+    """Clustered data as CSV bytes for the export button"""
+    return _clustered_data.to_csv(index=False).encode('utf-8')
+
+def run_cached_analysis(fingerprint, load, n_clusters):
+    """
+    Load, RFM and clustering steps, each served from the cache when possible
+    
+    Args:
+        fingerprint (str): Content hash of the dataset
+        load (callable): Returns the cleaned transactions on a cache miss
+        n_clusters (int): Number of clusters (None for the elbow method)
+        
+    Returns:
+        dict: Analysis results to keep in session state
+    """
+    data = cached_clean_data(fingerprint, load)
+    rfm_data = cached_rfm(fingerprint, data)
+    clustered_data, optimal_clusters, model = cached_clustering(fingerprint, n_clusters, rfm_data)
+    return {
+        'key': f"{fingerprint}:{n_clusters or 'auto'}",
+        'data_preview': data.head(),
+        'clustered_data': clustered_data,
+        'optimal_clusters': optimal_clusters,
+        'n_clusters': n_clusters,
+        'outlier_strategy': data.attrs.get('outlier_strategy'),
+        'model': model
+    }
+
 def is_streamlit_context():
     """Check if we're running in Streamlit context"""
     try:
@@ -676,27 +720,35 @@ def main():
     
     # File upload
     uploaded_file = st.sidebar.file_uploader(
-        "Upload your dataset (CSV)",
-        type=['csv'],
-        help="Upload your customer transaction data in CSV format"
+        "Upload your dataset (CSV or Excel)",
+        type=['csv', 'xlsx'],
+        help="Upload your customer transaction data in CSV or Excel format"
     )
     
-    # Default dataset path
-    default_dataset_path = "data/online_retail.csv"
+    # Default dataset: the Parquet transaction cache written by
+    # download_dataset.py, or the CSV sample dataset
+    default_dataset_paths = ["data/online_retail.parquet", "data/online_retail.csv"]
+    default_dataset_path = next((path for path in default_dataset_paths if os.path.exists(path)), None)
     
     # Determine which dataset to use
     if uploaded_file is not None:
         st.sidebar.success(f"✅ File uploaded: {uploaded_file.name}")
-        # Save uploaded file temporarily
-        with open("temp_upload.csv", "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        dataset_path = "temp_upload.csv"
+        fingerprint = upload_fingerprint(uploaded_file)
+        
+        def load():
+            # Parse the upload straight from its in-memory buffer; nothing is
+            # written to disk, so concurrent sessions cannot collide
+            return load_and_clean_data(uploaded_file.getbuffer(), file_name=uploaded_file.name)
     else:
-        if os.path.exists(default_dataset_path):
-            st.sidebar.info("📁 Using default dataset: online_retail.csv")
-            dataset_path = default_dataset_path
+        if default_dataset_path:
+            st.sidebar.info(f"📁 Using default dataset: {os.path.basename(default_dataset_path)}")
+            stat = os.stat(default_dataset_path)
+            fingerprint = dataset_fingerprint(default_dataset_path, stat.st_size, stat.st_mtime)
+            
+            def load():
+                return load_and_clean_data(default_dataset_path)
         else:
-            st.sidebar.warning("⚠️ No dataset found. Please upload a CSV file.")
+            st.sidebar.warning("⚠️ No dataset found. Please upload a CSV or Excel file.")
             st.stop()
     
     # Clustering parameters
@@ -714,78 +766,75 @@ def main():
     show_visualizations = st.sidebar.checkbox("Show Visualizations", value=True)
     save_results = st.sidebar.checkbox("Save Results", value=True)
     
-    # Run analysis button
+    # Run analysis button: the steps are cached on the dataset hash and the
+    # parameters, and the results are kept in session state so that later
+    # widget interactions do not rerun the pipeline
     if st.sidebar.button("🚀 Run Analysis", type="primary"):
         with st.spinner("Running analysis..."):
-            
-            # Step 1: Load and clean data
-            data = load_and_clean_data(dataset_path)
-            if data is None:
-                st.error("❌ Failed to load data. Please check your file.")
+            try:
+                analysis = run_cached_analysis(fingerprint, load, n_clusters)
+            except ValueError as e:
+                st.error(f"❌ {e}")
                 return
-            
-            # Display data preview
-            st.subheader("📋 Data Preview")
-            st.write(data.head())
-            
-            # Step 2: Calculate RFM metrics
-            rfm_data = calculate_rfm(data)
-            if rfm_data is None:
-                st.error("❌ Failed to calculate RFM metrics.")
-                return
-            
-            # Step 3: Perform clustering
-            clustered_data, optimal_clusters, model = perform_clustering(rfm_data, n_clusters)
-            if clustered_data is None:
-                st.error("❌ Failed to perform clustering.")
-                return
-            
-            # Step 4: Create visualizations (use Streamlit version)
-            if show_visualizations:
-                create_visualizations_streamlit(clustered_data)
-            
-            # Step 5: Display results
-            st.subheader("📊 Analysis Results")
-            
-            # Summary metrics
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("Total Customers", len(clustered_data))
-            with col2:
-                st.metric("Number of Clusters", optimal_clusters)
-            with col3:
-                st.metric("Avg Recency", f"{clustered_data['Recency'].mean():.1f} days")
-            with col4:
-                st.metric("Avg Monetary", f"${clustered_data['Monetary'].mean():.0f}")
-            
-            # Cluster analysis
-            st.subheader("🎯 Cluster Analysis")
-            
-            # Create cluster summary table
-            cluster_summary = clustered_data.groupby('Cluster').agg({
-                'Recency': ['mean', 'std'],
-                'Frequency': ['mean', 'std'],
-                'Monetary': ['mean', 'std']
-            }).round(2)
-            
-            cluster_summary.columns = ['Recency_Mean', 'Recency_Std', 'Frequency_Mean', 'Frequency_Std', 
-                                     'Monetary_Mean', 'Monetary_Std']
-            cluster_summary['Size'] = clustered_data['Cluster'].value_counts().sort_index()
-            cluster_summary['Percentage'] = (cluster_summary['Size'] / len(clustered_data) * 100).round(1)
-            
-            st.write("**Cluster Summary Statistics:**")
-            st.dataframe(cluster_summary)
+            analysis['data_source'] = "Uploaded File" if uploaded_file else "Default Dataset"
+            st.session_state['analysis'] = analysis
             
             # Save results if requested
             if save_results:
                 output_path = "data/processed/rfm_clustered.csv"
                 os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                clustered_data.to_csv(output_path, index=False)
+                analysis['clustered_data'].to_csv(output_path, index=False)
                 st.success(f"✅ Results saved to: {output_path}")
-            
-            # Clean up temporary file
-            if uploaded_file is not None and os.path.exists("temp_upload.csv"):
-                os.remove("temp_upload.csv")
+    
+    analysis = st.session_state.get('analysis')
+    if analysis is None:
+        st.info("👈 Choose a dataset and parameters, then press Run Analysis.")
+        return
+    
+    result_key = analysis['key']
+    clustered_data = analysis['clustered_data']
+    optimal_clusters = analysis['optimal_clusters']
+    
+    # Display data preview
+    st.subheader("📋 Data Preview")
+    st.write(analysis['data_preview'])
+    
+    # Visualizations, rendered once per result
+    if show_visualizations:
+        for image in render_figures(result_key, clustered_data):
+            st.image(image, use_column_width=True)
+    
+    # Display results
+    st.subheader("📊 Analysis Results")
+    
+    # Summary metrics
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Customers", len(clustered_data))
+    with col2:
+        st.metric("Number of Clusters", optimal_clusters)
+    with col3:
+        st.metric("Avg Recency", f"{clustered_data['Recency'].mean():.1f} days")
+    with col4:
+        st.metric("Avg Monetary", f"${clustered_data['Monetary'].mean():.0f}")
+    
+    # Cluster analysis
+    st.subheader("🎯 Cluster Analysis")
+    
+    # Create cluster summary table
+    cluster_summary = clustered_data.groupby('Cluster').agg({
+        'Recency': ['mean', 'std'],
+        'Frequency': ['mean', 'std'],
+        'Monetary': ['mean', 'std']
+    }).round(2)
+    
+    cluster_summary.columns = ['Recency_Mean', 'Recency_Std', 'Frequency_Mean', 'Frequency_Std', 
+                             'Monetary_Mean', 'Monetary_Std']
+    cluster_summary['Size'] = clustered_data['Cluster'].value_counts().sort_index()
+    cluster_summary['Percentage'] = (cluster_summary['Size'] / len(clustered_data) * 100).round(1)
+    
+    st.write("**Cluster Summary Statistics:**")
+    st.dataframe(cluster_summary)
     
     # Post-segmentation features
     st.markdown("---")
@@ -793,29 +842,50 @@ def main():
     
     # Download Report
     st.subheader("📄 Download Analysis Report")
-    report_content = generate_report(clustered_data, {"data_source": "Uploaded File" if uploaded_file else "Default Dataset", "n_clusters": optimal_clusters or "Auto", "total_customers": len(clustered_data)})
-    
-    st.download_button(
-        label="📥 Download Report (TXT)",
-        data=report_content,
-        file_name=f"janah_segmentation_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-        mime="text/plain"
-    )
+    report_params = {"data_source": analysis['data_source'], "n_clusters": optimal_clusters or "Auto", "total_customers": len(clustered_data)}
+    if getattr(analysis['model'], 'k_selection_', None):
+        report_params["k_selection"] = analysis['model'].k_selection_
+    if analysis.get('outlier_strategy'):
+        report_params["outlier_strategy"] = analysis['outlier_strategy']
+    report_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    report_col1, report_col2, report_col3 = st.columns(3)
+    with report_col1:
+        st.download_button(
+            label="📥 Download Report (TXT)",
+            data=cached_report(result_key, report_params, 'txt', clustered_data),
+            file_name=f"janah_segmentation_report_{report_timestamp}.txt",
+            mime="text/plain"
+        )
+    with report_col2:
+        st.download_button(
+            label="📥 Download Report (HTML)",
+            data=cached_report(result_key, report_params, 'html', clustered_data),
+            file_name=f"janah_segmentation_report_{report_timestamp}.html",
+            mime="text/html"
+        )
+    with report_col3:
+        st.download_button(
+            label="📥 Download Report (PDF)",
+            data=cached_report(result_key, report_params, 'pdf', clustered_data),
+            file_name=f"janah_segmentation_report_{report_timestamp}.pdf",
+            mime="application/pdf"
+        )
     
     # Export Segment Data
     st.subheader("📊 Export Segment Data")
-    csv_data = clustered_data.to_csv(index=False)
     
     st.download_button(
         label="📥 Export RFM Data (CSV)",
-        data=csv_data,
+        data=cached_csv(result_key, clustered_data),
         file_name=f"janah_rfm_segments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
         mime="text/csv"
     )
     
     # Campaign Preview
     st.subheader("📧 Campaign Preview")
-    segment_options = sorted(clustered_data['Segment'].unique())
+    segment_column = 'Segment' if 'Segment' in clustered_data.columns else 'Cluster'
+    segment_options = sorted(clustered_data[segment_column].unique())
     selected_segment = st.selectbox(
         "Select segment for campaign preview:",
         segment_options
@@ -831,6 +901,12 @@ def main():
         st.text_area("Campaign Content", campaign["content"], height=300, disabled=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
+    if st.button("📤 Export Campaign Audiences"):
+        manifest = export_campaign_audiences(clustered_data, "data/processed/campaigns")
+        st.success(f"✅ Exported {manifest['total_recipients']:,} personalized messages "
+                   f"({manifest['recipients_per_second']:,.0f} recipients/sec) to data/processed/campaigns")
+        st.dataframe(pd.DataFrame(manifest['segments']))
+    
     # Share Results
     st.subheader("🔗 Share Results")
     st.markdown("""
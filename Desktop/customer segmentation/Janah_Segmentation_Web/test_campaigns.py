@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script for campaign audience export and the campaign export API
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from utils.campaigns.export import (CAMPAIGN_TEMPLATES, DEFAULT_TEMPLATE, export_campaign_audiences,
+                                    partition_by_segment, render_messages)
+
+
+def make_clustered_data(n_customers=1000, seed=0):
+    """Clustered RFM data with interleaved segments"""
+    rng = np.random.default_rng(seed)
+    segments = np.array(['Loyal Customers', 'At-Risk Customers', 'New Customers', 'Bargain Hunters'])
+    clusters = rng.integers(0, len(segments), n_customers)
+    return pd.DataFrame({
+        'CustomerID': np.arange(12346, 12346 + n_customers),
+        'Recency': rng.integers(1, 365, n_customers),
+        'Frequency': rng.integers(1, 30, n_customers),
+        'Monetary': np.round(rng.uniform(10, 5000, n_customers), 2),
+        'Cluster': clusters,
+        'Segment': segments[clusters]
+    })
+
+
+def test_partition_by_segment():
+    """Every customer lands in its segment's partition, in its original order"""
+    print("\n🗂️ Testing segment partitioning...")
+    data = make_clustered_data()
+    partitions = partition_by_segment(data)
+
+    # Segments keep their order of first appearance
+    assert list(partitions) == list(pd.unique(data['Segment']))
+    assert sum(len(audience) for audience in partitions.values()) == len(data)
+    for name, audience in partitions.items():
+        expected = data.loc[data['Segment'] == name, ['CustomerID', 'Segment', 'Recency', 'Frequency', 'Monetary']]
+        pd.testing.assert_frame_equal(audience, expected)
+
+    # The same input always gives the same partitions
+    again = partition_by_segment(data)
+    assert all(again[name].index.equals(partitions[name].index) for name in partitions)
+
+    # Rows without a segment are left out
+    unlabelled = data.copy()
+    unlabelled.loc[unlabelled.index[:5], 'Segment'] = np.nan
+    assert sum(len(audience) for audience in partition_by_segment(unlabelled).values()) == len(data) - 5
+
+    # Without segment names the clusters are used
+    partitions = partition_by_segment(data.drop(columns='Segment'))
+    assert sorted(partitions) == ['Cluster 0', 'Cluster 1', 'Cluster 2', 'Cluster 3']
+    assert all((audience['Segment'] == name).all() for name, audience in partitions.items())
+    print("✅ Segment partitioning - Working")
+
+
+def test_render_messages():
+    """Vectorized rendering matches str.format for every recipient"""
+    print("\n✉️ Testing message rendering...")
+    audience = pd.DataFrame({
+        'CustomerID': [12346.0, 17850.0, 13047.0],
+        'Recency': [3, 120, 45],
+        'Frequency': [1, 12, 4],
+        'Monetary': [9.5, 1234.567, -20.004]
+    }, index=[7, 3, 11])
+    template = "Hi {customer_id}: {frequency} orders, ${monetary:.2f}, {recency} days, {monetary:.0f}"
+
+    messages = render_messages(audience, template, batch_size=2)
+    expected = [template.format(customer_id=int(row.CustomerID), frequency=row.Frequency, monetary=row.Monetary,
+                                recency=row.Recency) for row in audience.itertuples()]
+    assert messages.index.equals(audience.index)
+    assert messages.tolist() == expected
+
+    for segment_template in list(CAMPAIGN_TEMPLATES.values()) + [DEFAULT_TEMPLATE]:
+        assert render_messages(audience, segment_template['body']).str.contains('12346').any()
+    assert render_messages(audience.iloc[:0], template).empty
+
+    try:
+        render_messages(audience, "Dear {name}")
+        assert False, "Expected KeyError"
+    except KeyError as e:
+        assert 'name' in str(e)
+    print("✅ Message rendering - Working")
+
+
+def test_export_campaign_audiences():
+    """One audience file per segment, with the manifest counting its recipients"""
+    print("\n📣 Testing campaign export...")
+    data = make_clustered_data()
+    counts = data['Segment'].value_counts()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manifest = export_campaign_audiences(data, tmp_dir, batch_size=100)
+
+        assert manifest['total_recipients'] == len(data)
+        assert {segment['segment']: segment['recipients'] for segment in manifest['segments']} == counts.to_dict()
+        with open(os.path.join(tmp_dir, 'campaign_manifest.json')) as f:
+            assert json.load(f) == manifest
+
+        for segment in manifest['segments']:
+            assert os.path.dirname(segment['file']) == tmp_dir
+            audience = pd.read_csv(segment['file'])
+            # Batches are appended under a single header
+            assert len(audience) == segment['recipients']
+            assert (audience['Segment'] == segment['segment']).all()
+            template = CAMPAIGN_TEMPLATES.get(segment['segment'], DEFAULT_TEMPLATE)
+            assert (audience['Subject'] == template['subject']).all()
+            assert audience['Message'].iloc[0].startswith(template['body'].split('{')[0])
+            assert str(audience['CustomerID'].iloc[0]) in audience['Message'].iloc[0]
+
+        files = sorted(os.listdir(tmp_dir))
+        assert files == ['at_risk_customers.csv', 'bargain_hunters.csv', 'campaign_manifest.json',
+                         'loyal_customers.csv', 'new_customers.csv']
+    print("✅ Campaign export - Working")
+
+
+def test_export_campaigns_endpoint():
+    """/api/export-campaigns writes the audiences next to the processed results"""
+    print("\n🌐 Testing campaign export API...")
+    from app import create_app
+
+    app = create_app()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The routes read <root_path>/../data/processed, so point the app at a temporary tree
+        app.root_path = os.path.join(tmp_dir, 'app')
+        processed_dir = os.path.join(tmp_dir, 'data', 'processed')
+        os.makedirs(app.root_path)
+        os.makedirs(processed_dir)
+        client = app.test_client()
+
+        response = client.post('/api/export-campaigns')
+        assert response.status_code == 404 and response.get_json()['success'] is False
+
+        data = make_clustered_data(200)
+        data.to_csv(os.path.join(processed_dir, 'rfm_clustered.csv'), index=False)
+        response = client.post('/api/export-campaigns')
+        assert response.status_code == 200
+        result = response.get_json()
+        assert result['success'] is True
+        assert result['manifest']['total_recipients'] == len(data)
+        assert os.path.exists(os.path.join(processed_dir, 'campaigns', 'campaign_manifest.json'))
+        assert len(os.listdir(os.path.join(processed_dir, 'campaigns'))) == data['Segment'].nunique() + 1
+    print("✅ Campaign export API - Working")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Janah campaign export")
+    print("=" * 60)
+    test_partition_by_segment()
+    test_render_messages()
+    test_export_campaign_audiences()
+    test_export_campaigns_endpoint()
+    print("\n🎉 Campaign tests complete!")
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Test script for the data processing components in utils/data_processing
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processing.outliers import OutlierFilter, QuantileSketch
+from utils.data_processing.dedup import HashDeduplicator
+from utils.data_processing.dates import detect_date_format, parse_invoice_dates
+from utils.data_processing.cleaner import CleaningPlan, DataCleaner, transaction_cleaning_plan
+from utils.data_processing.customers import CustomerIdEncoder
+from utils.data_processing.rfm import PartitionedRFM, aggregate_customers, finish_rfm, sharded_rfm
+from utils.data_processing.loader import (prepare_transactions, read_transactions, iter_transactions,
+                                         required_columns)
+
+
+def make_transactions(n_rows=20000, seed=42):
+    """Create a synthetic transaction frame shaped like the Online Retail data"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'InvoiceNo': rng.integers(500000, 510000, n_rows).astype(str),
+        'StockCode': rng.integers(10000, 10200, n_rows).astype(str),
+        'Description': [f'Product {i}' for i in rng.integers(0, 500, n_rows)],
+        'Quantity': rng.poisson(6, n_rows) - 1,
+        'InvoiceDate': (pd.Timestamp('2011-01-01') +
+                        pd.to_timedelta(rng.integers(0, 365 * 24 * 60, n_rows), unit='m')).strftime('%Y-%m-%d %H:%M:%S'),
+        'UnitPrice': np.round(rng.lognormal(1, 0.8, n_rows), 2),
+        'CustomerID': rng.integers(12346, 13346, n_rows).astype(float),
+        'Country': 'United Kingdom'
+    })
+
+
+def test_outlier_filter():
+    """IQR bounds match the per-column pandas quantiles and are applied as one mask"""
+    print("\n🧹 Testing outlier filter...")
+    data = make_transactions()
+    outlier_filter = OutlierFilter(['Quantity', 'UnitPrice'])
+    filtered = outlier_filter.fit_transform(data)
+
+    expected = np.ones(len(data), dtype=bool)
+    for column in ['Quantity', 'UnitPrice']:
+        q1, q3 = data[column].quantile(0.25), data[column].quantile(0.75)
+        iqr = q3 - q1
+        assert np.allclose(outlier_filter.bounds_[column], (q1 - 1.5 * iqr, q3 + 1.5 * iqr))
+        expected &= data[column].between(q1 - 1.5 * iqr, q3 + 1.5 * iqr).to_numpy()
+
+    assert len(filtered) == expected.sum()
+    assert sum(outlier_filter.removed_counts_.values()) == len(data) - len(filtered)
+    print("✅ Outlier filter - Working")
+
+
+def test_outlier_filter_chunked():
+    """Streaming sketches give bounds close to the exact ones"""
+    print("\n🧹 Testing chunked outlier filter...")
+    data = make_transactions(50000)
+    for strategy in OutlierFilter.STRATEGIES:
+        exact = OutlierFilter(['UnitPrice'], strategy=strategy).fit(data)
+        streaming = OutlierFilter(['UnitPrice'], strategy=strategy)
+        for start in range(0, len(data), 7000):
+            streaming.partial_fit(data.iloc[start:start + 7000])
+        streaming.mask(data)
+
+        exact_lower, exact_upper = exact.bounds_['UnitPrice']
+        lower, upper = streaming.bounds_['UnitPrice']
+        scale = data['UnitPrice'].std()
+        assert abs(lower - exact_lower) < 0.1 * scale, strategy
+        assert abs(upper - exact_upper) < 0.1 * scale, strategy
+    print("✅ Chunked outlier filter - Working")
+
+
+def test_quantile_sketch():
+    """KLL sketch stays small and accurate"""
+    values = np.random.default_rng(0).lognormal(1, 1, 200000)
+    sketch = QuantileSketch(k=1000)
+    for start in range(0, len(values), 10000):
+        sketch.update(values[start:start + 10000])
+
+    estimates = sketch.quantiles([0.1, 0.5, 0.9])
+    ranks = np.searchsorted(np.sort(values), estimates) / len(values)
+    assert np.all(np.abs(ranks - [0.1, 0.5, 0.9]) < 0.01)
+    assert sketch.weighted_items()[0].size < 5000
+    print("✅ Quantile sketch - Working")
+
+
+def test_outlier_filter_cap():
+    """Percentile capping clips values instead of dropping rows"""
+    data = make_transactions()
+    capped = OutlierFilter(['UnitPrice'], strategy='percentile', cap=True).fit_transform(data)
+    assert len(capped) == len(data)
+    assert capped['UnitPrice'].max() <= data['UnitPrice'].quantile(0.99) + 1e-9
+    print("✅ Percentile cap - Working")
+
+
+def test_outlier_filter_without_spread():
+    """Constant or all-NaN columns get unbounded MAD fences and keep every row"""
+    data = pd.DataFrame({'Quantity': [np.nan] * 5, 'UnitPrice': [2.0] * 5})
+    outlier_filter = OutlierFilter(['Quantity', 'UnitPrice'], strategy='mad')
+    assert outlier_filter.fit(data).mask(data).all()
+    assert outlier_filter.bounds_['Quantity'] == (-np.inf, np.inf)
+
+    streaming = OutlierFilter(['Quantity'], strategy='mad').partial_fit(data.iloc[:0])
+    assert streaming.mask(data).all()
+    print("✅ Outlier filter without spread - Working")
+
+
+def test_hash_deduplication():
+    """Hash keys find the same duplicates as a full-frame drop_duplicates"""
+    print("\n🔑 Testing hash deduplication...")
+    data = make_transactions()
+    data = pd.concat([data, data.sample(500, random_state=1)], ignore_index=True)
+
+    deduplicator = HashDeduplicator()
+    deduplicated = deduplicator.drop_duplicates(data)
+    assert len(deduplicated) == len(data.drop_duplicates())
+    assert deduplicator.removed_count_ == len(data) - len(deduplicated)
+
+    # Rows that differ only in a non-key column are still duplicates
+    relabelled = data.assign(Description='Renamed product')
+    assert len(deduplicator.drop_duplicates(relabelled)) == len(deduplicated)
+
+    # Without StockCode, lines of one invoice that differ only in their
+    # product are not duplicates: every column is compared instead
+    lines = pd.DataFrame({'InvoiceNo': '536365', 'InvoiceDate': '2010-12-01 08:26:00', 'Quantity': 6,
+                          'UnitPrice': 2.55, 'CustomerID': 17850.0,
+                          'Description': ['WHITE HANGING HEART T-LIGHT HOLDER', 'WHITE METAL LANTERN',
+                                          'WHITE METAL LANTERN']})
+    assert deduplicator.key_columns(lines) == list(lines.columns)
+    assert len(deduplicator.drop_duplicates(lines)) == 2
+    print("✅ Hash deduplication - Working")
+
+
+def test_hash_deduplication_across_chunks():
+    """The seen-set removes duplicates that straddle chunk boundaries"""
+    data = make_transactions()
+    data = pd.concat([data, data.head(300)], ignore_index=True)
+    # Same key values with a different numeric dtype must hash the same
+    data['Quantity'] = data['Quantity'].astype(float)
+
+    deduplicator = HashDeduplicator()
+    chunks = []
+    for start in range(0, len(data), 3000):
+        chunk = data.iloc[start:start + 3000]
+        if start == 0:
+            chunk = chunk.astype({'Quantity': int})
+        chunks.append(deduplicator.drop_seen(chunk))
+
+    assert sum(len(chunk) for chunk in chunks) == len(data.drop_duplicates())
+    assert deduplicator.seen_count == len(data.drop_duplicates())
+    print("✅ Cross-chunk deduplication - Working")
+
+
+def test_invoice_date_parsing():
+    """Detected formats parse the same timestamps as pandas' own inference"""
+    print("\n📅 Testing InvoiceDate parsing...")
+    iso = make_transactions()['InvoiceDate']
+    assert detect_date_format(iso) == '%Y-%m-%d %H:%M:%S'
+    assert parse_invoice_dates(iso).equals(pd.to_datetime(iso))
+
+    uci = pd.Series(['12/1/2010 8:26', None, '12/13/2010 18:05', '1/2/2011 9:00'], index=[5, 6, 7, 8])
+    assert detect_date_format(uci) == '%m/%d/%Y %H:%M'
+    parsed = parse_invoice_dates(uci)
+    assert list(parsed.index) == [5, 6, 7, 8]
+    assert parsed.isna().tolist() == [False, True, False, False]
+    assert parsed.iloc[0] == pd.Timestamp('2010-12-01 08:26')
+
+    # A value outside the detected format falls back to mixed parsing
+    mixed = pd.Series(['2011-01-02 10:00:00'] * 600 + ['Jan 5 2011'] + ['2011-02-03 11:00:00'] * 600)
+    assert parse_invoice_dates(mixed).iloc[600] == pd.Timestamp('2011-01-05')
+
+    # An ambiguous column reads the same before and after a day-first file
+    ambiguous = pd.Series(['01/02/2011 08:26', '03/04/2011 09:00'])
+    before = parse_invoice_dates(ambiguous)
+    assert parse_invoice_dates(pd.Series(['25/04/2011 09:00'])).iloc[0] == pd.Timestamp('2011-04-25 09:00')
+    after = parse_invoice_dates(ambiguous)
+    assert before.tolist() == after.tolist() == [pd.Timestamp('2011-01-02 08:26'), pd.Timestamp('2011-03-04 09:00')]
+    print("✅ InvoiceDate parsing - Working")
+
+
+def write_excel_transactions(path, n_rows=3000):
+    """Write a workbook shaped like the UCI export (mixed-type codes, native dates)"""
+    from openpyxl import Workbook
+
+    data = make_transactions(n_rows)
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Online Retail')
+    worksheet.append(list(data.columns))
+    for i, row in enumerate(data.itertuples(index=False)):
+        worksheet.append([
+            f'C{row.InvoiceNo}' if i % 50 == 0 else int(row.InvoiceNo),
+            f'{row.StockCode}A' if i % 7 == 0 else int(row.StockCode),
+            row.Description, int(row.Quantity), pd.Timestamp(row.InvoiceDate).to_pydatetime(),
+            float(row.UnitPrice), None if i % 20 == 0 else float(row.CustomerID), row.Country
+        ])
+    workbook.save(path)
+    return data
+
+
+def test_excel_ingestion():
+    """Workbooks are streamed into a Parquet cache that the loaders read"""
+    print("\n📗 Testing Excel ingestion...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        excel_path = os.path.join(tmp_dir, 'transactions.xlsx')
+        source = write_excel_transactions(excel_path)
+
+        cache_path, stats = prepare_transactions(excel_path)
+        assert cache_path.endswith('.parquet') and os.path.exists(cache_path)
+        assert stats['rows'] == len(source) and stats['rows_per_second'] > 0
+        # A fresh cache is reused instead of converting again
+        assert prepare_transactions(excel_path) == (cache_path, None)
+
+        data = read_transactions(excel_path)
+        assert len(data) == len(source)
+        assert pd.api.types.is_datetime64_any_dtype(data['InvoiceDate'])
+        assert data['InvoiceNo'].iloc[0] == f"C{source['InvoiceNo'].iloc[0]}"
+        assert data['InvoiceNo'].iloc[1] == source['InvoiceNo'].iloc[1]
+        assert data['StockCode'].iloc[1] == source['StockCode'].iloc[1]
+        assert data['CustomerID'].isna().sum() == len(source[::20])
+        assert data['InvoiceDate'].equals(pd.to_datetime(source['InvoiceDate']))
+
+        chunks = list(iter_transactions(excel_path, 1000))
+        assert [len(chunk) for chunk in chunks] == [1000, 1000, 1000]
+    print("✅ Excel ingestion - Working")
+
+
+def test_excel_string_customer_ids():
+    """Customer codes such as CUST0001 survive the workbook path like they do in a CSV"""
+    print("\n🔤 Testing Excel customer codes...")
+    from openpyxl import Workbook
+
+    rows = [('536365', '85123A', 'WHITE HANGING HEART', 6, datetime(2011, 1, 4, 8, 26), 2.55, 'CUST0001', 'UK'),
+            ('536366', '71053', 'WHITE METAL LANTERN', 2, datetime(2011, 2, 5, 9, 0), 3.39, 'CUST0002', 'UK'),
+            ('536367', '84406B', 'CREAM CUPID HEARTS', 8, datetime(2011, 3, 6, 10, 15), 2.75, 'CUST0003', 'UK')]
+    columns = ['InvoiceNo', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'UnitPrice', 'CustomerID', 'Country']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        excel_path = os.path.join(tmp_dir, 'codes.xlsx')
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet('Online Retail')
+        worksheet.append(columns)
+        for row in rows:
+            worksheet.append(row)
+        # Numeric IDs in the same column keep their integer text form
+        worksheet.append(('536368', '22752', 'SET 7 BABUSHKA', 2, datetime(2011, 3, 7, 11, 0), 7.65, 17850.0, 'UK'))
+        workbook.save(excel_path)
+
+        data = read_transactions(excel_path)
+        assert data['CustomerID'].tolist() == ['CUST0001', 'CUST0002', 'CUST0003', '17850']
+        csv_path = os.path.join(tmp_dir, 'codes.csv')
+        pd.DataFrame(rows, columns=columns).to_csv(csv_path, index=False)
+        assert read_transactions(csv_path)['CustomerID'].tolist() == data['CustomerID'].tolist()[:3]
+
+        # No row is lost to the missing-CustomerID filter
+        plan = transaction_cleaning_plan()
+        cleaned = plan.collect(data)
+        assert plan.removed_count('CustomerID is not null') == 0
+        assert set(cleaned['CustomerID'].cat.categories) <= {'17850', 'CUST0001', 'CUST0002', 'CUST0003'}
+    print("✅ Excel customer codes - Working")
+
+
+def test_in_memory_sources():
+    """Buffers and file objects load like the files they were read from"""
+    print("\n🧠 Testing in-memory transaction sources...")
+    import io
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'transactions.csv')
+        make_transactions(5000).to_csv(csv_path, index=False)
+        excel_path = os.path.join(tmp_dir, 'transactions.xlsx')
+        write_excel_transactions(excel_path, n_rows=1000)
+        parquet_path = os.path.join(tmp_dir, 'snapshot.parquet')
+        read_transactions(csv_path).to_parquet(parquet_path)
+
+        for path in (csv_path, excel_path, parquet_path):
+            with open(path, 'rb') as f:
+                contents = f.read()
+            name = os.path.basename(path)
+            expected = read_transactions(path)
+            pd.testing.assert_frame_equal(read_transactions(memoryview(contents), name), expected)
+            pd.testing.assert_frame_equal(read_transactions(io.BytesIO(contents), name), expected)
+            chunks = list(iter_transactions(memoryview(contents), 700, file_name=name))
+            pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+        # Only the workbook on disk gets a Parquet cache
+        assert sorted(os.listdir(tmp_dir)) == ['snapshot.parquet', 'transactions.csv', 'transactions.parquet',
+                                               'transactions.xlsx']
+    print("✅ In-memory sources - Working")
+
+
+def test_column_projection():
+    """Only the columns of the requested analysis are read from each format"""
+    print("\n✂️ Testing column projection...")
+    columns = required_columns('rfm')
+    assert set(columns) == {'CustomerID', 'InvoiceNo', 'InvoiceDate', 'Quantity', 'UnitPrice', 'StockCode'}
+    assert required_columns(None) is None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'transactions.csv')
+        make_transactions(3000).to_csv(csv_path, index=False)
+        excel_path = os.path.join(tmp_dir, 'workbook.xlsx')
+        write_excel_transactions(excel_path, n_rows=1000)
+        parquet_path = os.path.join(tmp_dir, 'snapshot.parquet')
+        read_transactions(csv_path).to_parquet(parquet_path)
+
+        for path in (csv_path, excel_path, parquet_path):
+            full = read_transactions(path)
+            projected = read_transactions(path, columns=columns)
+            assert list(projected.columns) == [column for column in full.columns if column in columns]
+            pd.testing.assert_frame_equal(projected, full[projected.columns])
+            chunks = list(iter_transactions(path, 400, columns=columns))
+            pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), projected)
+
+        # A file lacking a requested column (here: no StockCode for the
+        # duplicate key) is read in full, so dedup can compare every column
+        without_stock_code = os.path.join(tmp_dir, 'no_stock_code.csv')
+        make_transactions(300).drop(columns='StockCode').to_csv(without_stock_code, index=False)
+        with open(without_stock_code, 'rb') as f:
+            for source in (without_stock_code, f):
+                data = read_transactions(source, file_name='upload.csv', columns=columns)
+                assert 'Description' in data.columns and len(data) == 300
+        pd.testing.assert_frame_equal(pd.concat(iter_transactions(without_stock_code, 100, columns=columns),
+                                                ignore_index=True), read_transactions(without_stock_code))
+        assert list(read_transactions(csv_path, columns=['CustomerID', 'InvoiceNo']).columns) == \
+            ['InvoiceNo', 'CustomerID']
+    print("✅ Column projection - Working")
+
+
+def test_cleaning_plan():
+    """The optimized plan filters first, fuses the filters and matches eager pandas cleaning"""
+    print("\n🧮 Testing cleaning plan...")
+    data = make_transactions()
+    data.loc[::17, 'CustomerID'] = np.nan
+    data = pd.concat([data, data.iloc[:500]], ignore_index=True)
+
+    plan = transaction_cleaning_plan()
+    steps = [step.describe() for step in plan.optimized()]
+    assert steps[0] == 'filter CustomerID is not null'
+    assert steps[1].startswith('drop duplicates') and steps[2].startswith('drop iqr outliers')
+    assert steps[3] == 'filter Quantity > 0 & UnitPrice > 0'
+    assert steps[4:] == ['transform CustomerID: int32 codes', 'transform InvoiceDate: parse dates']
+
+    cleaned = plan.collect(data)
+    expected = data.dropna(subset=['CustomerID'])
+    expected = expected.drop_duplicates(subset=['InvoiceNo', 'StockCode', 'InvoiceDate', 'Quantity',
+                                                'UnitPrice', 'CustomerID'])
+    # The fences are fitted with the returns included, as the eager cleaning did
+    expected = OutlierFilter(['Quantity', 'UnitPrice']).fit_transform(expected)
+    expected = expected[(expected['Quantity'] > 0) & (expected['UnitPrice'] > 0)].copy()
+    expected['CustomerID'] = expected['CustomerID'].astype(int).astype(str)
+    expected['InvoiceDate'] = pd.to_datetime(expected['InvoiceDate'])
+    pd.testing.assert_frame_equal(cleaned.astype({'CustomerID': object}), expected)
+    assert plan.removed_count('CustomerID is not null') == data['CustomerID'].isna().sum()
+
+    explanation = plan.explain()
+    assert f"{len(data):,} -> " in explanation and f"-> {len(cleaned):,} rows" in explanation
+
+    # Chunked runs share the steps; only the outlier fences are approximate
+    chunked_plan = transaction_cleaning_plan()
+    chunked = chunked_plan.collect_chunks(data.iloc[start:start + 3000] for start in range(0, len(data), 3000))
+    assert abs(len(chunked) - len(cleaned)) <= len(cleaned) * 0.01
+    assert chunked_plan.removed_count('Quantity > 0') == plan.removed_count('Quantity > 0')
+
+    # Filters recorded after a non-commuting transform stay behind it
+    recorded = (CleaningPlan().transform('double', 'Quantity', lambda values: values * 2)
+                .filter('Quantity > 10', ['Quantity'], lambda frame: frame['Quantity'].to_numpy() > 10))
+    assert [step.describe() for step in recorded.optimized()] == ['transform Quantity: double',
+                                                                  'filter Quantity > 10']
+    assert (recorded.collect(data)['Quantity'] > 10).all()
+
+    # ...and behind an outlier step, whose fences depend on the rows it sees
+    fenced = (CleaningPlan().drop_outliers(OutlierFilter(['Quantity']))
+              .require_positive(['Quantity']))
+    assert [step.describe() for step in fenced.optimized()] == ['drop iqr outliers in Quantity',
+                                                                'filter Quantity > 0']
+
+    assert len(DataCleaner().clean_data(data)) == len(cleaned)
+    print("✅ Cleaning plan - Working")
+
+
+def test_customer_id_encoding():
+    """Float, int and string IDs map to the same dense int32 codes and back"""
+    print("\n🔢 Testing customer ID encoding...")
+    floats = pd.Series([17850.0, 13047.0, np.nan, 17850.0, 12583.0])
+    ints = pd.Series([17850, 13047, 17850, 12583])
+    strings = pd.Series([' 17850', '13047.0', None, '17850', '12583'])
+
+    encoder = CustomerIdEncoder()
+    codes = encoder.fit_transform(floats)
+    assert codes.dtype == np.int32 and codes.tolist() == [2, 1, -1, 2, 0]
+    assert list(encoder.categories_) == ['12583', '13047', '17850']
+    assert list(encoder.inverse_transform(codes[codes >= 0])) == ['17850', '13047', '17850', '12583']
+    assert encoder.transform(strings).tolist() == [2, 1, -1, 2, 0]
+
+    for values in (ints, strings, floats.astype('Int64')):
+        other = CustomerIdEncoder()
+        other.fit_transform(values)
+        assert list(other.categories_) == ['12583', '13047', '17850']
+
+    # The categorical written by the cleaning plan is reused as is
+    categorical = encoder.to_categorical(floats)
+    assert CustomerIdEncoder().fit_transform(categorical).tolist() == codes.tolist()
+
+    mixed = CustomerIdEncoder()
+    assert mixed.fit_transform(pd.Series(['A12', '17850.0', 'A12 '])).tolist() == [1, 0, 1]
+    assert list(mixed.categories_) == ['17850', 'A12']
+    print("✅ Customer ID encoding - Working")
+
+
+def test_partitioned_rfm():
+    """Out-of-core RFM over spilled partitions equals the in-memory aggregation"""
+    print("\n💽 Testing out-of-core RFM...")
+    data = transaction_cleaning_plan().collect(make_transactions(30000))
+    latest_date = data['InvoiceDate'].max()
+    expected = finish_rfm(aggregate_customers(data), latest_date)
+
+    # Chunks carry the IDs as categorical, float and text, as different sources would
+    chunks = [data.iloc[:10000],
+              data.iloc[10000:20000].astype({'CustomerID': float}),
+              data.iloc[20000:].astype({'CustomerID': str})]
+    with tempfile.TemporaryDirectory() as spill_dir:
+        partitioned = PartitionedRFM(n_partitions=8, spill_dir=spill_dir)
+        rfm = partitioned.compute(iter(chunks))
+        assert os.listdir(spill_dir) == []
+    pd.testing.assert_frame_equal(rfm, expected)
+    assert sum(partitioned.partition_rows_) == len(data) and len(partitioned.partition_rows_) == 8
+    assert max(partitioned.partition_rows_) < 2 * len(data) / 8
+    assert partitioned.spilled_bytes_ > 0
+
+    parallel = PartitionedRFM(n_partitions=4, n_jobs=2).compute(iter(chunks))
+    pd.testing.assert_frame_equal(parallel, expected)
+    print("✅ Out-of-core RFM - Working")
+
+
+def test_sharded_rfm():
+    """Customer shards aggregated in worker processes give the in-memory RFM"""
+    print("\n🧮 Testing sharded RFM...")
+    data = transaction_cleaning_plan().collect(make_transactions(30000))
+    expected = finish_rfm(aggregate_customers(data), data['InvoiceDate'].max())
+    pd.testing.assert_frame_equal(sharded_rfm(data, n_jobs=1, n_shards=5), expected)
+    pd.testing.assert_frame_equal(sharded_rfm(data, n_jobs=2), expected)
+
+    # Raw float IDs with missing customers and a precomputed amount
+    raw = data.astype({'CustomerID': float}).assign(Amount=data['Quantity'] * data['UnitPrice'])
+    raw.loc[raw.index[:100], 'CustomerID'] = np.nan
+    expected = finish_rfm(aggregate_customers(raw.dropna(subset=['CustomerID'])), raw['InvoiceDate'].max())
+    pd.testing.assert_frame_equal(sharded_rfm(raw, n_jobs=2, n_shards=3), expected)
+
+    # Shards split on customer boundaries, so more shards than customers still works
+    few = data[data['CustomerID'].isin(data['CustomerID'].unique()[:3])]
+    expected = finish_rfm(aggregate_customers(few), few['InvoiceDate'].max())
+    pd.testing.assert_frame_equal(sharded_rfm(few, n_jobs=1, n_shards=8), expected)
+    print("✅ Sharded RFM - Working")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Janah data processing components")
+    print("=" * 60)
+    test_outlier_filter()
+    test_outlier_filter_chunked()
+    test_quantile_sketch()
+    test_outlier_filter_cap()
+    test_outlier_filter_without_spread()
+    test_hash_deduplication()
+    test_hash_deduplication_across_chunks()
+    test_invoice_date_parsing()
+    test_excel_ingestion()
+    test_excel_string_customer_ids()
+    test_in_memory_sources()
+    test_column_projection()
+    test_cleaning_plan()
+    test_customer_id_encoding()
+    test_partitioned_rfm()
+    test_sharded_rfm()
+    print("\n🎉 Data processing tests complete!")
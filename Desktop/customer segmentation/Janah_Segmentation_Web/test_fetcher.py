@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Test script for the dataset fetcher, using a local HTTP server in place of
+the UCI repository
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.datasets.fetcher import DatasetFetcher, ChecksumError
+
+PAYLOAD = os.urandom(300000)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+ETAG = '"retail-v1"'
+
+
+class DatasetHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD with Range/If-Range support; can drop the connection part-way"""
+
+    requests_seen = []
+    if_range_seen = []
+    drop_after = None
+    honour_range = True
+    delay = 0
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        type(self).requests_seen.append(range_header)
+        type(self).if_range_seen.append(self.headers.get('If-Range'))
+        time.sleep(self.delay)
+
+        start = 0
+        match = re.match(r'bytes=(\d+)-', range_header or '')
+        # A Range request for another version of the file gets the whole file
+        current = self.headers.get('If-Range') in (None, ETAG)
+        if match and self.honour_range and current:
+            start = int(match.group(1))
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(PAYLOAD)}')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}')
+        else:
+            self.send_response(200)
+
+        body = PAYLOAD[start:]
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        drop_after = self.drop_after
+        if drop_after is not None:
+            type(self).drop_after = None
+            self.wfile.write(body[:drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    DatasetHandler.requests_seen = []
+    DatasetHandler.if_range_seen = []
+    DatasetHandler.drop_after = None
+    DatasetHandler.honour_range = True
+    DatasetHandler.delay = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), DatasetHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/Online%20Retail.xlsx'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def write_partial(destination, data, validator=ETAG):
+    with open(destination + '.part', 'wb') as f:
+        f.write(data)
+    if validator:
+        with open(destination + '.part.validator', 'w') as f:
+            f.write(validator)
+
+
+def test_download_with_checksum(server):
+    """Streams the file to disk and verifies the digest"""
+    print("\n📥 Testing dataset download...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, 'online_retail.xlsx')
+        DatasetFetcher(chunk_size=65536).download(server, destination, PAYLOAD_SHA256)
+        assert read(destination) == PAYLOAD
+        assert not os.path.exists(destination + '.part')
+    print("✅ Dataset download - Working")
+
+
+def test_resume_partial_download(server):
+    """An existing .part file is resumed with a Range request guarded by If-Range"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, 'online_retail.xlsx')
+        write_partial(destination, PAYLOAD[:120000])
+
+        DatasetFetcher().download(server, destination, PAYLOAD_SHA256)
+        assert DatasetHandler.requests_seen == ['bytes=120000-']
+        assert DatasetHandler.if_range_seen == [ETAG]
+        assert read(destination) == PAYLOAD
+        assert os.listdir(tmp_dir) == ['online_retail.xlsx']
+    print("✅ Resumed download - Working")
+
+
+def test_changed_or_unvalidated_partial_restarts(server):
+    """A .part of another version, or one without a validator, is downloaded again"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, 'online_retail.xlsx')
+        write_partial(destination, b'x' * 120000, validator='"retail-v0"')
+        DatasetFetcher().download(server, destination)
+        assert DatasetHandler.if_range_seen == ['"retail-v0"']
+        assert read(destination) == PAYLOAD
+
+        write_partial(destination + '2', PAYLOAD[:120000], validator=None)
+        DatasetFetcher().download(server, destination + '2')
+        assert DatasetHandler.requests_seen[-1] is None
+        assert read(destination + '2') == PAYLOAD
+    print("✅ Stale partial restart - Working")
+
+
+def test_unsatisfiable_range(server):
+    """A 416 finalizes a partial file only when it has the full length"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, 'online_retail.xlsx')
+        write_partial(destination, PAYLOAD)
+        DatasetFetcher().download(server, destination, PAYLOAD_SHA256)
+        assert DatasetHandler.requests_seen == [f'bytes={len(PAYLOAD)}-']
+        assert read(destination) == PAYLOAD
+
+        # Longer than the file on the server: start over rather than keep it
+        write_partial(destination, PAYLOAD + b'trailing garbage')
+        DatasetFetcher().download(server, destination)
+        assert DatasetHandler.requests_seen[-1] is None
+        assert read(destination) == PAYLOAD
+    print("✅ Unsatisfiable range - Working")
+
+
+def test_resume_after_dropped_connection(server):
+    """A connection closed mid-transfer is retried from the last byte written"""
+    DatasetHandler.drop_after = 100000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, 'online_retail.xlsx')
+        DatasetFetcher(chunk_size=16384).download(server, destination, PAYLOAD_SHA256)
+        assert DatasetHandler.requests_seen[0] is None
+        assert DatasetHandler.requests_seen[1].startswith('bytes=')
+        assert read(destination) == PAYLOAD
+    print("✅ Retry after dropped connection - Working")
+
+
+def test_server_without_range_support(server):
+    """A 200 reply to a Range request restarts the file instead of appending"""
+    DatasetHandler.honour_range = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, 'online_retail.xlsx')
+        write_partial(destination, b'stale bytes')
+        DatasetFetcher().download(server, destination, PAYLOAD_SHA256)
+        assert read(destination) == PAYLOAD
+    print("✅ Restart without Range support - Working")
+
+
+def test_checksum_mismatch(server):
+    """A corrupt download is rejected and its partial file removed"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, 'online_retail.xlsx')
+        with pytest.raises(ChecksumError):
+            DatasetFetcher().download(server, destination, '0' * 64)
+        assert not os.path.exists(destination)
+        assert not os.path.exists(destination + '.part')
+        assert not os.path.exists(destination + '.part.validator')
+    print("✅ Checksum verification - Working")
+
+
+def test_concurrent_fetches_share_one_download(server):
+    """Concurrent fetches of the same destination collapse into one request"""
+    DatasetHandler.delay = 0.2
+    fetcher = DatasetFetcher()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        destination = os.path.join(tmp_dir, 'online_retail.xlsx')
+        futures = [fetcher.fetch(server, destination, PAYLOAD_SHA256) for _ in range(5)]
+        assert all(future is futures[0] for future in futures)
+        assert futures[0].result(timeout=10) == destination
+        assert len(DatasetHandler.requests_seen) == 1
+
+        # Post-processing runs once, inside the shared task
+        converted = fetcher.fetch(server, destination, PAYLOAD_SHA256, postprocess=lambda path: path + '.done')
+        assert converted.result(timeout=10) == destination + '.done'
+    fetcher.shutdown()
+    print("✅ Single-flight downloads - Working")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Janah dataset fetcher")
+    print("=" * 60)
+    pytest.main([__file__, "-q", "-s"])
@@ -85,8 +85,11 @@ def test_dataset():
     """Test if dataset is available"""
     print("\n📊 Testing Dataset...")
     
-    dataset_path = 'data/online_retail.csv'
-    if os.path.exists(dataset_path):
+    # download_dataset.py writes the Parquet transaction cache; the sample
+    # generator writes CSV
+    dataset_paths = ['data/online_retail.parquet', 'data/online_retail.csv']
+    dataset_path = next((path for path in dataset_paths if os.path.exists(path)), None)
+    if dataset_path:
         file_size = os.path.getsize(dataset_path)
         if file_size > 1000000:  # > 1MB
             print(f"✅ Dataset found ({file_size:,} bytes)")
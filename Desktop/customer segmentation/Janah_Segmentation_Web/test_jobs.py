@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Test script for background analysis jobs in app/jobs.py
+"""
+
+import os
+import tempfile
+import threading
+
+from app.jobs import (JobManager, QueueFullError, JobCancelledError, StageTimeoutError, JOB_PRIORITIES,
+                      current_job, input_fingerprint, job_key, estimate_job_memory)
+from app.analysis_worker import AnalysisCancelled, checkpoint, read_progress, request_cancel
+
+
+def test_identical_jobs_are_coalesced():
+    """Concurrent identical submissions share one computation and its result"""
+    print("\n🔗 Testing job coalescing...")
+    manager = JobManager()
+    release = threading.Event()
+    calls = []
+
+    def analysis(path):
+        calls.append(path)
+        release.wait(5)
+        return {'dataset_path': path}
+
+    key = job_key('dataset-digest', {'num_clusters': 4, 'analysis_type': 'rfm'})
+    submissions = [manager.submit(key, {'num_clusters': 4}, analysis, 'data.csv') for _ in range(10)]
+    release.set()
+
+    first_job = submissions[0][0]
+    assert all(job is first_job for job, _ in submissions)
+    assert [coalesced for _, coalesced in submissions] == [False] + [True] * 9
+    assert first_job.wait(5) and first_job.status == 'completed'
+    assert first_job.subscribers == 10
+    assert first_job.result == {'dataset_path': 'data.csv'}
+    assert calls == ['data.csv']
+    assert manager.get(first_job.id) is first_job
+
+    # Once finished, the same request starts a fresh computation
+    job, coalesced = manager.submit(key, {'num_clusters': 4}, analysis, 'data.csv')
+    assert not coalesced and job is not first_job
+    job.wait(5)
+    assert len(calls) == 2
+    print("✅ Job coalescing - Working")
+
+
+def test_different_parameters_run_separately():
+    """Parameter order does not matter, parameter values do"""
+    assert job_key('digest', {'a': 1, 'b': 2}) == job_key('digest', {'b': 2, 'a': 1})
+    assert job_key('digest', {'num_clusters': 4}) != job_key('digest', {'num_clusters': 5})
+    assert job_key('digest', {'num_clusters': 4}) != job_key('other', {'num_clusters': 4})
+
+    manager = JobManager()
+    release = threading.Event()
+    job_a, _ = manager.submit(job_key('digest', {'k': 4}), {'k': 4}, release.wait, 5)
+    job_b, coalesced = manager.submit(job_key('digest', {'k': 5}), {'k': 5}, release.wait, 5)
+    assert not coalesced and job_a is not job_b
+    assert manager.in_flight_count() == 2
+    release.set()
+    assert job_a.wait(5) and job_b.wait(5)
+    print("✅ Distinct jobs - Working")
+
+
+def test_failed_job_reports_error():
+    """An exception marks the job failed for every subscriber"""
+    def failing():
+        raise RuntimeError('Clustering failed')
+
+    job, _ = JobManager().submit('key', {}, failing)
+    assert job.wait(5)
+    assert job.status == 'failed' and job.error == 'Clustering failed'
+    print("✅ Failed job status - Working")
+
+
+def test_input_fingerprint_by_contents():
+    """Files with the same contents share a fingerprint regardless of name"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = [os.path.join(tmp_dir, name) for name in ('a.csv', 'b.csv', 'c.csv')]
+        for path, content in zip(paths, [b'CustomerID\n1\n', b'CustomerID\n1\n', b'CustomerID\n2\n']):
+            with open(path, 'wb') as f:
+                f.write(content)
+        assert input_fingerprint(paths[0]) == input_fingerprint(paths[1])
+        assert input_fingerprint(paths[0]) != input_fingerprint(paths[2])
+    print("✅ Input fingerprints - Working")
+
+
+def test_queue_full_is_rejected():
+    """Submissions beyond the queue bound raise with a retry hint"""
+    print("\n🚦 Testing admission control...")
+    manager = JobManager(max_concurrent=1, max_queued=2)
+    release = threading.Event()
+    running, _ = manager.submit('running', {}, release.wait, 5)
+    while running.status != 'running':
+        running.wait(0.01)
+    manager.submit('queued-1', {}, release.wait, 5)
+    manager.submit('queued-2', {}, release.wait, 5)
+
+    try:
+        manager.submit('rejected', {}, release.wait, 5)
+        assert False, "Queue should be full"
+    except QueueFullError as e:
+        assert e.retry_after >= 1
+
+    # Identical requests still attach to queued jobs while the queue is full
+    _, coalesced = manager.submit('queued-1', {}, release.wait, 5)
+    assert coalesced
+
+    metrics = manager.metrics()
+    assert metrics['queue_depth'] == 2 and metrics['running'] == 1
+    assert metrics['rejected'] == 1 and metrics['coalesced'] == 1
+    release.set()
+    print("✅ Admission control - Working")
+
+
+def test_priority_order():
+    """Higher-priority jobs leave the queue first"""
+    manager = JobManager(max_concurrent=1)
+    release = threading.Event()
+    order = []
+    blocker, _ = manager.submit('blocker', {}, release.wait, 5)
+    while blocker.status != 'running':
+        blocker.wait(0.01)
+
+    jobs = [manager.submit(name, {}, order.append, name, priority=JOB_PRIORITIES[level])[0]
+            for name, level in [('low', 'low'), ('normal', 'normal'), ('high', 'high')]]
+    assert manager.queue_position(jobs[2]) == 1 and manager.queue_position(jobs[0]) == 3
+    release.wait(0.05)
+    release.set()
+    for job in jobs:
+        job.wait(5)
+    assert order == ['high', 'normal', 'low']
+    assert manager.metrics()['max_wait_seconds'] >= 0.05
+    print("✅ Priority queue - Working")
+
+
+def test_memory_budget_limits_concurrency():
+    """Jobs whose estimates do not fit the budget wait for memory to free up"""
+    manager = JobManager(max_concurrent=3, memory_budget_mb=1000)
+    release = threading.Event()
+    big, _ = manager.submit('big', {}, release.wait, 5, memory_mb=700)
+    second, _ = manager.submit('second', {}, release.wait, 5, memory_mb=400)
+    small, _ = manager.submit('small', {}, release.wait, 5, memory_mb=200)
+    while big.status != 'running':
+        big.wait(0.01)
+    small.wait(0.2)
+    # The head of the queue does not fit, so nothing behind it jumps ahead
+    assert second.status == 'queued' and small.status == 'queued'
+    assert manager.metrics()['running_memory_mb'] == 700
+    release.set()
+    assert all(job.wait(5) for job in (big, second, small))
+    print("✅ Memory budget - Working")
+
+
+def test_estimate_job_memory():
+    """Memory estimates grow with input size and compressed formats count more"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        estimates = {}
+        for name in ('data.csv', 'data.parquet'):
+            path = os.path.join(tmp_dir, name)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 2 * 1024 * 1024)
+            estimates[name] = estimate_job_memory(path)
+        assert estimates['data.parquet'] > estimates['data.csv'] > 150
+    print("✅ Memory estimates - Working")
+
+
+def test_cancel_queued_and_running_jobs():
+    """Queued jobs are dropped; running jobs stop at their next checkpoint"""
+    print("\n🛑 Testing job cancellation...")
+    manager = JobManager(max_concurrent=1)
+    started = threading.Event()
+
+    def staged_analysis():
+        started.set()
+        for _ in range(500):
+            if current_job().cancel_event.is_set():
+                raise JobCancelledError("Cancelled during stage 'k_sweep'")
+            current_job().cancel_event.wait(0.01)
+        return 'finished'
+
+    running, _ = manager.submit('running', {}, staged_analysis)
+    queued, _ = manager.submit('queued', {}, staged_analysis)
+    assert started.wait(5)
+
+    manager.cancel(queued.id)
+    assert queued.finished and queued.status == 'cancelled'
+    assert manager.metrics()['queue_depth'] == 0
+
+    manager.cancel(running.id)
+    assert running.wait(5) and running.status == 'cancelled'
+    assert 'k_sweep' in running.error
+    assert manager.metrics()['cancelled'] == 2
+    print("✅ Job cancellation - Working")
+
+
+def test_cancel_shared_job_detaches_subscriber():
+    """Cancelling a coalesced job only detaches one request unless forced"""
+    manager = JobManager()
+    release = threading.Event()
+    job, _ = manager.submit('shared', {}, release.wait, 5)
+    manager.submit('shared', {}, release.wait, 5)
+
+    manager.cancel(job.id)
+    assert job.subscribers == 1 and not job.cancel_event.is_set()
+    manager.cancel(job.id, force=True)
+    assert job.cancel_event.is_set()
+    release.set()
+    job.wait(5)
+    print("✅ Shared job cancellation - Working")
+
+
+def test_stage_timeout_status():
+    """A stage over budget marks the job timed out and names the stage"""
+    def slow_stage():
+        raise StageTimeoutError('k_sweep', 900)
+
+    job, _ = JobManager().submit('slow', {}, slow_stage)
+    assert job.wait(5)
+    assert job.status == 'timed_out' and "'k_sweep'" in job.error
+    print("✅ Stage timeouts - Working")
+
+
+def test_worker_checkpoints():
+    """The worker records each stage and stops at a checkpoint once cancelled"""
+    with tempfile.TemporaryDirectory() as control_dir:
+        checkpoint(control_dir, 'cleaning', [])
+        assert read_progress(control_dir)['stage'] == 'cleaning'
+        checkpoint(control_dir, 'rfm', ['cleaning'])
+        assert read_progress(control_dir)['completed'] == ['cleaning']
+
+        request_cancel(control_dir)
+        try:
+            checkpoint(control_dir, 'k_sweep', ['cleaning', 'rfm'])
+            assert False, "Checkpoint should raise after cancellation"
+        except AnalysisCancelled:
+            pass
+        assert read_progress(control_dir)['stage'] == 'rfm'
+    print("✅ Worker checkpoints - Working")
+
+
+def test_listeners_run_outside_the_lock():
+    """Every event, 'submitted' included, reaches the listener with the manager's lock free"""
+    events = []
+
+    def listener(event, job, metrics):
+        # Another thread must be able to take the lock while the listener runs
+        acquired = []
+
+        def try_lock():
+            acquired.append(manager._lock.acquire(timeout=1))
+            if acquired[0]:
+                manager._lock.release()
+
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        events.append((event, acquired[0]))
+
+    manager = JobManager(listener=listener)
+    job, _ = manager.submit('key', {}, lambda: None)
+    assert job.wait(5)
+    assert events and all(free for _, free in events)
+    assert 'submitted' in [event for event, _ in events]
+    print("✅ Listeners outside the lock - Working")
+
+
+def test_job_results_are_published_per_job():
+    """Each job reads back its own summary; publishing moves its files into the shared directory"""
+    import json
+    from app.routes import publish_results
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        processed_dir = os.path.join(tmp_dir, 'processed')
+        summaries = []
+        for job_id, seconds in (('job-a', 1.5), ('job-b', 9.0)):
+            output_dir = os.path.join(tmp_dir, 'jobs', job_id, 'output')
+            os.makedirs(output_dir)
+            with open(os.path.join(output_dir, 'rfm_clustered.csv'), 'w') as f:
+                f.write(f"CustomerID,Cluster\n{job_id},0\n")
+            with open(os.path.join(output_dir, 'analysis_summary.json'), 'w') as f:
+                json.dump({'timings': {'total_wall_seconds': seconds}}, f)
+            os.makedirs(os.path.join(output_dir, 'plots'))
+            with open(os.path.join(output_dir, 'plots', 'rfm_analysis.png'), 'w') as f:
+                f.write(job_id)
+            summaries.append(publish_results(output_dir, processed_dir))
+            assert os.listdir(os.path.join(output_dir, 'plots')) == []
+
+        assert [summary['timings']['total_wall_seconds'] for summary in summaries] == [1.5, 9.0]
+        with open(os.path.join(processed_dir, 'rfm_clustered.csv')) as f:
+            assert 'job-b' in f.read()
+        with open(os.path.join(processed_dir, 'plots', 'rfm_analysis.png')) as f:
+            assert f.read() == 'job-b'
+        assert publish_results(os.path.join(tmp_dir, 'missing'), processed_dir) is None
+    print("✅ Per-job results - Working")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Janah analysis jobs")
+    print("=" * 60)
+    test_identical_jobs_are_coalesced()
+    test_different_parameters_run_separately()
+    test_failed_job_reports_error()
+    test_input_fingerprint_by_contents()
+    test_queue_full_is_rejected()
+    test_priority_order()
+    test_memory_budget_limits_concurrency()
+    test_estimate_job_memory()
+    test_cancel_queued_and_running_jobs()
+    test_cancel_shared_job_detaches_subscriber()
+    test_stage_timeout_status()
+    test_worker_checkpoints()
+    test_listeners_run_outside_the_lock()
+    test_job_results_are_published_per_job()
+    print("\n🎉 Job tests complete!")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Test script for the NumPy k-means in models/clustering/kmeans.py
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from models.clustering.kmeans import NumpyKMeans, CustomerSegmentation
+from models.clustering.coreset import KMeansCoreset
+from models.clustering.criteria import calinski_harabasz, davies_bouldin
+from models.clustering.selection import KSelector
+from models.clustering.shared import SharedMatrix, attach_matrix
+from models.clustering.sweep import sweep_k
+
+
+def make_rfm_features(n_rows=20000, seed=0):
+    """Standardized, skewed RFM-like features"""
+    rng = np.random.default_rng(seed)
+    features = np.column_stack([rng.exponential(90, n_rows), rng.poisson(4, n_rows) + 1,
+                                rng.lognormal(6, 1, n_rows)])
+    return (features - features.mean(axis=0)) / features.std(axis=0)
+
+
+def test_inertia_parity_with_sklearn():
+    """Full and sampled starts reach sklearn's inertia on RFM-like data"""
+    print("\n🎯 Testing k-means inertia parity...")
+    from sklearn.cluster import KMeans
+
+    features = make_rfm_features()
+    for k in (3, 4, 5):
+        reference = KMeans(n_clusters=k, random_state=42, n_init=10).fit(features).inertia_
+        full = NumpyKMeans(n_clusters=k, random_state=42, init_sample_size=None).fit(features)
+        sampled = NumpyKMeans(n_clusters=k, random_state=42, init_sample_size=5000).fit(features)
+        assert full.inertia_ <= reference * 1.01, (k, full.inertia_, reference)
+        assert sampled.inertia_ <= reference * 1.01, (k, sampled.inertia_, reference)
+        assert full.cluster_centers_.dtype == np.float32
+    print("✅ Inertia parity - Working")
+
+
+def test_separated_blobs_are_recovered():
+    """Well separated groups end up in their own clusters"""
+    rng = np.random.default_rng(1)
+    features = np.vstack([rng.normal(center, 0.3, (500, 3)) for center in (-4, 0, 4)])
+    model = NumpyKMeans(n_clusters=3, random_state=0).fit(features)
+    assert sorted(np.bincount(model.labels_)) == [500, 500, 500]
+    assert all(len(np.unique(model.labels_[i * 500:(i + 1) * 500])) == 1 for i in range(3))
+    assert np.array_equal(model.predict(features), model.labels_)
+    print("✅ Blob recovery - Working")
+
+
+def test_blocks_and_threads_do_not_change_the_result():
+    """Blocked, threaded distance passes give the same clustering as one block"""
+    features = make_rfm_features(n_rows=6000)
+    single = NumpyKMeans(n_clusters=4, random_state=3, block_size=10 ** 6, n_jobs=1).fit(features)
+    blocked = NumpyKMeans(n_clusters=4, random_state=3, block_size=500, n_jobs=4).fit(features)
+    assert np.array_equal(single.labels_, blocked.labels_)
+    assert np.isclose(single.inertia_, blocked.inertia_, rtol=1e-5)
+    print("✅ Blocked distances - Working")
+
+
+def test_degenerate_inputs():
+    """Duplicate rows cannot leave a cluster empty; too few rows is an error"""
+    features = np.repeat(np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]]), 50, axis=0)
+    model = NumpyKMeans(n_clusters=3, random_state=0).fit(features)
+    assert model.inertia_ == 0 and len(model.labels_) == 100
+
+    try:
+        NumpyKMeans(n_clusters=5).fit(np.zeros((3, 3)))
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+
+    labels = CustomerSegmentation(n_clusters=3).fit_predict(make_rfm_features(n_rows=1000))
+    assert set(labels) == {0, 1, 2}
+    print("✅ Degenerate inputs - Working")
+
+
+def _column_sums(spec):
+    with attach_matrix(spec) as matrix:
+        assert not matrix.flags.writeable
+        return matrix.sum(axis=0)
+
+
+def _crash(spec):
+    with attach_matrix(spec):
+        os._exit(1)
+
+
+def test_shared_matrix_lifecycle():
+    """Workers attach to the shared matrix by name; the segment is unlinked on exit, even after a crash"""
+    print("\n🔗 Testing shared feature matrix...")
+    features = make_rfm_features(n_rows=1000)
+    with SharedMatrix(features, dtype=np.float32) as shared, ProcessPoolExecutor(max_workers=2) as pool:
+        assert np.array_equal(shared.array, features.astype(np.float32))
+        sums = list(pool.map(_column_sums, [shared.spec] * 2))
+        name = shared.name
+    assert all(np.allclose(total, features.astype(np.float32).sum(axis=0)) for total in sums)
+    assert shared.closed and not os.path.exists(f"/dev/shm/{name}")
+
+    shared = SharedMatrix(features)
+    try:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            pool.submit(_crash, shared.spec).result()
+        assert False, "Expected the worker to crash"
+    except Exception as error:
+        assert 'terminated abruptly' in str(error)
+    finally:
+        shared.close()
+    assert not os.path.exists(f"/dev/shm/{shared.name}")
+    print("✅ Shared feature matrix - Working")
+
+
+def test_parallel_sweep_matches_serial():
+    """The k-sweep over shared memory gives the in-process results"""
+    features = make_rfm_features(n_rows=3000)
+    serial = sweep_k(features, range(2, 6), n_jobs=1, random_state=42, n_init=3)
+    parallel = sweep_k(features, range(2, 6), n_jobs=2, random_state=42, n_init=3)
+    assert [result['k'] for result in parallel] == [2, 3, 4, 5]
+    for one, other in zip(serial, parallel):
+        assert np.isclose(one['inertia'], other['inertia'], rtol=1e-5)
+        assert np.isclose(one['silhouette'], other['silhouette'], rtol=1e-4)
+    print("✅ Parallel k-sweep - Working")
+
+
+def test_sample_weight_matches_repeated_rows():
+    """Integer weights give the same clustering as repeating the rows"""
+    print("\n⚖️ Testing weighted k-means...")
+    features = make_rfm_features(n_rows=2000)
+    weights = np.random.default_rng(0).integers(1, 4, len(features))
+    weighted = NumpyKMeans(n_clusters=4, random_state=0, init_sample_size=None).fit(features, weights)
+    repeated = NumpyKMeans(n_clusters=4, random_state=0, init_sample_size=None).fit(np.repeat(features, weights, axis=0))
+    assert np.isclose(weighted.inertia_, repeated.inertia_, rtol=1e-3)
+
+    try:
+        NumpyKMeans(n_clusters=2).fit(features, np.zeros(len(features)))
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    print("✅ Weighted k-means - Working")
+
+
+def test_coreset_clustering_cost():
+    """Centers fitted on a coreset cost about as much on all rows as a full fit"""
+    features = make_rfm_features(n_rows=100000)
+    coreset = KMeansCoreset(size=5000, random_state=0).fit(features)
+    assert coreset.points_.shape == (5000, 3)
+    assert np.isclose(coreset.weights_.sum(), len(features), rtol=0.05)
+
+    for k in (3, 5):
+        full = NumpyKMeans(n_clusters=k, random_state=0).fit(features)
+        model = NumpyKMeans(n_clusters=k, random_state=0).fit(coreset.points_, coreset.weights_)
+        labels = model.predict(features)
+        cost = float(((features - model.cluster_centers_[labels]) ** 2).sum())
+        assert cost <= full.inertia_ * 1.03, (k, cost, full.inertia_)
+
+    small = KMeansCoreset(size=5000).fit(features[:100])
+    assert len(small.points_) == 100 and np.all(small.weights_ == 1)
+    print("✅ Coreset clustering - Working")
+
+
+def test_cheap_criteria_match_sklearn():
+    """Calinski-Harabasz and Davies-Bouldin match sklearn, and weights act as repeated rows"""
+    print("\n📐 Testing k-selection criteria...")
+    from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score
+
+    features = make_rfm_features(n_rows=3000)
+    labels = NumpyKMeans(n_clusters=4, random_state=0).fit_predict(features)
+    assert np.isclose(calinski_harabasz(features, labels), calinski_harabasz_score(features, labels))
+    assert np.isclose(davies_bouldin(features, labels), davies_bouldin_score(features, labels))
+
+    weights = np.random.default_rng(0).integers(1, 4, len(features))
+    repeated, repeated_labels = np.repeat(features, weights, axis=0), np.repeat(labels, weights)
+    assert np.isclose(calinski_harabasz(features, labels, weights),
+                      calinski_harabasz_score(repeated, repeated_labels))
+    assert np.isclose(davies_bouldin(features, labels, weights), davies_bouldin_score(repeated, repeated_labels))
+    print("✅ K-selection criteria - Working")
+
+
+def test_k_selector_stops_on_plateau():
+    """The selector finds the true k of separated blobs without fitting every candidate"""
+    rng = np.random.default_rng(2)
+    centers = np.array([[-5, 0, 0], [5, 0, 0], [0, 5, 0], [0, -5, 5]])
+    features = np.vstack([rng.normal(center, 0.5, (400, 3)) for center in centers])
+    for criterion in ('calinski_harabasz', 'davies_bouldin', 'silhouette', 'elbow'):
+        selector = KSelector(k_min=2, k_max=10, criterion=criterion, random_state=0).fit(features)
+        assert selector.k_ == 4, (criterion, selector.scores_)
+        assert selector.criterion_ == criterion
+        assert selector.stopped_early_ and selector.n_fits_ == len(selector.scores_) < 9
+
+    serial = KSelector(k_min=2, k_max=10, random_state=0).fit(features)
+    for n_jobs in (2, 8):
+        batched = KSelector(k_min=2, k_max=10, random_state=0, n_jobs=n_jobs).fit(features)
+        # Batching never fits a candidate the serial walk would have skipped
+        assert batched.k_ == 4 and batched.n_fits_ == serial.n_fits_ < 9
+
+    try:
+        KSelector(criterion='gap')
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    print("✅ Early-stopping k selection - Working")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Janah k-means")
+    print("=" * 60)
+    test_inertia_parity_with_sklearn()
+    test_separated_blobs_are_recovered()
+    test_blocks_and_threads_do_not_change_the_result()
+    test_degenerate_inputs()
+    test_shared_matrix_lifecycle()
+    test_parallel_sweep_matches_serial()
+    test_sample_weight_matches_repeated_rows()
+    test_coreset_clustering_cost()
+    test_cheap_criteria_match_sklearn()
+    test_k_selector_stops_on_plateau()
+    print("\n🎉 K-means tests complete!")
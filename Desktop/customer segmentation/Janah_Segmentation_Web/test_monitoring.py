@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for the monitoring utilities in utils/monitoring
+"""
+
+import os
+import tempfile
+
+import pandas as pd
+
+from utils.monitoring import metrics
+from utils.monitoring.profiling import StageProfiler
+
+
+def test_stage_profiler():
+    """Each stage records wall/CPU time, rows in/out and peak memory"""
+    print("\n⏱️ Testing stage profiler...")
+    profiler = StageProfiler()
+    data = pd.DataFrame({'CustomerID': range(1000), 'Monetary': 1.0})
+
+    filtered = profiler.call('cleaning', lambda df: df[df['CustomerID'] % 2 == 0], data)
+    clustered, k = profiler.call('k_sweep', lambda df: (df.assign(Cluster=0), 3), filtered)
+    assert k == 3 and len(clustered) == 500
+
+    cleaning, k_sweep = profiler.stages
+    assert (cleaning['rows_in'], cleaning['rows_out']) == (1000, 500)
+    assert (k_sweep['rows_in'], k_sweep['rows_out']) == (500, 500)
+    assert cleaning['wall_seconds'] >= 0 and cleaning['cpu_seconds'] >= 0
+
+    breakdown = profiler.to_dict()
+    assert [stage['stage'] for stage in breakdown['stages']] == ['cleaning', 'k_sweep']
+    assert breakdown['total_wall_seconds'] >= cleaning['wall_seconds']
+    if breakdown['peak_rss_mb'] is not None:
+        assert breakdown['peak_rss_mb'] == max(cleaning['peak_rss_mb'], k_sweep['peak_rss_mb']) > 0
+    print("✅ Stage profiler - Working")
+
+
+def test_stage_peaks_are_per_stage():
+    """A stage after a memory-hungry one reports its own, lower peak"""
+    import numpy as np
+
+    def allocate():
+        block = np.ones(200 * 1024 * 1024 // 8)
+        return float(block.sum())
+
+    profiler = StageProfiler()
+    profiler.call('clustering', allocate)
+    profiler.call('plotting', lambda: sum(range(1000)))
+    clustering, plotting = profiler.stages
+    if clustering['peak_rss_mb'] is None:
+        print("⚠️ Memory readings unavailable - skipping")
+        return
+    assert clustering['peak_rss_mb'] - plotting['peak_rss_mb'] > 100
+    assert profiler.to_dict()['peak_rss_mb'] == clustering['peak_rss_mb']
+    print("✅ Per-stage peak memory - Working")
+
+
+def test_stage_profiler_records_failures():
+    """A failing stage is still timed before the exception propagates"""
+    profiler = StageProfiler()
+    try:
+        profiler.call('rfm', lambda: 1 / 0)
+        assert False, "Exception should propagate"
+    except ZeroDivisionError:
+        pass
+    assert profiler.stages[0]['stage'] == 'rfm'
+    assert 'rows_out' not in profiler.stages[0]
+    print("✅ Failed stage timing - Working")
+
+
+def test_opt_in_cprofile():
+    """cProfile output is only written when profiling is enabled"""
+    assert StageProfiler().save_profile('unused.prof') is None
+
+    profiler = StageProfiler(profile=True)
+    profiler.call('rfm', sorted, list(range(10000, 0, -1)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'job.prof')
+        summary = profiler.save_profile(path)
+        assert os.path.exists(path) and os.path.exists(path + '.txt')
+        assert 'sorted' in summary
+    print("✅ cProfile capture - Working")
+
+
+def test_metrics_endpoint():
+    """/metrics exposes request latency, job and cache metrics"""
+    print("\n📈 Testing metrics endpoint...")
+    if not metrics.PROMETHEUS_AVAILABLE:
+        print("⚠️ prometheus_client not installed - skipping")
+        return
+
+    from types import SimpleNamespace
+    from app import create_app
+
+    app = create_app()
+    client = app.test_client()
+    assert client.get('/api/queue-metrics').status_code == 200
+
+    job = SimpleNamespace(status='completed', result={'timings': {
+        'stages': [{'stage': 'rfm', 'wall_seconds': 1.5}], 'peak_rss_mb': 300.0}})
+    metrics.record_job_event('submitted', job, {'queue_depth': 1, 'running': 0})
+    metrics.record_job_event('finished', job, {'queue_depth': 0, 'running': 0})
+    metrics.record_cache('transactions', True)
+    metrics.record_upload(2048)
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    body = response.get_data(as_text=True)
+    assert 'janah_http_request_duration_seconds_bucket{endpoint="/api/queue-metrics"' in body
+    assert 'janah_analysis_jobs_total{status="completed"}' in body
+    assert 'janah_analysis_stage_duration_seconds_count{stage="rfm"}' in body
+    assert 'janah_cache_requests_total{cache="transactions",result="hit"}' in body
+    assert 'janah_upload_bytes_total' in body
+    print("✅ Metrics endpoint - Working")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Janah monitoring utilities")
+    print("=" * 60)
+    test_stage_profiler()
+    test_stage_peaks_are_per_stage()
+    test_stage_profiler_records_failures()
+    test_opt_in_cprofile()
+    test_metrics_endpoint()
+    print("\n🎉 Monitoring tests complete!")
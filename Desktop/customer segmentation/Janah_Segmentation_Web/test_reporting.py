@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test script for segmentation report generation and the report download API
+"""
+
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from utils.reporting.report import REPORT_FORMATS, render_report, summarize_segments, technical_details
+
+ANALYSIS_PARAMS = {"data_source": "Default Dataset", "n_clusters": 3, "total_customers": 6}
+
+
+def make_clustered_data():
+    """Clustered RFM data like the segmentation writes to rfm_clustered.csv"""
+    return pd.DataFrame({
+        'CustomerID': [1, 2, 3, 4, 5, 6],
+        'Recency': [30, 60, 15, 90, 45, 20],
+        'Frequency': [5, 3, 8, 1, 4, 6],
+        'Monetary': [1500.0, 800.0, 2000.0, 300.0, 1200.0, 1700.0],
+        'Cluster': [0, 1, 0, 2, 1, 0],
+        'Segment': ['Loyal Customers', 'At-Risk Customers', 'Loyal Customers', 'Inactive Customers',
+                    'At-Risk Customers', 'Loyal Customers']
+    })
+
+
+def test_summarize_segments():
+    """One aggregation pass gives every per-segment statistic, in order of first appearance"""
+    print("\n📊 Testing segment summary...")
+    summary = summarize_segments(make_clustered_data())
+    assert summary['total_customers'] == 6 and summary['n_segments'] == 3
+    assert [segment['name'] for segment in summary['segments']] == [
+        'Loyal Customers', 'At-Risk Customers', 'Inactive Customers']
+
+    loyal = summary['segments'][0]
+    assert loyal['count'] == 3 and loyal['percentage'] == 50.0
+    assert loyal['total_revenue'] == 5200.0 and loyal['avg_frequency'] == 19 / 3
+    assert loyal['recommendations'][0] == "Maintain relationship with exclusive offers"
+    assert summary['top_revenue_segment'] == summary['largest_segment'] == 'Loyal Customers'
+
+    # Without segment names the clusters are reported
+    by_cluster = summarize_segments(make_clustered_data().drop(columns='Segment'))
+    assert [segment['name'] for segment in by_cluster['segments']] == ['Cluster 0', 'Cluster 1', 'Cluster 2']
+    print("✅ Segment summary - Working")
+
+
+def test_render_report_formats():
+    """TXT, HTML and PDF reports list every segment; unknown formats are rejected"""
+    print("\n📄 Testing report formats...")
+    summary = summarize_segments(make_clustered_data())
+
+    text = render_report(summary, ANALYSIS_PARAMS, 'txt')
+    assert "JANAH HARDWARE STORE" in text
+    for name in ('LOYAL CUSTOMERS', 'AT-RISK CUSTOMERS', 'INACTIVE CUSTOMERS'):
+        assert name in text
+    assert "- Customer Count: 3 (50.0%)" in text and "Total Revenue: $5,200.00" in text
+
+    page = render_report(summary, ANALYSIS_PARAMS, 'html')
+    assert page.startswith('<!DOCTYPE html>')
+    assert page.count('<tr><td>') == 3
+    assert "<tr><td>Loyal Customers</td><td>3</td><td>50.0%</td>" in page
+
+    pdf = render_report(summary, ANALYSIS_PARAMS, 'pdf')
+    assert isinstance(pdf, bytes) and pdf.startswith(b'%PDF-') and pdf.rstrip().endswith(b'%%EOF')
+    assert b'/Type /Page ' in pdf
+
+    try:
+        render_report(summary, ANALYSIS_PARAMS, 'docx')
+        assert False, "Expected ValueError"
+    except ValueError as e:
+        assert 'docx' in str(e)
+    print("✅ Report formats - Working")
+
+
+def test_technical_details():
+    """The technical details describe the cluster selection and outlier filter actually used"""
+    print("\n🔧 Testing report technical details...")
+    selection = {'criterion': 'calinski_harabasz', 'fits': 3, 'candidates': 4, 'stopped_early': True}
+    details = technical_details(dict(ANALYSIS_PARAMS, k_selection=selection, outlier_strategy='mad'))
+    assert "Optimal Clusters: Selected by the Calinski-Harabasz criterion (3 of 4 candidate k values fitted, " \
+           "stopped early)" in details
+    assert "Data Quality: Quantity and UnitPrice outliers removed using median absolute deviation" in details
+    assert not any('Elbow' in line or 'Silhouette' in line or 'IQR' in line for line in details)
+
+    # A user-chosen k is reported as such, and nothing is claimed about unknown cleaning
+    details = technical_details(ANALYSIS_PARAMS)
+    assert "Number of Clusters: 3 (set by the user)" in details
+    assert not any(line.startswith(('Optimal Clusters', 'Data Quality')) for line in details)
+
+    summary = summarize_segments(make_clustered_data())
+    params = dict(ANALYSIS_PARAMS, outlier_strategy='iqr')
+    assert "- Data Quality: Quantity and UnitPrice outliers removed using IQR fences" in render_report(summary, params)
+    assert "<li>Data Quality: Quantity and UnitPrice outliers removed using IQR fences</li>" in render_report(
+        summary, params, 'html')
+    print("✅ Report technical details - Working")
+
+
+def test_download_report_endpoint():
+    """/api/download-report serves each format as an attachment from the processed results"""
+    print("\n⬇️ Testing report download API...")
+    from app import create_app
+
+    app = create_app()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The routes read <root_path>/../data/processed, so point the app at a temporary tree
+        app.root_path = os.path.join(tmp_dir, 'app')
+        processed_dir = os.path.join(tmp_dir, 'data', 'processed')
+        os.makedirs(processed_dir)
+        os.makedirs(app.root_path)
+        client = app.test_client()
+
+        response = client.get('/api/download-report?format=txt')
+        assert response.status_code == 404
+
+        make_clustered_data().to_csv(os.path.join(processed_dir, 'rfm_clustered.csv'), index=False)
+        for fmt, mimetype in REPORT_FORMATS.items():
+            response = client.get(f'/api/download-report?format={fmt}')
+            assert response.status_code == 200, response.get_data(as_text=True)
+            assert response.mimetype == mimetype
+            assert 'attachment' in response.headers['Content-Disposition']
+            assert response.headers['Content-Disposition'].rstrip('"').endswith(f'.{fmt}')
+            if fmt == 'pdf':
+                assert response.data.startswith(b'%PDF-')
+            else:
+                assert 'LOYAL CUSTOMERS' in response.get_data(as_text=True).upper()
+
+        # The published summary tells the report how the analysis was run
+        with open(os.path.join(processed_dir, 'analysis_summary.json'), 'w') as f:
+            json.dump({'k_selection': {'criterion': 'silhouette', 'fits': 4, 'candidates': 4, 'stopped_early': False},
+                       'outlier_strategy': 'percentile'}, f)
+        text = client.get('/api/download-report?format=txt').get_data(as_text=True)
+        assert "Selected by the Silhouette criterion (4 of 4 candidate k values fitted)" in text
+        assert "outliers removed using percentile bounds" in text
+
+        response = client.get('/api/download-report?format=xml')
+        assert response.status_code == 400
+        assert 'xml' in response.get_json()['error']
+    print("✅ Report download API - Working")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Janah segmentation reports")
+    print("=" * 60)
+    test_summarize_segments()
+    test_render_report_formats()
+    test_technical_details()
+    test_download_report_endpoint()
+    print("\n🎉 Report tests complete!")
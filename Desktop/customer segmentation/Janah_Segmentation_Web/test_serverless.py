@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for the serverless handler in netlify/functions/api.py
+"""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'netlify', 'functions')
+
+
+def load_handler_module():
+    spec = importlib.util.spec_from_file_location('netlify_api', os.path.join(FUNCTIONS_DIR, 'api.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_transactions(n_rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'CustomerID': rng.integers(12000, 12300, n_rows).astype(float),
+        'InvoiceNo': rng.integers(500000, 501500, n_rows).astype(str),
+        'InvoiceDate': (pd.Timestamp('2011-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, n_rows),
+                                                                    unit='m')).strftime('%Y-%m-%d %H:%M:%S'),
+        'Quantity': rng.integers(-2, 20, n_rows),
+        'UnitPrice': rng.uniform(0.1, 20, n_rows).round(2)
+    })
+    data.loc[:30, 'CustomerID'] = np.nan
+    # Duplicate lines, as in the UCI export
+    return pd.concat([data, data.iloc[100:150]], ignore_index=True)
+
+
+def test_cold_start_imports():
+    """Importing the handler loads NumPy only, not pandas or sklearn"""
+    print("\n☁️ Testing serverless cold start...")
+    code = "import sys, api; print(','.join(m for m in ('pandas', 'sklearn') if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=FUNCTIONS_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
+    print("✅ Serverless cold start imports - Working")
+
+
+def test_numpy_rfm_matches_pandas():
+    """The vectorized RFM equals the pandas groupby used by the web app"""
+    api = load_handler_module()
+    data = make_transactions()
+    columns = api.parse_transactions({'transactions': data.where(data.notna(), None).to_dict('list')})
+    _, rfm = api.calculate_rfm(*api.clean_transactions(columns))
+
+    clean = data.dropna(subset=['CustomerID']).drop_duplicates()
+    clean = clean[(clean['Quantity'] > 0) & (clean['UnitPrice'] > 0)].copy()
+    clean['InvoiceDate'] = pd.to_datetime(clean['InvoiceDate'])
+    clean['Amount'] = clean['Quantity'] * clean['UnitPrice']
+    latest = clean['InvoiceDate'].max()
+    expected = clean.groupby('CustomerID').agg(
+        Recency=('InvoiceDate', lambda x: (latest - x.max()).days),
+        Frequency=('InvoiceNo', 'nunique'),
+        Monetary=('Amount', 'sum'))
+    assert np.allclose(rfm, expected.values)
+    print("✅ NumPy RFM - Working")
+
+
+def test_multi_line_invoices_are_not_merged():
+    """Distinct products at the same quantity and price on one invoice all count towards Monetary"""
+    api = load_handler_module()
+    lines = [{'CustomerID': 17850.0, 'InvoiceNo': '536365', 'InvoiceDate': '2010-12-01 08:26:00',
+              'StockCode': stock_code, 'Quantity': 6, 'UnitPrice': 2.55}
+             for stock_code in ('85123A', '71053', '84406B', '84406B')]
+    for request in ({'transactions': lines},
+                    {'csv': pd.DataFrame(lines).to_csv(index=False)}):
+        columns = api.parse_transactions(request)
+        _, rfm = api.calculate_rfm(*api.clean_transactions(columns))
+        # The repeated 84406B line is a real duplicate
+        assert np.allclose(rfm, [[0, 1, 45.9]]), rfm
+
+    # Without StockCode the posted columns are the whole row
+    without_stock_code = [{key: value for key, value in line.items() if key != 'StockCode'} for line in lines]
+    columns = api.parse_transactions({'transactions': without_stock_code})
+    assert 'StockCode' not in columns
+    assert len(api.clean_transactions(columns)[0]) == 1
+    print("✅ Multi-line invoices - Working")
+
+
+def test_handler_runs_real_segmentation():
+    """POST /api/run-segmentation clusters the posted CSV and serves repeats from the warm cache"""
+    api = load_handler_module()
+    data = make_transactions()
+    # UCI-style dates exercise the lazy pandas fallback
+    data['InvoiceDate'] = pd.to_datetime(data['InvoiceDate']).dt.strftime('%m/%d/%Y %H:%M')
+    body = json.dumps({'csv': data.to_csv(index=False), 'n_clusters': 3}).encode()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), api.handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}/api/run-segmentation'
+        responses = []
+        for _ in range(2):
+            request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request) as response:
+                responses.append(json.loads(response.read()))
+
+        request = urllib.request.Request(url, data=b'{"n_clusters": 3}')
+        try:
+            urllib.request.urlopen(request)
+            assert False, "Missing transactions should be rejected"
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+    finally:
+        server.shutdown()
+
+    first, second = responses
+    assert first['status'] == 'completed' and first['n_clusters'] == 3
+    assert first['total_customers'] == data['CustomerID'].nunique()
+    assert sum(first['cluster_sizes'].values()) == first['total_customers']
+    assert first['cached'] is False and second['cached'] is True
+    assert second['cluster_sizes'] == first['cluster_sizes']
+    assert first['timings']['cold_start'] and not second['timings']['cold_start']
+    print("✅ Serverless segmentation - Working")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Janah serverless handler")
+    print("=" * 60)
+    test_cold_start_imports()
+    test_numpy_rfm_matches_pandas()
+    test_multi_line_invoices_are_not_merged()
+    test_handler_runs_real_segmentation()
+    print("\n🎉 Serverless tests complete!")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for the cached Streamlit pipeline in streamlit/segmentation.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Runs outside the project directory so the local ``streamlit`` package does
+# not shadow the real library. The app is run from a temporary working
+# directory holding only the test dataset, so the project's data/ is never
+# touched, and the pipeline entry points are wrapped to count cache misses.
+APP_SCRIPT = """
+import json, os, sys
+from streamlit.testing.v1 import AppTest
+
+project_root, work_dir = sys.argv[1], sys.argv[2]
+sys.path.append(project_root)
+import utils.data_processing.loader as loader
+import utils.data_processing.rfm as rfm
+from models.clustering.selection import KSelector
+
+calls = {'load': 0, 'rfm': 0, 'clustering': 0}
+
+def counted(name, func):
+    def wrapper(*args, **kwargs):
+        calls[name] += 1
+        return func(*args, **kwargs)
+    return wrapper
+
+loader.read_transactions = counted('load', loader.read_transactions)
+rfm.aggregate_customers = counted('rfm', rfm.aggregate_customers)
+KSelector.fit = counted('clustering', KSelector.fit)
+
+os.chdir(work_dir)
+at = AppTest.from_file(os.path.join(project_root, 'streamlit', 'segmentation.py'), default_timeout=300)
+at.run()
+report = {'before_run': [info.value for info in at.info]}
+
+at.sidebar.button[0].click()
+at.run()
+report['run_calls'] = dict(calls)
+report['metrics'] = [metric.value for metric in at.metric]
+
+# A widget interaction reruns the script from the session state
+at.selectbox[0].select(at.selectbox[0].options[-1])
+at.run()
+report['rerun_calls'] = dict(calls)
+report['rerun_metrics'] = [metric.value for metric in at.metric]
+
+# Running again with the same dataset and parameters hits the cache
+at.sidebar.button[0].click()
+at.run()
+report['cached_run_calls'] = dict(calls)
+report['cached_run_metrics'] = [metric.value for metric in at.metric]
+report['exceptions'] = [str(exception.value) for exception in at.exception]
+print(json.dumps(report))
+"""
+
+
+def make_dataset(n_rows=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'InvoiceNo': rng.integers(500000, 505000, n_rows).astype(str),
+        'StockCode': '85123A',
+        'Description': 'WHITE HANGING HEART T-LIGHT HOLDER',
+        'Quantity': rng.integers(1, 20, n_rows),
+        'InvoiceDate': (pd.Timestamp('2011-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, n_rows),
+                                                                    unit='m')).strftime('%m/%d/%Y %H:%M'),
+        'UnitPrice': rng.uniform(0.5, 20, n_rows).round(2),
+        'CustomerID': rng.integers(12000, 13500, n_rows).astype(float),
+        'Country': 'United Kingdom'
+    })
+
+
+def test_streamlit_reruns_use_cached_results():
+    """Widget interactions and repeated runs reuse the stored analysis"""
+    print("\n🖥️ Testing cached Streamlit pipeline...")
+    with tempfile.TemporaryDirectory() as work_dir:
+        # The app's data layout, with the test dataset as the default dataset
+        for folder in ('processed', 'uploads'):
+            os.makedirs(os.path.join(work_dir, 'data', folder))
+        make_dataset().to_csv(os.path.join(work_dir, 'data', 'online_retail.csv'), index=False)
+
+        result = subprocess.run([sys.executable, '-c', APP_SCRIPT, PROJECT_ROOT, work_dir],
+                                cwd=tempfile.gettempdir(), capture_output=True, text=True)
+        if 'No module named' in result.stderr and 'streamlit' in result.stderr:
+            print("⚠️ streamlit not installed - skipping")
+            return
+        assert result.returncode == 0, result.stderr
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        # Saved results land in the temporary data/processed
+        assert os.path.exists(os.path.join(work_dir, 'data', 'processed', 'rfm_clustered.csv'))
+
+    assert report['exceptions'] == []
+    assert any('Run Analysis' in message for message in report['before_run'])
+    # Each step runs once; neither the rerun nor the second run misses the cache
+    assert report['run_calls'] == {'load': 1, 'rfm': 1, 'clustering': 1}
+    assert report['rerun_calls'] == report['run_calls']
+    assert report['cached_run_calls'] == report['run_calls']
+    assert report['metrics'] and report['rerun_metrics'] == report['metrics']
+    assert report['cached_run_metrics'] == report['metrics']
+    print("✅ Cached Streamlit pipeline - Working")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Janah Streamlit app")
+    print("=" * 60)
+    test_streamlit_reruns_use_cached_results()
+    print("\n🎉 Streamlit app tests complete!")
@@ -0,0 +1,122 @@
+"""
+Integer-coded customer IDs
+
+The Online Retail export stores CustomerID as a float (17850.0), CSV reads
+give floats or ints, and uploads may carry the IDs as text (" 17850").
+``CustomerIdEncoder`` normalizes all of these to one canonical string per
+customer ("17850") and factorizes them into dense int32 codes, keeping the
+canonical IDs as a lookup table. The cleaning plan stores CustomerID as a
+categorical built from those codes, so the RFM groupby aggregates integers
+instead of hashing a Python string per row.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_customer_ids(values):
+    """
+    Canonical string form of customer IDs
+
+    Integral numbers lose their ".0" ("17850.0", 17850.0 and 17850 all
+    become "17850"); other values are stripped of surrounding spaces.
+
+    Args:
+        values (pd.Series): Customer IDs of any dtype
+
+    Returns:
+        pd.Series: Object series of canonical IDs (missing values stay missing)
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        numbers = values.to_numpy(dtype=float, na_value=np.nan)
+        return _number_strings(numbers, values.index)
+
+    text = values.astype('string').str.strip()
+    numbers = pd.to_numeric(text, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    numeric = _number_strings(numbers, values.index)
+    return numeric.where(~np.isnan(numbers), text.astype(object))
+
+
+def _number_strings(numbers, index):
+    integral = np.isfinite(numbers) & (numbers == np.round(numbers))
+    strings = pd.Series(numbers, index=index).astype(str).astype(object)
+    strings[integral] = numbers[integral].astype(np.int64).astype(str)
+    strings[np.isnan(numbers)] = None
+    return strings
+
+
+class CustomerIdEncoder:
+    """
+    Factorize customer IDs into dense int32 codes
+
+    Codes follow the sorted order of the IDs (numeric order when every ID
+    is a number), so an aggregation grouped by code comes out in customer
+    order.
+
+    Attributes:
+        categories_ (pd.Index): Canonical ID of each code
+    """
+
+    def __init__(self):
+        self.categories_ = None
+
+    def fit_transform(self, values):
+        """
+        Learn the IDs of ``values`` and return their codes
+
+        Args:
+            values (pd.Series): Customer IDs (float, int, string or categorical)
+
+        Returns:
+            np.ndarray: int32 codes, -1 for missing IDs
+        """
+        values = pd.Series(values)
+        if isinstance(values.dtype, pd.CategoricalDtype) and self._canonical(values.cat.categories):
+            # Already encoded by the cleaning plan: reuse its codes
+            self.categories_ = values.cat.categories
+            return values.cat.codes.to_numpy().astype(np.int32)
+
+        if pd.api.types.is_integer_dtype(values.dtype) or (
+                pd.api.types.is_float_dtype(values.dtype) and self._integral(values)):
+            # Numeric IDs factorize on their integer value; only the uniques become strings
+            numbers = values.to_numpy(dtype=float, na_value=np.nan)
+            present = ~np.isnan(numbers)
+            codes = np.full(len(numbers), -1, dtype=np.int32)
+            present_codes, uniques = pd.factorize(numbers[present].astype(np.int64), sort=True)
+            codes[present] = present_codes
+            self.categories_ = pd.Index(uniques.astype(str), dtype=object)
+            return codes
+
+        codes, uniques = pd.factorize(normalize_customer_ids(values), sort=True)
+        self.categories_ = pd.Index(uniques, dtype=object)
+        return codes.astype(np.int32)
+
+    def transform(self, values):
+        """Codes of ``values`` under the learned IDs (-1 for unknown or missing IDs)"""
+        if self.categories_ is None:
+            raise ValueError("CustomerIdEncoder must be fitted before use")
+        codes = self.categories_.get_indexer(normalize_customer_ids(values))
+        return codes.astype(np.int32)
+
+    def inverse_transform(self, codes):
+        """Canonical customer IDs of ``codes``"""
+        if self.categories_ is None:
+            raise ValueError("CustomerIdEncoder must be fitted before use")
+        return self.categories_.take(np.asarray(codes))
+
+    def to_categorical(self, values):
+        """Encode ``values`` as a categorical of the canonical IDs (codes plus lookup table)"""
+        codes = self.fit_transform(values)
+        return pd.Series(pd.Categorical.from_codes(codes, self.categories_), index=pd.Series(values).index)
+
+    @staticmethod
+    def _integral(values):
+        numbers = values.to_numpy(dtype=float, na_value=np.nan)
+        numbers = numbers[~np.isnan(numbers)]
+        return bool(np.all(numbers == np.round(numbers))) and (numbers.size == 0 or np.abs(numbers).max() < 2 ** 62)
+
+    @staticmethod
+    def _canonical(categories):
+        # Categories of an earlier encoding are already in canonical form
+        return categories.dtype == object and normalize_customer_ids(categories.to_series()).tolist() == list(categories)
@@ -0,0 +1,110 @@
+"""
+Hash-based duplicate removal for transaction rows
+
+Rather than comparing every column (including long Description strings),
+``HashDeduplicator`` hashes the columns that identify a transaction line
+into one 64-bit key per row and deduplicates on that key. For chunked
+ingestion it keeps a sorted array of keys already seen, so duplicates are
+removed across chunk boundaries as well.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Columns that identify a transaction line in the Online Retail schema
+DEDUP_KEY_COLUMNS = ['InvoiceNo', 'StockCode', 'InvoiceDate', 'Quantity', 'UnitPrice', 'CustomerID']
+
+# Read dtypes that keep key hashes stable across CSV chunks (an InvoiceNo
+# chunk without cancellations would otherwise be inferred as int)
+DEDUP_READ_DTYPES = {'InvoiceNo': str, 'StockCode': str, 'InvoiceDate': str}
+
+
+class HashDeduplicator:
+    """
+    Drop duplicate rows by a 64-bit hash of the identifying columns
+
+    Numeric key columns are hashed as float64 so that a column read as int
+    in one chunk and float in another still produces the same keys; other
+    key columns should be read with a consistent dtype across chunks
+    (see ``DEDUP_READ_DTYPES``).
+    With 64-bit keys the chance of two distinct rows colliding is roughly
+    n^2 / 2^65 (about 3e-8 for a million rows).
+
+    Args:
+        columns (list): Key columns; defaults to DEDUP_KEY_COLUMNS
+    """
+
+    def __init__(self, columns=None):
+        self.columns = list(columns or DEDUP_KEY_COLUMNS)
+        self.removed_count_ = 0
+        self._seen = np.empty(0, dtype=np.uint64)
+
+    def key_columns(self, df):
+        """
+        Key columns to hash for ``df``
+
+        A partial key (e.g. an upload without StockCode) would merge distinct
+        transaction lines, so unless every key column is present the rows are
+        compared on all of their columns, as ``drop_duplicates()`` does.
+        """
+        if all(column in df.columns for column in self.columns):
+            return list(self.columns)
+        return list(df.columns)
+
+    def row_keys(self, df):
+        """Return one uint64 hash per row of the identifying columns"""
+        keys = df[self.key_columns(df)]
+        numeric = keys.select_dtypes(include='number').columns
+        if len(numeric):
+            keys = keys.astype({column: 'float64' for column in numeric})
+        # Key columns are mostly high-cardinality, where factorizing before
+        # hashing (categorize=True) costs more than it saves
+        return pd.util.hash_pandas_object(keys, index=False, categorize=False).to_numpy()
+
+    def first_mask(self, df):
+        """Boolean mask that is True for the first occurrence of each key in ``df``"""
+        keys = self.row_keys(df)
+        first = ~pd.Series(keys).duplicated().to_numpy()
+        self.removed_count_ = int(len(df) - first.sum())
+        return first
+
+    def drop_duplicates(self, df):
+        """Drop rows whose key already appeared earlier in ``df``"""
+        return df[self.first_mask(df)]
+
+    def drop_seen(self, chunk):
+        """
+        Drop rows duplicated within ``chunk`` or in any previous chunk
+
+        Args:
+            chunk (pd.DataFrame): Next chunk of transactions
+
+        Returns:
+            pd.DataFrame: Rows of ``chunk`` not seen before
+        """
+        return chunk[self.unseen_mask(chunk)]
+
+    def unseen_mask(self, chunk):
+        """Boolean mask of the rows of ``chunk`` not seen in it or in any previous chunk"""
+        keys = self.row_keys(chunk)
+        keep = ~pd.Series(keys).duplicated().to_numpy()
+        if self._seen.size:
+            # Binary search into the sorted seen-set
+            positions = np.minimum(np.searchsorted(self._seen, keys), self._seen.size - 1)
+            keep &= self._seen[positions] != keys
+
+        # Appending a sorted run keeps the merge close to linear
+        self._seen = np.concatenate([self._seen, np.sort(keys[keep])])
+        self._seen.sort(kind='stable')
+        self.removed_count_ += int(len(chunk) - keep.sum())
+        return keep
+
+    @property
+    def seen_count(self):
+        """Number of distinct keys seen so far in chunked mode"""
+        return int(self._seen.size)
+
+    def reset(self):
+        """Forget all keys seen in chunked mode"""
+        self._seen = np.empty(0, dtype=np.uint64)
+        self.removed_count_ = 0
@@ -0,0 +1,273 @@
+"""
+Transaction file loading
+
+``read_transactions`` and ``iter_transactions`` load CSV, Excel and Parquet
+transaction files through one interface. Excel workbooks are converted once
+into a Parquet transaction cache next to the workbook (see
+``utils/data_processing/excel.py``) and every later load reads the cache.
+
+Besides file paths, the loaders accept in-memory buffers (bytes or a
+memoryview, such as a Streamlit upload's ``getbuffer()``) and binary file
+objects. Buffers are parsed in place through ``MemoryviewReader`` and
+Parquet buffers are mapped by pyarrow without a copy, so uploads never
+have to be written to disk. Their format comes from ``file_name``.
+
+``columns`` projects the read down to the columns an analysis needs (see
+``required_columns``): CSV parsing skips the other fields, Parquet reads
+only the selected column chunks and workbook rows are trimmed before any
+typing. The long Description strings are never materialized for RFM.
+A file that lacks any of the requested columns (e.g. the StockCode of the
+duplicate-row key) is read in full, so duplicates are still compared on
+every column of such a file.
+"""
+
+import io
+import os
+
+import pandas as pd
+
+from .dedup import DEDUP_KEY_COLUMNS, DEDUP_READ_DTYPES
+from .excel import excel_to_parquet, iter_excel_batches, type_transaction_batch
+from utils.monitoring.metrics import record_cache
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+# Transaction columns each analysis reads
+ANALYSIS_COLUMNS = {
+    'rfm': ['CustomerID', 'InvoiceNo', 'InvoiceDate', 'Quantity', 'UnitPrice']
+}
+
+
+def required_columns(analysis='rfm', dedup_columns=DEDUP_KEY_COLUMNS):
+    """
+    Columns to read for an analysis
+
+    Args:
+        analysis (str): Key of ANALYSIS_COLUMNS (None: every column)
+        dedup_columns (list): Key columns of the duplicate-row check, which
+            must be read as well (e.g. StockCode)
+
+    Returns:
+        list: Column names, or None to read every column
+    """
+    if analysis is None:
+        return None
+    if analysis not in ANALYSIS_COLUMNS:
+        raise ValueError(f"Unknown analysis '{analysis}', expected one of {sorted(ANALYSIS_COLUMNS)}")
+    columns = list(ANALYSIS_COLUMNS[analysis])
+    return columns + [column for column in dedup_columns or [] if column not in columns]
+
+
+class MemoryviewReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a buffer
+
+    Reads copy only the requested slice into the caller's buffer, so
+    parsers can stream through an upload without duplicating it.
+
+    Args:
+        buffer (bytes-like): Contiguous buffer, e.g. a memoryview
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        chunk = self._view[self._position:self._position + len(target)]
+        memoryview(target).cast('B')[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(offset, 0)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+def is_file_path(source):
+    """True if ``source`` names a file rather than holding its contents"""
+    return isinstance(source, (str, os.PathLike))
+
+
+def is_buffer(source):
+    """True if ``source`` is an in-memory buffer"""
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def source_name(source, file_name=None):
+    """Name of a transaction source: ``file_name``, the path or the file object's name"""
+    if file_name:
+        return str(file_name)
+    if is_file_path(source):
+        return str(source)
+    return getattr(source, 'name', None) or '<in-memory buffer>'
+
+
+def open_source(source):
+    """Binary file object for an in-memory buffer; paths and file objects are returned as they are"""
+    if is_buffer(source):
+        return io.BufferedReader(MemoryviewReader(source))
+    return source
+
+
+def file_extension(file_path):
+    """Lower-case extension of ``file_path``, including the dot"""
+    return os.path.splitext(str(file_path))[1].lower()
+
+
+def transaction_cache_path(file_path):
+    """Path of the Parquet transaction cache for a source file"""
+    return os.path.splitext(str(file_path))[0] + '.parquet'
+
+
+def transaction_cache_fresh(file_path):
+    """True if the Parquet cache of an Excel workbook is at least as new as the workbook"""
+    cache_path = transaction_cache_path(file_path)
+    return os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(file_path)
+
+
+def prepare_transactions(file_path, batch_size=50000):
+    """
+    Make sure a file can be read by the loaders
+
+    Excel workbooks are converted to their Parquet cache unless a cache at
+    least as new as the workbook already exists. Buffers and file objects
+    are returned unchanged; in-memory workbooks are read without a cache.
+
+    Args:
+        file_path (str): CSV, Excel or Parquet file
+        batch_size (int): Rows per batch for an Excel conversion
+
+    Returns:
+        tuple: (path to read, conversion stats or None when nothing was converted)
+    """
+    if not is_file_path(file_path) or file_extension(file_path) not in EXCEL_EXTENSIONS:
+        return file_path, None
+
+    cache_path = transaction_cache_path(file_path)
+    hit = transaction_cache_fresh(file_path)
+    record_cache('transactions', hit)
+    if hit:
+        return cache_path, None
+    return cache_path, excel_to_parquet(file_path, cache_path, batch_size)
+
+
+def _parquet_file(source):
+    import pyarrow.parquet as pq
+
+    # pyarrow maps an in-memory buffer directly instead of reading a copy
+    if is_buffer(source):
+        import pyarrow as pa
+
+        source = pa.BufferReader(pa.py_buffer(source))
+    return pq.ParquetFile(source)
+
+
+def _projection(names, columns):
+    """Columns of ``names`` to read, or None (every column) unless all of ``columns`` are present"""
+    if columns is None or not all(column in names for column in columns):
+        return None
+    return [name for name in names if name in columns]
+
+
+def _parquet_columns(parquet_file, columns):
+    return _projection(parquet_file.schema_arrow.names, columns)
+
+
+def _usecols(source, columns, read_header):
+    if columns is None:
+        return None
+    handle = open_source(source)
+    position = handle.tell() if hasattr(handle, 'tell') else None
+    names = list(read_header(handle).columns)
+    if position is not None:
+        # File objects are rewound for the actual read
+        handle.seek(position)
+    return _projection(names, columns)
+
+
+def _csv_header(handle):
+    return pd.read_csv(handle, encoding='latin-1', nrows=0)
+
+
+def _xls_header(handle):
+    return pd.read_excel(handle, nrows=0)
+
+
+def _iter_workbook(source, batch_size, columns=None):
+    # In-memory workbooks get the same column types as the Parquet cache
+    for batch in iter_excel_batches(open_source(source), batch_size, columns=columns):
+        yield type_transaction_batch(batch)
+
+
+def read_transactions(source, file_name=None, columns=None):
+    """
+    Load a whole transaction file into a DataFrame
+
+    Args:
+        source (str or buffer): Path to a CSV, Excel (.xlsx/.xlsm/.xls) or
+            Parquet file, its contents as bytes/memoryview, or a binary file object
+        file_name (str): Name giving the format of a buffer or file object
+        columns (list): Read only these columns (None: all columns)
+
+    Returns:
+        pd.DataFrame: Transactions
+    """
+    source, _ = prepare_transactions(source)
+    extension = file_extension(source_name(source, file_name))
+    if extension in PARQUET_EXTENSIONS:
+        parquet_file = _parquet_file(source)
+        return parquet_file.read(columns=_parquet_columns(parquet_file, columns)).to_pandas()
+    if extension in EXCEL_EXTENSIONS:
+        return pd.concat(_iter_workbook(source, 50000, columns), ignore_index=True)
+    if extension == '.xls':
+        # Legacy binary workbooks cannot be streamed by openpyxl
+        return pd.read_excel(open_source(source), dtype=DEDUP_READ_DTYPES,
+                             usecols=_usecols(source, columns, _xls_header))
+    return pd.read_csv(open_source(source), encoding='latin-1', dtype=DEDUP_READ_DTYPES,
+                       usecols=_usecols(source, columns, _csv_header))
+
+
+def iter_transactions(source, chunksize, file_name=None, columns=None):
+    """
+    Load a transaction file in chunks
+
+    Args:
+        source (str or buffer): CSV, Excel or Parquet file, its contents or a binary file object
+        chunksize (int): Rows per chunk
+        file_name (str): Name giving the format of a buffer or file object
+        columns (list): Read only these columns (None: all columns)
+
+    Yields:
+        pd.DataFrame: Consecutive chunks of transactions
+    """
+    source, _ = prepare_transactions(source)
+    extension = file_extension(source_name(source, file_name))
+    if extension in PARQUET_EXTENSIONS:
+        parquet_file = _parquet_file(source)
+        for batch in parquet_file.iter_batches(batch_size=chunksize,
+                                               columns=_parquet_columns(parquet_file, columns)):
+            yield batch.to_pandas()
+    elif extension in EXCEL_EXTENSIONS:
+        yield from _iter_workbook(source, chunksize, columns)
+    elif extension == '.xls':
+        data = read_transactions(source, file_name, columns)
+        for start in range(0, len(data), chunksize):
+            yield data.iloc[start:start + chunksize]
+    else:
+        yield from pd.read_csv(open_source(source), encoding='latin-1', chunksize=chunksize,
+                               dtype=DEDUP_READ_DTYPES, usecols=_usecols(source, columns, _csv_header))
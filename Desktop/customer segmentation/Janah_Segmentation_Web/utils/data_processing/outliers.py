@@ -0,0 +1,216 @@
+"""
+Outlier filtering for transaction columns
+
+``OutlierFilter`` computes the bounds for several columns together and
+applies them as a single combined mask, so the frame is copied once no
+matter how many columns are filtered. Bounds can come from an exact pass
+over an in-memory frame (``fit``) or from streaming quantile sketches
+updated chunk by chunk (``partial_fit``).
+"""
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch (KLL)
+
+    Keeps a hierarchy of compactors; when a level overflows it is sorted and
+    every other item is promoted to the next level with double weight. Memory
+    stays within a small multiple of ``k`` items regardless of how many values
+    are added, and rank error shrinks roughly in proportion to ``1 / k``.
+    """
+
+    def __init__(self, k=1000, seed=42):
+        self.k = k
+        self.count = 0
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Add a batch of values to the sketch"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.count += values.size
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if items.size > self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so no weight is lost
+                keep = items[:1] if items.size % 2 else items[:0]
+                pairs = items[keep.size:]
+                promoted = pairs[self._rng.integers(2)::2]
+                self._levels[level] = keep
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+            level += 1
+
+    def weighted_items(self):
+        """Return (sorted items, weights) currently held by the sketch"""
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(level.size, 2.0 ** h) for h, level in enumerate(self._levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def quantiles(self, qs):
+        """Estimate several quantiles at once"""
+        items, weights = self.weighted_items()
+        return _weighted_quantiles(items, weights, qs)
+
+
+def _weighted_quantiles(sorted_items, weights, qs):
+    if sorted_items.size == 0:
+        return np.full(len(qs), np.nan)
+    cumulative = np.cumsum(weights)
+    targets = np.asarray(qs) * cumulative[-1]
+    positions = np.searchsorted(cumulative, targets, side='left')
+    return sorted_items[np.minimum(positions, sorted_items.size - 1)]
+
+
+class OutlierFilter:
+    """
+    Filter (or cap) outliers in several numeric columns at once
+
+    Strategies:
+        'iqr'        - keep values within [Q1 - m*IQR, Q3 + m*IQR]
+        'mad'        - keep values whose modified z-score is within the threshold
+        'percentile' - keep values between the given lower/upper percentiles
+
+    Args:
+        columns (list): Columns to filter
+        strategy (str): One of STRATEGIES
+        iqr_multiplier (float): IQR fence multiplier
+        mad_threshold (float): Modified z-score cut-off for 'mad'
+        percentiles (tuple): (lower, upper) quantiles for 'percentile'
+        cap (bool): Clip values to the bounds instead of dropping rows
+        sketch_size (int): Accuracy parameter of the streaming sketches
+    """
+
+    STRATEGIES = ('iqr', 'mad', 'percentile')
+
+    def __init__(self, columns, strategy='iqr', iqr_multiplier=1.5, mad_threshold=3.5,
+                 percentiles=(0.01, 0.99), cap=False, sketch_size=1000):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown outlier strategy: {strategy}")
+        self.columns = list(columns)
+        self.strategy = strategy
+        self.iqr_multiplier = iqr_multiplier
+        self.mad_threshold = mad_threshold
+        self.percentiles = percentiles
+        self.cap = cap
+        self.sketch_size = sketch_size
+        self.bounds_ = None
+        self.removed_counts_ = {}
+        self._sketches = None
+
+    def _quantile_levels(self):
+        if self.strategy == 'iqr':
+            return [0.25, 0.75]
+        if self.strategy == 'percentile':
+            return list(self.percentiles)
+        return [0.5]
+
+    def _bounds_from_quantiles(self, quantiles, deviations=None):
+        if self.strategy == 'iqr':
+            q1, q3 = quantiles
+            iqr = q3 - q1
+            return q1 - self.iqr_multiplier * iqr, q3 + self.iqr_multiplier * iqr
+        if self.strategy == 'percentile':
+            return tuple(quantiles)
+        median = quantiles[0]
+        mad = deviations
+        if not np.isfinite(mad) or mad == 0:
+            # Constant column: a zero MAD would reject everything but the median
+            # (an all-NaN column or empty sketch gives no MAD at all)
+            return -np.inf, np.inf
+        spread = self.mad_threshold * mad / 0.6745
+        return median - spread, median + spread
+
+    def fit(self, df):
+        """Compute exact bounds for all columns in one vectorized pass"""
+        values = df[self.columns].to_numpy(dtype=float)
+        levels = self._quantile_levels()
+        quantile_fn = np.nanquantile if np.isnan(values).any() else np.quantile
+        # One call computes every requested quantile for every column
+        quantiles = np.atleast_2d(quantile_fn(values, levels, axis=0))
+
+        deviations = None
+        if self.strategy == 'mad':
+            deviations = quantile_fn(np.abs(values - quantiles[0]), 0.5, axis=0)
+
+        self.bounds_ = {
+            column: self._bounds_from_quantiles(quantiles[:, i], None if deviations is None else deviations[i])
+            for i, column in enumerate(self.columns)
+        }
+        self._sketches = None
+        return self
+
+    def partial_fit(self, df):
+        """Update the streaming sketches with one chunk of data"""
+        if self._sketches is None:
+            self._sketches = {column: QuantileSketch(self.sketch_size) for column in self.columns}
+        for column in self.columns:
+            self._sketches[column].update(df[column].to_numpy(dtype=float))
+        self.bounds_ = None
+        return self
+
+    def _finalize_sketches(self):
+        levels = self._quantile_levels()
+        bounds = {}
+        for column, sketch in self._sketches.items():
+            quantiles = sketch.quantiles(levels)
+            deviations = None
+            if self.strategy == 'mad':
+                items, weights = sketch.weighted_items()
+                deviation_items = np.abs(items - quantiles[0])
+                order = np.argsort(deviation_items, kind='stable')
+                deviations = _weighted_quantiles(deviation_items[order], weights[order], [0.5])[0]
+            bounds[column] = self._bounds_from_quantiles(quantiles, deviations)
+        self.bounds_ = bounds
+
+    def mask(self, df):
+        """Return one boolean mask that is True for rows within all bounds"""
+        if self.bounds_ is None:
+            if self._sketches is None:
+                raise ValueError("OutlierFilter must be fitted before use")
+            self._finalize_sketches()
+
+        combined = np.ones(len(df), dtype=bool)
+        self.removed_counts_ = {}
+        for column, (lower, upper) in self.bounds_.items():
+            if lower == -np.inf and upper == np.inf:
+                # Unbounded column (no spread to fit): keep every row, NaN included
+                self.removed_counts_[column] = 0
+                continue
+            values = df[column].to_numpy(dtype=float)
+            within = (values >= lower) & (values <= upper)
+            self.removed_counts_[column] = int((~within & combined).sum())
+            combined &= within
+        return combined
+
+    def transform(self, df):
+        """Drop (or cap) outliers using the fitted bounds"""
+        if self.cap:
+            if self.bounds_ is None:
+                self.mask(df)
+            capped = df.copy()
+            for column, (lower, upper) in self.bounds_.items():
+                capped[column] = capped[column].clip(lower, upper)
+            return capped
+        return df[self.mask(df)]
+
+    def fit_transform(self, df):
+        """Fit exact bounds on ``df`` and filter it"""
+        return self.fit(df).transform(df)
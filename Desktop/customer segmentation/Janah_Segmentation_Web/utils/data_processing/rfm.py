@@ -0,0 +1,410 @@
+"""
+RFM aggregation
+
+``aggregate_customers`` computes the per-customer state of an in-memory
+frame (last purchase, distinct invoices, spend) on int32 customer codes and
+``finish_rfm`` turns it into Recency/Frequency/Monetary.
+
+``sharded_rfm`` is the multi-core variant. It reuses the integer customer
+codes of the cleaning plan's categorical, sorts the rows by customer once
+and copies the numeric columns in that order into a shared memory block.
+A shard is then a contiguous range of rows (whole customers, about equal
+row counts); worker processes attach to the block by name, slice their
+range without copying it, compute the amounts and aggregate. Only the
+small per-customer results are pickled back, already in customer order.
+
+``PartitionedRFM`` is the out-of-core variant for histories larger than
+RAM. One pass over the transaction chunks hash-partitions the rows by
+customer into Arrow IPC spill files. Every customer's rows then sit in a
+single partition, so partitions are aggregated independently (optionally
+in worker processes) and their results simply concatenated. Memory is
+bounded by the largest partition, not by the number of customers.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .customers import CustomerIdEncoder, normalize_customer_ids
+
+RFM_COLUMNS = ['CustomerID', 'Recency', 'Frequency', 'Monetary']
+
+# Pools are started without forking the (possibly multithreaded) caller
+POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+def aggregate_customers(data):
+    """
+    Per-customer last purchase, distinct invoices and spend
+
+    Args:
+        data (pd.DataFrame): Cleaned transactions with CustomerID, InvoiceNo,
+            InvoiceDate and either Amount or Quantity and UnitPrice
+
+    Returns:
+        pd.DataFrame: CustomerID, LastPurchase, Frequency, Monetary in customer order
+    """
+    encoder = CustomerIdEncoder()
+    customer_codes = encoder.fit_transform(data['CustomerID'])
+    invoice_codes = pd.factorize(data['InvoiceNo'])[0]
+    if 'Amount' in data.columns:
+        amounts = data['Amount'].to_numpy(dtype=float)
+    else:
+        amounts = data['Quantity'].to_numpy(dtype=float) * data['UnitPrice'].to_numpy(dtype=float)
+    customers = pd.DataFrame({
+        'InvoiceDate': data['InvoiceDate'].to_numpy(),
+        'InvoiceNo': invoice_codes,
+        'Amount': amounts
+    }).groupby(customer_codes, sort=True).agg(
+        LastPurchase=('InvoiceDate', 'max'),
+        Frequency=('InvoiceNo', 'nunique'),
+        Monetary=('Amount', 'sum')
+    )
+    customers = customers[customers.index >= 0]
+    return pd.DataFrame({
+        'CustomerID': encoder.inverse_transform(customers.index),
+        'LastPurchase': customers['LastPurchase'].to_numpy(),
+        'Frequency': customers['Frequency'].to_numpy(),
+        'Monetary': customers['Monetary'].to_numpy()
+    })
+
+
+def finish_rfm(customers, latest_date):
+    """
+    RFM metrics from the per-customer state
+
+    Args:
+        customers (pd.DataFrame): Output of ``aggregate_customers``
+        latest_date (pd.Timestamp): Reference date for Recency
+
+    Returns:
+        pd.DataFrame: CustomerID, Recency, Frequency, Monetary
+    """
+    return pd.DataFrame({
+        'CustomerID': customers['CustomerID'].to_numpy(),
+        'Recency': (latest_date - customers['LastPurchase']).dt.days.to_numpy(),
+        'Frequency': customers['Frequency'].to_numpy(),
+        'Monetary': customers['Monetary'].to_numpy()
+    })
+
+
+def _share_arrays(arrays, order=None):
+    """
+    Copy ``arrays`` into one shared memory block
+
+    Args:
+        arrays (list): 1-D arrays of equal length
+        order (np.ndarray): Row permutation applied while copying
+
+    Returns:
+        tuple: The block and the (offset, shape, dtype) layout of each array
+    """
+    n_rows = len(arrays[0]) if order is None else len(order)
+    block = shared_memory.SharedMemory(create=True, size=max(sum(n_rows * array.itemsize for array in arrays), 1))
+    layout = []
+    offset = 0
+    for array in arrays:
+        view = np.ndarray((n_rows,), array.dtype, buffer=block.buf, offset=offset)
+        if order is None:
+            view[...] = array
+        else:
+            np.take(array, order, out=view)
+        del view
+        layout.append((offset, (n_rows,), array.dtype.str))
+        offset += n_rows * array.itemsize
+    return block, layout
+
+
+def _aggregate_sorted(customers, invoices, dates, amounts):
+    """Per-customer last date, distinct invoices and spend of rows sorted by customer code"""
+    starts = np.flatnonzero(np.r_[True, customers[1:] != customers[:-1]]) if len(customers) else np.arange(0)
+    run = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(customers)]))
+    # Distinct (customer, invoice) pairs give the invoice count per customer
+    n_invoices = np.int64(invoices.max()) + 1 if len(invoices) else 1
+    pairs = np.unique(run * n_invoices + invoices)
+    return (customers[starts], np.maximum.reduceat(dates, starts) if len(starts) else dates[:0],
+            np.bincount(pairs // n_invoices, minlength=len(starts)),
+            np.add.reduceat(amounts, starts) if len(starts) else amounts[:0])
+
+
+def aggregate_shard(block_name, layout, start, stop):
+    """
+    Aggregate one shard: rows ``start:stop`` of the customer-sorted columns in shared memory
+
+    The columns are customer codes, invoice codes, int64 dates and either
+    the amount or Quantity and UnitPrice, which are multiplied here.
+    """
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        # Contiguous slices are views of the block; nothing is copied to find the shard
+        columns = [np.ndarray(shape, dtype, buffer=block.buf, offset=offset)[start:stop]
+                   for offset, shape, dtype in layout]
+        customers, invoices, dates = columns[:3]
+        amounts = columns[3] if len(columns) == 4 else columns[3] * columns[4]
+        result = tuple(np.array(part) for part in _aggregate_sorted(customers, invoices, dates, amounts))
+        del columns, customers, invoices, dates, amounts
+        return result
+    finally:
+        block.close()
+
+
+def _shard_bounds(sorted_customers, n_shards):
+    """Row offsets splitting customer-sorted rows into about equal shards on customer boundaries"""
+    n_rows = len(sorted_customers)
+    if not n_rows:
+        return np.array([0, 0])
+    targets = np.linspace(0, n_rows, n_shards + 1).astype(np.int64)[1:-1]
+    cuts = np.searchsorted(sorted_customers, sorted_customers[targets])
+    return np.unique(np.r_[0, cuts, n_rows])
+
+
+def sharded_rfm(data, n_jobs=None, n_shards=None):
+    """
+    RFM metrics computed by a process pool over customer shards
+
+    Args:
+        data (pd.DataFrame): Cleaned transactions (CustomerID, InvoiceNo,
+            InvoiceDate and Quantity/UnitPrice or Amount)
+        n_jobs (int): Worker processes (None: all cores)
+        n_shards (int): Customer shards (default: one per worker)
+
+    Returns:
+        pd.DataFrame: CustomerID, Recency, Frequency, Monetary in customer order
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    n_shards = n_shards or n_jobs
+    # The cleaning plan's categoricals already carry the codes; only other inputs are encoded here
+    encoder = CustomerIdEncoder()
+    customers = encoder.fit_transform(data['CustomerID'])
+    invoices = data['InvoiceNo']
+    if isinstance(invoices.dtype, pd.CategoricalDtype):
+        invoices = invoices.cat.codes.to_numpy().astype(np.int32)
+    else:
+        invoices = pd.factorize(invoices)[0].astype(np.int32)
+    columns = [customers, invoices, data['InvoiceDate'].to_numpy(dtype='datetime64[ns]').view(np.int64)]
+    if 'Amount' in data.columns:
+        columns.append(data['Amount'].to_numpy(dtype=float))
+    else:
+        columns += [data['Quantity'].to_numpy(dtype=float), data['UnitPrice'].to_numpy(dtype=float)]
+
+    # One sort groups every shard's rows into a contiguous range, in customer order
+    order = np.argsort(customers, kind='stable')
+    order = order[np.searchsorted(customers[order], 0):]
+    block, layout = _share_arrays(columns, order)
+    try:
+        sorted_customers = np.ndarray(layout[0][1], layout[0][2], buffer=block.buf)
+        bounds = _shard_bounds(sorted_customers, n_shards)
+        del sorted_customers
+        if len(bounds) > 2 and n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(bounds) - 1), mp_context=POOL_CONTEXT) as pool:
+                shards = list(pool.map(aggregate_shard, [block.name] * (len(bounds) - 1),
+                                       [layout] * (len(bounds) - 1), bounds[:-1], bounds[1:]))
+        else:
+            shards = [aggregate_shard(block.name, layout, start, stop)
+                      for start, stop in zip(bounds[:-1], bounds[1:])]
+    finally:
+        block.close()
+        block.unlink()
+
+    # Shards hold ascending code ranges, so their results concatenate in customer order
+    codes, last_purchase, frequency, monetary = (np.concatenate(parts) for parts in zip(*shards))
+    customers = pd.DataFrame({
+        'CustomerID': encoder.inverse_transform(codes),
+        'LastPurchase': last_purchase.view('datetime64[ns]'),
+        'Frequency': frequency,
+        'Monetary': monetary
+    })
+    return finish_rfm(customers, data['InvoiceDate'].max())
+
+
+def customer_partitions(values, n_partitions):
+    """
+    Partition of each row's customer
+
+    A customer lands in the same partition whatever the dtype of its ID:
+    integral IDs hash their integer value, other IDs their canonical string.
+
+    Args:
+        values (pd.Series): Customer IDs (float, int, string or categorical)
+        n_partitions (int): Number of partitions
+
+    Returns:
+        np.ndarray: Partition number per row (-1 for missing IDs)
+    """
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Hash each category once and look the rows up by code
+        partitions = customer_partitions(pd.Series(values.cat.categories, dtype=object), n_partitions)
+        codes = values.cat.codes.to_numpy()
+        return np.where(codes >= 0, partitions[codes], -1)
+
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        numbers = values.to_numpy(dtype=float, na_value=np.nan)
+    else:
+        numbers = pd.to_numeric(values.astype('string').str.strip(), errors='coerce').to_numpy(
+            dtype=float, na_value=np.nan)
+    integral = np.isfinite(numbers) & (numbers == np.round(numbers))
+
+    keys = np.zeros(len(values), dtype=np.uint64)
+    keys[integral] = pd.util.hash_array(numbers[integral].astype(np.int64))
+    other = ~integral & values.notna().to_numpy()
+    if other.any():
+        keys[other] = pd.util.hash_array(normalize_customer_ids(values[other]).to_numpy(dtype=object))
+    partitions = (keys % np.uint64(n_partitions)).astype(np.int64)
+    partitions[~integral & ~other] = -1
+    return partitions
+
+
+def _spill_table(chunk):
+    """Arrow table of a chunk in the spill schema (canonical string IDs, Amount)"""
+    import pyarrow as pa
+
+    if 'Amount' in chunk.columns:
+        amounts = chunk['Amount'].to_numpy(dtype=float)
+    else:
+        amounts = chunk['Quantity'].to_numpy(dtype=float) * chunk['UnitPrice'].to_numpy(dtype=float)
+    # Only the distinct IDs are turned into strings; rows reference them by code
+    encoder = CustomerIdEncoder()
+    codes = encoder.fit_transform(chunk['CustomerID'])
+    customer_ids = pa.DictionaryArray.from_arrays(
+        pa.array(codes, mask=codes < 0), pa.array(encoder.categories_.to_numpy(dtype=object), type=pa.string()))
+    return pa.table({
+        'CustomerID': customer_ids.cast(pa.string()),
+        'InvoiceNo': pa.array(chunk['InvoiceNo'].astype(str).to_numpy(dtype=object), type=pa.string()),
+        'InvoiceDate': pa.array(pd.to_datetime(chunk['InvoiceDate']).to_numpy(dtype='datetime64[ns]'),
+                                type=pa.timestamp('ns')),
+        'Amount': pa.array(amounts, type=pa.float64())
+    })
+
+
+def aggregate_partition(path):
+    """Per-customer state of one spill file (run in a worker process when n_jobs > 1)"""
+    import pyarrow as pa
+
+    with pa.OSFile(path, 'rb') as source:
+        table = pa.ipc.open_stream(source).read_all()
+    # Dictionary-encode the string columns in Arrow so pandas gets
+    # categoricals (integer codes) instead of one Python string per row
+    for name in ('CustomerID', 'InvoiceNo'):
+        table = table.set_column(table.schema.get_field_index(name), name,
+                                 table.column(name).dictionary_encode())
+    return aggregate_customers(table.to_pandas()), table.num_rows
+
+
+def _customer_order(customer_ids):
+    # Match aggregate_customers: numeric order when every ID is a number
+    numbers = pd.to_numeric(pd.Series(customer_ids), errors='coerce')
+    if numbers.notna().all():
+        return np.argsort(numbers.to_numpy(), kind='stable')
+    return np.argsort(np.asarray(customer_ids, dtype=str), kind='stable')
+
+
+class PartitionedRFM:
+    """
+    Out-of-core RFM by hash-partitioned spill files
+
+    Args:
+        n_partitions (int): Spill files; peak memory is roughly the largest
+            partition, i.e. about 1 / n_partitions of the history
+        spill_dir (str): Directory for the spill files (default: a
+            temporary directory, removed afterwards)
+        n_jobs (int): Worker processes aggregating partitions (1: in process)
+
+    Attributes:
+        partition_rows_ (list): Transactions per partition
+        spilled_bytes_ (int): Bytes written to the spill files
+        seconds_ (dict): Wall time of the spill and aggregate passes
+    """
+
+    def __init__(self, n_partitions=16, spill_dir=None, n_jobs=1):
+        if n_partitions < 1:
+            raise ValueError("n_partitions must be at least 1")
+        self.n_partitions = n_partitions
+        self.spill_dir = spill_dir
+        self.n_jobs = n_jobs
+        self.partition_rows_ = None
+        self.spilled_bytes_ = 0
+        self.seconds_ = {}
+
+    def _spill(self, chunks, spill_dir):
+        """Write every chunk's rows to the spill file of their customer's partition"""
+        import pyarrow as pa
+
+        paths = [os.path.join(spill_dir, f'partition-{i:04d}.arrow') for i in range(self.n_partitions)]
+        writers = {}
+        latest_date = None
+        try:
+            for chunk in chunks:
+                if not len(chunk):
+                    continue
+                chunk_latest = pd.to_datetime(chunk['InvoiceDate']).max()
+                latest_date = chunk_latest if latest_date is None else max(latest_date, chunk_latest)
+                partitions = customer_partitions(chunk['CustomerID'], self.n_partitions)
+                # One stable sort groups the chunk's rows by partition
+                order = np.argsort(partitions, kind='stable')
+                bounds = np.searchsorted(partitions[order], np.arange(self.n_partitions + 1))
+                table = _spill_table(chunk)
+                for partition in range(self.n_partitions):
+                    rows = order[bounds[partition]:bounds[partition + 1]]
+                    if not len(rows):
+                        continue
+                    partition_table = table.take(pa.array(rows))
+                    if partition not in writers:
+                        sink = pa.OSFile(paths[partition], 'wb')
+                        writers[partition] = (sink, pa.ipc.new_stream(sink, partition_table.schema))
+                    writers[partition][1].write_table(partition_table)
+        finally:
+            for sink, writer in writers.values():
+                writer.close()
+                sink.close()
+        return [paths[partition] for partition in sorted(writers)], latest_date
+
+    def compute(self, chunks):
+        """
+        RFM metrics of a transaction history given as chunks
+
+        Args:
+            chunks (iterable): DataFrames of cleaned transactions (CustomerID,
+                InvoiceNo, InvoiceDate and Quantity/UnitPrice or Amount)
+
+        Returns:
+            pd.DataFrame: CustomerID, Recency, Frequency, Monetary in customer order
+        """
+        spill_dir = self.spill_dir or tempfile.mkdtemp(prefix='rfm-spill-')
+        os.makedirs(spill_dir, exist_ok=True)
+        try:
+            started = time.perf_counter()
+            paths, latest_date = self._spill(chunks, spill_dir)
+            self.spilled_bytes_ = sum(os.path.getsize(path) for path in paths)
+            self.seconds_['spill'] = round(time.perf_counter() - started, 3)
+
+            started = time.perf_counter()
+            if self.n_jobs > 1 and len(paths) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.n_jobs, len(paths)),
+                                         mp_context=POOL_CONTEXT) as pool:
+                    results = list(pool.map(aggregate_partition, paths))
+            else:
+                results = [aggregate_partition(path) for path in paths]
+            self.seconds_['aggregate'] = round(time.perf_counter() - started, 3)
+        finally:
+            if self.spill_dir:
+                for path in os.listdir(spill_dir):
+                    if path.startswith('partition-') and path.endswith('.arrow'):
+                        os.remove(os.path.join(spill_dir, path))
+            else:
+                shutil.rmtree(spill_dir, ignore_errors=True)
+
+        self.partition_rows_ = [rows for _, rows in results]
+        if not results:
+            return pd.DataFrame(columns=RFM_COLUMNS)
+        customers = pd.concat([customers for customers, _ in results], ignore_index=True)
+        customers = customers.iloc[_customer_order(customers['CustomerID'])].reset_index(drop=True)
+        return finish_rfm(customers, latest_date)
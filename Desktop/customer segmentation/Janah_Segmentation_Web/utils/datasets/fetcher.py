@@ -0,0 +1,205 @@
+"""
+Dataset downloads
+
+``DatasetFetcher`` streams a remote file to disk in chunks, resumes an
+interrupted download with an HTTP Range request, verifies a SHA-256
+checksum and only then moves the file into place. The server's validator
+(a strong ETag, else Last-Modified) is kept next to the partial file and
+sent as If-Range, so a file that changed on the server is downloaded again
+instead of being spliced onto stale bytes; a partial file without a
+validator is never resumed. Downloads run on a small
+worker pool, and concurrent requests for the same destination share a
+single download (single-flight), so callers get a Future back immediately
+and never block a web request on the network.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class ChecksumError(ValueError):
+    """Raised when a downloaded file does not match its expected checksum"""
+
+
+class DatasetFetcher:
+    """
+    Download datasets in the background with resume and checksum checks
+
+    Args:
+        chunk_size (int): Bytes written per chunk
+        timeout (int): Connect/read timeout in seconds for each request
+        retries (int): Resume attempts after a dropped connection
+        max_workers (int): Concurrent downloads
+    """
+
+    def __init__(self, chunk_size=1024 * 1024, timeout=30, retries=3, max_workers=2):
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dataset-fetch')
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._progress = {}
+
+    def fetch(self, url, destination, sha256=None, postprocess=None):
+        """
+        Start (or join) the download of ``url`` to ``destination``
+
+        Args:
+            url (str): File to download
+            destination (str): Final path of the file
+            sha256 (str): Expected hex digest; not verified when None
+            postprocess (callable): Called with the downloaded path inside the
+                same task (e.g. a format conversion); its return value becomes
+                the Future's result
+
+        Returns:
+            concurrent.futures.Future: Resolves to the downloaded (or
+            post-processed) path; callers for the same destination share it
+        """
+        key = os.path.abspath(destination)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._run, url, destination, sha256, postprocess)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _run(self, url, destination, sha256, postprocess):
+        path = self.download(url, destination, sha256)
+        return postprocess(path) if postprocess else path
+
+    def progress(self, destination):
+        """Return {'downloaded', 'total'} bytes for a download in progress, or None"""
+        return self._progress.get(os.path.abspath(destination))
+
+    def download(self, url, destination, sha256=None):
+        """
+        Download ``url`` to ``destination`` in the calling thread
+
+        Data is written to ``destination + '.part'``; if that file exists
+        from an earlier attempt along with the server's validator, only the
+        remaining bytes are requested (If-Range makes the server send the
+        whole file again if it changed).
+
+        Args:
+            url (str): File to download
+            destination (str): Final path of the file
+            sha256 (str): Expected hex digest; not verified when None
+
+        Returns:
+            str: ``destination``
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(destination)) or '.', exist_ok=True)
+        partial_path = destination + '.part'
+        key = os.path.abspath(destination)
+        if not sha256:
+            print(f"⚠️ No checksum configured for {url}; the download is not verified")
+
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    digest = self._stream(url, partial_path, key)
+                    break
+                except (requests.ConnectionError, requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError):
+                    if attempt == self.retries:
+                        raise
+                    print(f"⚠️ Download interrupted, resuming ({attempt + 1}/{self.retries})...")
+        finally:
+            self._progress.pop(key, None)
+
+        if sha256 and digest != sha256.lower():
+            self._discard(partial_path, partial_path + '.validator')
+            raise ChecksumError(f"Checksum mismatch for {url}: expected {sha256}, got {digest}")
+
+        os.replace(partial_path, destination)
+        self._discard(partial_path + '.validator')
+        return destination
+
+    def _stream(self, url, partial_path, key):
+        validator_path = partial_path + '.validator'
+        validator = self._read_validator(validator_path)
+        offset = os.path.getsize(partial_path) if validator and os.path.exists(partial_path) else 0
+        headers = {'Range': f'bytes={offset}-', 'If-Range': validator} if offset else {}
+
+        with requests.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # Only a partial file of the full length is complete; anything else starts over
+                if offset == self._complete_length(response):
+                    return self._file_digest(partial_path)
+                self._discard(partial_path, validator_path)
+                return self._stream(url, partial_path, key)
+            response.raise_for_status()
+
+            if response.status_code != 206:
+                # Server ignored the Range header or the file changed: start over
+                offset = 0
+                self._write_validator(validator_path, response.headers)
+            hasher = self._file_digest(partial_path, as_hasher=True) if offset else hashlib.sha256()
+            length = response.headers.get('Content-Length')
+            total = offset + int(length) if length else None
+            self._progress[key] = {'downloaded': offset, 'total': total}
+
+            with open(partial_path, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    self._progress[key]['downloaded'] += len(chunk)
+
+        downloaded = self._progress[key]['downloaded']
+        if total is not None and downloaded < total:
+            raise requests.exceptions.ChunkedEncodingError(f"Connection closed after {downloaded} of {total} bytes")
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _complete_length(response):
+        # A 416 reply carries "Content-Range: bytes */<length>"
+        content_range = response.headers.get('Content-Range', '')
+        length = content_range.rpartition('/')[2]
+        return int(length) if length.isdigit() else None
+
+    @staticmethod
+    def _read_validator(path):
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return f.read().strip() or None
+
+    @staticmethod
+    def _write_validator(path, headers):
+        # If-Range needs a strong validator; weak ETags cannot be used
+        etag = headers.get('ETag')
+        validator = etag if etag and not etag.startswith('W/') else headers.get('Last-Modified')
+        if validator:
+            with open(path, 'w') as f:
+                f.write(validator)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def _discard(*paths):
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _file_digest(self, path, as_hasher=False):
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                hasher.update(chunk)
+        return hasher if as_hasher else hasher.hexdigest()
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,168 @@
+"""
+Prometheus metrics for the segmentation service
+
+Metrics are defined once at import time and updated through the small
+``record_*`` helpers, which do nothing when prometheus_client is not
+installed. Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py
+does) so every worker process writes its samples to that directory and
+``render_metrics`` aggregates them into one scrape.
+"""
+
+import os
+import time
+
+from .profiling import current_rss_mb
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                                   REGISTRY, generate_latest, multiprocess)
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+if PROMETHEUS_AVAILABLE:
+    REQUEST_LATENCY = Histogram(
+        'janah_http_request_duration_seconds', 'HTTP request latency by route',
+        ['method', 'endpoint', 'status'], buckets=REQUEST_BUCKETS)
+    JOBS = Counter('janah_analysis_jobs_total', 'Analysis jobs by final status', ['status'])
+    JOB_EVENTS = Counter('janah_analysis_job_events_total', 'Analysis job submissions', ['event'])
+    STAGE_DURATION = Histogram(
+        'janah_analysis_stage_duration_seconds', 'Analysis stage wall time', ['stage'], buckets=STAGE_BUCKETS)
+    JOB_PEAK_MEMORY = Gauge(
+        'janah_analysis_last_peak_memory_bytes', 'Peak RSS of the last finished analysis worker',
+        multiprocess_mode='max')
+    QUEUE_DEPTH = Gauge('janah_analysis_queue_depth', 'Jobs waiting to start', multiprocess_mode='livesum')
+    RUNNING_JOBS = Gauge('janah_analysis_running_jobs', 'Jobs currently running', multiprocess_mode='livesum')
+    CACHE_REQUESTS = Counter('janah_cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result'])
+    UPLOAD_BYTES = Counter('janah_upload_bytes_total', 'Bytes of uploaded datasets')
+    WORKER_MEMORY = Gauge(
+        'janah_worker_resident_memory_bytes', 'Resident memory of each web worker', multiprocess_mode='liveall')
+
+
+def observe_request(method, endpoint, status, seconds):
+    """Record one HTTP request and refresh this worker's memory gauge"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    REQUEST_LATENCY.labels(method, endpoint, str(status)).observe(seconds)
+    rss = current_rss_mb()
+    if rss is not None:
+        WORKER_MEMORY.set(rss * 1024 * 1024)
+
+
+def record_job_event(event, job, queue_metrics=None):
+    """
+    Record a JobManager event ('submitted', 'coalesced', 'rejected', 'started', 'finished')
+
+    Args:
+        event (str): Event name
+        job: The AnalysisJob (None for rejections)
+        queue_metrics (dict): JobManager.metrics() at the time of the event
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return
+    if event in ('submitted', 'coalesced', 'rejected'):
+        JOB_EVENTS.labels(event).inc()
+    if event == 'finished':
+        JOBS.labels(job.status).inc()
+        timings = (job.result or {}).get('timings') if isinstance(job.result, dict) else None
+        if timings:
+            for stage in timings.get('stages', []):
+                STAGE_DURATION.labels(stage['stage']).observe(stage['wall_seconds'])
+            if timings.get('peak_rss_mb'):
+                JOB_PEAK_MEMORY.set(timings['peak_rss_mb'] * 1024 * 1024)
+    if queue_metrics:
+        QUEUE_DEPTH.set(queue_metrics['queue_depth'])
+        RUNNING_JOBS.set(queue_metrics['running'])
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup; the hit ratio is hits / (hits + misses)"""
+    if PROMETHEUS_AVAILABLE:
+        CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_upload(num_bytes):
+    """Count the bytes of an uploaded dataset"""
+    if PROMETHEUS_AVAILABLE:
+        UPLOAD_BYTES.inc(num_bytes)
+
+
+def render_metrics():
+    """
+    Render all metrics in the Prometheus text format
+
+    Returns:
+        tuple: (body, content type), or (None, None) without prometheus_client
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return None, None
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Aggregate the samples written by every worker process
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_request_metrics(app):
+    """Time every request of a Flask app by its route rule"""
+
+    @app.before_request
+    def _start_timer():
+        from flask import g
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        from flask import g, request
+        start = getattr(g, 'metrics_start', None)
+        if start is not None:
+            # The route rule, not the URL, keeps label cardinality bounded
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            observe_request(request.method, endpoint, response.status_code, time.perf_counter() - start)
+        return response
+
+    return app
+
+
+class ASGIRequestMetrics:
+    """
+    ASGI middleware timing requests to the given routes by their path template
+
+    Requests to other paths (e.g. a mounted Flask app, which times itself
+    through ``init_request_metrics``) are passed through untimed.
+
+    Args:
+        app: ASGI application
+        routes (list): Routes with ``endpoint`` and ``path`` attributes
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.templates = {route.endpoint: route.path for route in routes if hasattr(route, 'endpoint')}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router adds the matched endpoint to the scope
+            endpoint = self.templates.get(scope.get('endpoint'))
+            if endpoint is not None:
+                observe_request(scope['method'], endpoint, status['code'], time.perf_counter() - start)
+
@@ -0,0 +1,169 @@
+"""
+Stage-level profiling for the analysis pipeline
+
+``StageProfiler`` wraps each pipeline function and records its wall time,
+CPU time, rows in/out and peak memory, giving a per-job timing breakdown.
+Each stage's ``peak_rss_mb`` is its own peak: on Linux the kernel's
+high-water mark (VmHWM) is reset through ``/proc/self/clear_refs`` before
+the stage and read after it; elsewhere a background thread samples the
+resident memory while the stage runs, which can miss short spikes. With
+``profile=True`` it also runs cProfile across the stages so a slow job can
+be inspected function by function.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+
+def current_rss_mb():
+    """Current resident memory of this process in MB (None where unsupported)"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _reset_high_water_mark():
+    """Reset this process's VmHWM (Linux); returns whether it worked"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _high_water_mark_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class _RssSampler(threading.Thread):
+    """Track the highest resident memory seen while a stage runs"""
+
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return self.peak
+
+
+class _StagePeak:
+    """Peak resident memory of the code between ``start()`` and ``stop()``"""
+
+    def __init__(self, sample_interval=0.01):
+        self._sampler = None
+        if not _reset_high_water_mark() or _high_water_mark_mb() is None:
+            self._sampler = _RssSampler(sample_interval)
+            self._sampler.start()
+
+    def stop(self):
+        return self._sampler.stop() if self._sampler is not None else _high_water_mark_mb()
+
+
+def _row_count(value):
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if value is None or isinstance(value, (str, bytes)):
+        return None
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+class StageProfiler:
+    """
+    Record a timing breakdown for the stages of one job
+
+    Args:
+        profile (bool): Also collect a cProfile profile across all stages
+    """
+
+    def __init__(self, profile=False):
+        self.stages = []
+        self._profiler = cProfile.Profile() if profile else None
+
+    def call(self, stage, func, *args, **kwargs):
+        """
+        Run ``func(*args, **kwargs)`` as one named stage
+
+        Rows in are taken from the first argument and rows out from the
+        result (or the first element of a tuple result) when they have a
+        length.
+
+        Returns:
+            The return value of ``func``
+        """
+        record = {'stage': stage, 'rows_in': _row_count(args[0]) if args else None}
+        stage_peak = _StagePeak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if self._profiler is not None:
+            self._profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 4)
+            record['cpu_seconds'] = round(time.process_time() - cpu_start, 4)
+            peak = stage_peak.stop()
+            record['peak_rss_mb'] = round(peak, 1) if peak is not None else None
+            self.stages.append(record)
+        record['rows_out'] = _row_count(result)
+        return result
+
+    def to_dict(self):
+        """Timing breakdown: one entry per stage plus totals (``peak_rss_mb`` is the highest stage peak)"""
+        return {
+            'stages': self.stages,
+            'total_wall_seconds': round(sum(stage['wall_seconds'] for stage in self.stages), 4),
+            'total_cpu_seconds': round(sum(stage['cpu_seconds'] for stage in self.stages), 4),
+            'peak_rss_mb': max((stage['peak_rss_mb'] for stage in self.stages
+                                if stage['peak_rss_mb'] is not None), default=None)
+        }
+
+    def save_profile(self, path, top=30):
+        """
+        Write the cProfile data (``path``) and a readable summary (``path + '.txt'``)
+
+        Returns:
+            str: The summary text, or None if profiling was not enabled
+        """
+        if self._profiler is None:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._profiler.dump_stats(path)
+
+        output = io.StringIO()
+        pstats.Stats(self._profiler, stream=output).sort_stats('cumulative').print_stats(top)
+        summary = output.getvalue()
+        with open(path + '.txt', 'w') as f:
+            f.write(summary)
+        return summary
@@ -0,0 +1,325 @@
+"""
+Segmentation report generation
+
+The report is built in two steps: ``summarize_segments`` computes every
+per-segment statistic in a single groupby pass over the RFM table, and
+``render_report`` turns that summary into TXT, HTML or PDF output using
+the templates below. Rendering only touches the (tiny) summary, so the
+cost of a report is one O(n) aggregation regardless of the output format.
+"""
+
+import html
+import io
+from datetime import datetime
+
+REPORT_FORMATS = {
+    'txt': 'text/plain',
+    'html': 'text/html',
+    'pdf': 'application/pdf'
+}
+
+# Recommendations keyed by a substring of the segment name
+SEGMENT_RECOMMENDATIONS = [
+    ("Loyal", ["Maintain relationship with exclusive offers", "Consider VIP program", "Request referrals"]),
+    ("At-Risk", ["Re-engagement campaigns", "Special discounts", "Customer feedback surveys"]),
+    ("New", ["Welcome series", "Product education", "First purchase incentives"]),
+    ("High-Value", ["Premium services", "Early access to new products", "Personal account manager"]),
+    ("Inactive", ["Win-back campaigns", "Significant discounts", "Product updates"])
+]
+
+TECHNICAL_DETAILS = [
+    "RFM Analysis: Recency, Frequency, Monetary metrics",
+    "Clustering Algorithm: K-means with StandardScaler"
+]
+
+# Outlier filter strategies as described in the report
+OUTLIER_METHODS = {
+    'iqr': "IQR fences",
+    'mad': "median absolute deviation",
+    'percentile': "percentile bounds"
+}
+
+NEXT_STEPS = [
+    "Implement targeted marketing campaigns",
+    "Monitor segment performance over time",
+    "Adjust segmentation parameters as needed",
+    "Integrate with CRM system for automation"
+]
+
+TXT_HEADER = """
+JANAH HARDWARE STORE - CUSTOMER SEGMENTATION REPORT
+Generated on: {generated_on}
+
+ANALYSIS SUMMARY
+================
+Total Customers Analyzed: {total_customers:,}
+Number of Segments: {n_segments}
+Analysis Parameters: {analysis_params}
+
+SEGMENT PROFILES
+================
+"""
+
+TXT_SEGMENT = """
+{name_upper}
+- Customer Count: {count:,} ({percentage:.1f}%)
+- Average Recency: {avg_recency:.1f} days
+- Average Frequency: {avg_frequency:.1f} transactions
+- Average Monetary: ${avg_monetary:,.2f}
+- Total Revenue: ${total_revenue:,.2f}
+
+RECOMMENDATIONS:
+{recommendations}
+"""
+
+TXT_FOOTER = """
+TECHNICAL DETAILS
+=================
+{technical_details}
+
+BUSINESS INSIGHTS
+=================
+- Top Revenue Segment: {top_revenue_segment}
+- Most Active Segment: {most_active_segment}
+- Largest Segment: {largest_segment}
+
+NEXT STEPS
+==========
+{next_steps}
+
+---
+Report generated by Janah Customer Segmentation System
+For questions, contact: janah@hardwarestore.com
+"""
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>Janah Customer Segmentation Report</title>
+<style>
+body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 2rem; color: #212529; }}
+h1 {{ color: #0066CC; }}
+table {{ border-collapse: collapse; width: 100%; margin-bottom: 1.5rem; }}
+th, td {{ border: 1px solid #dee2e6; padding: 0.5rem; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+th {{ background-color: #f8f9fa; }}
+</style>
+</head>
+<body>
+<h1>Janah Hardware Store - Customer Segmentation Report</h1>
+<p>Generated on: {generated_on}</p>
+<h2>Analysis Summary</h2>
+<ul>
+<li>Total Customers Analyzed: {total_customers:,}</li>
+<li>Number of Segments: {n_segments}</li>
+<li>Analysis Parameters: {analysis_params}</li>
+</ul>
+<h2>Segment Profiles</h2>
+<table>
+<thead>
+<tr><th>Segment</th><th>Customers</th><th>Share</th><th>Avg Recency (days)</th><th>Avg Frequency</th><th>Avg Monetary</th><th>Total Revenue</th></tr>
+</thead>
+<tbody>
+{segment_rows}
+</tbody>
+</table>
+<h2>Recommendations</h2>
+{recommendation_blocks}
+<h2>Technical Details</h2>
+<ul>{technical_details}</ul>
+<h2>Business Insights</h2>
+<ul>
+<li>Top Revenue Segment: {top_revenue_segment}</li>
+<li>Most Active Segment: {most_active_segment}</li>
+<li>Largest Segment: {largest_segment}</li>
+</ul>
+<h2>Next Steps</h2>
+<ol>{next_steps}</ol>
+<hr>
+<p>Report generated by Janah Customer Segmentation System<br>For questions, contact: janah@hardwarestore.com</p>
+</body>
+</html>
+"""
+
+HTML_SEGMENT_ROW = ("<tr><td>{name}</td><td>{count:,}</td><td>{percentage:.1f}%</td><td>{avg_recency:.1f}</td>"
+                    "<td>{avg_frequency:.1f}</td><td>${avg_monetary:,.2f}</td><td>${total_revenue:,.2f}</td></tr>")
+
+
+def get_recommendations(segment_name):
+    """Return the recommended actions for a segment name"""
+    for keyword, actions in SEGMENT_RECOMMENDATIONS:
+        if keyword in segment_name:
+            return actions
+    return []
+
+
+def technical_details(analysis_params):
+    """
+    Technical details of how the analysis was actually run
+
+    Args:
+        analysis_params (dict): Report parameters; ``k_selection`` (the
+            model's ``k_selection_``) and ``outlier_strategy`` are described
+            when present
+
+    Returns:
+        list: Lines for the technical details section
+    """
+    lines = list(TECHNICAL_DETAILS)
+    selection = analysis_params.get('k_selection')
+    n_clusters = analysis_params.get('n_clusters', analysis_params.get('num_clusters'))
+    if selection:
+        fitted = f"{selection['fits']} of {selection['candidates']}" if 'candidates' in selection else selection['fits']
+        line = (f"Optimal Clusters: Selected by the {selection['criterion'].replace('_', '-').title()} "
+                f"criterion ({fitted} candidate k values fitted")
+        lines.append(line + (", stopped early)" if selection.get('stopped_early') else ")"))
+    elif n_clusters not in (None, 'Auto'):
+        lines.append(f"Number of Clusters: {n_clusters} (set by the user)")
+
+    strategy = analysis_params.get('outlier_strategy')
+    if strategy:
+        lines.append(f"Data Quality: Quantity and UnitPrice outliers removed using "
+                     f"{OUTLIER_METHODS.get(strategy, strategy)}")
+    return lines
+
+
+def summarize_segments(rfm_data):
+    """
+    Compute all per-segment report statistics in one aggregation pass
+
+    Args:
+        rfm_data (pd.DataFrame): RFM data with a Segment (or Cluster) column
+
+    Returns:
+        dict: Report summary with a ``segments`` list and business insights
+    """
+    label_column = 'Segment' if 'Segment' in rfm_data.columns else 'Cluster'
+    total_customers = len(rfm_data)
+
+    # One groupby computes every statistic the report needs; sort=False keeps
+    # segments in order of first appearance, as the report always listed them
+    stats = rfm_data.groupby(label_column, sort=False).agg(
+        count=('Recency', 'size'),
+        avg_recency=('Recency', 'mean'),
+        avg_frequency=('Frequency', 'mean'),
+        avg_monetary=('Monetary', 'mean'),
+        total_revenue=('Monetary', 'sum')
+    )
+
+    segments = []
+    for label, row in stats.iterrows():
+        name = str(label) if label_column == 'Segment' else f"Cluster {label}"
+        segments.append({
+            'name': name,
+            'count': int(row['count']),
+            'percentage': row['count'] / total_customers * 100 if total_customers else 0.0,
+            'avg_recency': float(row['avg_recency']),
+            'avg_frequency': float(row['avg_frequency']),
+            'avg_monetary': float(row['avg_monetary']),
+            'total_revenue': float(row['total_revenue']),
+            'recommendations': get_recommendations(name)
+        })
+
+    def best(key):
+        return max(segments, key=lambda segment: segment[key])['name'] if segments else 'N/A'
+
+    if 'Cluster' in rfm_data.columns:
+        n_segments = int(rfm_data['Cluster'].nunique())
+    else:
+        n_segments = len(segments)
+
+    return {
+        'total_customers': total_customers,
+        'n_segments': n_segments,
+        'segments': segments,
+        'top_revenue_segment': best('total_revenue'),
+        'most_active_segment': best('avg_frequency'),
+        'largest_segment': best('count')
+    }
+
+
+def _render_txt(summary, context):
+    report = TXT_HEADER.format(**context)
+    for segment in summary['segments']:
+        recommendations = "".join(f"- {action}\n" for action in segment['recommendations'])
+        report += TXT_SEGMENT.format(**dict(segment, name_upper=segment['name'].upper(),
+                                            recommendations=recommendations))
+    report += TXT_FOOTER.format(**dict(
+        context,
+        technical_details="\n".join(f"- {line}" for line in context['technical_details']),
+        next_steps="\n".join(f"{i}. {step}" for i, step in enumerate(NEXT_STEPS, 1))
+    ))
+    return report
+
+
+def _render_html(summary, context):
+    escaped = {key: html.escape(str(value)) if isinstance(value, str) else value
+               for key, value in context.items() if key != 'technical_details'}
+    segment_rows = []
+    recommendation_blocks = []
+    for segment in summary['segments']:
+        name = html.escape(segment['name'])
+        segment_rows.append(HTML_SEGMENT_ROW.format(**dict(segment, name=name)))
+        if segment['recommendations']:
+            items = "".join(f"<li>{html.escape(action)}</li>" for action in segment['recommendations'])
+            recommendation_blocks.append(f"<h3>{name}</h3>\n<ul>{items}</ul>")
+
+    return HTML_TEMPLATE.format(
+        segment_rows="\n".join(segment_rows),
+        recommendation_blocks="\n".join(recommendation_blocks),
+        technical_details="".join(f"<li>{html.escape(line)}</li>" for line in context['technical_details']),
+        next_steps="".join(f"<li>{html.escape(step)}</li>" for step in NEXT_STEPS),
+        **escaped
+    )
+
+
+def _render_pdf(summary, context, lines_per_page=60):
+    # Imported lazily so TXT/HTML reports never pay for matplotlib
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    lines = _render_txt(summary, context).strip('\n').splitlines()
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        for start in range(0, max(len(lines), 1), lines_per_page):
+            fig = Figure(figsize=(8.27, 11.69))  # A4 portrait
+            fig.text(0.06, 0.96, "\n".join(lines[start:start + lines_per_page]),
+                     family='monospace', fontsize=8, va='top')
+            pdf.savefig(fig)
+    return buffer.getvalue()
+
+
+def render_report(summary, analysis_params, fmt='txt'):
+    """
+    Render a report summary in the requested format
+
+    Args:
+        summary (dict): Output of ``summarize_segments``
+        analysis_params (dict): Parameters shown in the report header, which
+            also describe the cluster selection and outlier filtering
+        fmt (str): One of 'txt', 'html' or 'pdf'
+
+    Returns:
+        str or bytes: Report content (bytes for PDF)
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Unsupported report format: {fmt}")
+
+    context = {
+        'generated_on': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'total_customers': summary['total_customers'],
+        'n_segments': summary['n_segments'],
+        'analysis_params': analysis_params,
+        'technical_details': technical_details(analysis_params),
+        'top_revenue_segment': summary['top_revenue_segment'],
+        'most_active_segment': summary['most_active_segment'],
+        'largest_segment': summary['largest_segment']
+    }
+
+    if fmt == 'html':
+        context['analysis_params'] = str(analysis_params)
+        return _render_html(summary, context)
+    if fmt == 'pdf':
+        return _render_pdf(summary, context)
+    return _render_txt(summary, context)